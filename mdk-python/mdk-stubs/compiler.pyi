@@ -7,7 +7,7 @@ from typing import Callable
 
 __all__ = ['build', 'library', 'statedef', 'create_statedef', 'template', 'trigger']
 
-def build(def_file: str, output: str, run_mtl: bool = True, skip_templates: bool = False, locations: bool = True, compress: bool = False, preserve_ir: bool = False, target_folder: str = "mdk-out", debug_build: bool = False) -> None: ...
+def build(def_file: str, output: str, run_mtl: bool = True, skip_templates: bool = False, locations: bool = True, compress: bool = False, preserve_ir: bool = False, target_folder: str = "mdk-out", debug_build: bool = False, profile: str | None = None) -> None: ...
 def library(inputs: list[Callable[..., None]], dirname: str = '', output: str | None = None, locations: bool = True) -> None: ...
 def statefunc(mode: TranslationMode = TranslationMode.STANDARD) -> Callable[[Callable[..., None]], Callable[..., None]]: ...
 def statedef(type: StateType | None = ..., movetype: MoveType | None = ..., physics: PhysicsType | None = ..., anim: int | Animation | None = None, velset: tuple[float, float] | None = None, ctrl: bool | None = None, poweradd: int | None = None, juggle: int | None = None, facep2: bool | None = None, hitdefpersist: bool | None = None, movehitpersist: bool | None = None, hitcountpersist: bool | None = None, sprpriority: int | None = None, stateno: int | None = None, scope: StateScope | None = None, mode: TranslationMode = TranslationMode.STANDARD) -> Callable[[Callable[[], None]], Callable[..., StateController]]: ...
@@ -6,6 +6,7 @@ import traceback
 import os
 
 import mtl.project
+from mtl.utils import profiler
 from mtl.types.translation import ForwardParameter, StateDefinitionScope, StateScopeType as MtlScopeType
 import mtlcc
 
@@ -26,9 +27,11 @@ from mdk.resources.animation import Animation
 def build(
         def_file: str, output: str, 
         run_mtl: bool = True, skip_templates: bool = False, locations: bool = True, compress: bool = False, 
-        preserve_ir: bool = False, target_folder: str = "mdk-out", debug_build: bool = False) -> None:
+        preserve_ir: bool = False, target_folder: str = "mdk-out", debug_build: bool = False, profile: Optional[str] = None) -> None:
     context = CompilerContext.instance()
     context.debug_build = debug_build
+    ## if `profile` is set, the time and memory used by each step (including the MTL compiler phases) is written there as a Chrome trace.
+    owns_profile = profile != None and profiler.start()
     try:
         output_path = os.path.join(os.path.abspath(os.path.dirname(def_file)), output)
         print(f"Will build state definitions to output path {output_path}.")
@@ -59,7 +62,7 @@ def build(
                     f.write("\n")
 
         ## builds the character from the input data.
-        for state in context.statedefs:
+        for state in profiler.iterate(context.statedefs, "statedef", "build", lambda k: k):
             definition = context.statedefs[state]
             ## if an Animation object is forward-declared, read its assigned ID here
             ## and put it in the statedef's params.
@@ -103,9 +106,10 @@ def build(
                 lib_groups.add(context.typedefs[t].library)
 
         if len(lib_targets) > 0: 
-            library(lib_targets, dirname = os.path.abspath(os.path.dirname(def_file)), locations = locations)
+            with profiler.span("library"):
+                library(lib_targets, dirname = os.path.abspath(os.path.dirname(def_file)), locations = locations)
         
-        with open(output, mode="w") as f:
+        with open(output, mode="w") as f, profiler.span("writeStates"):
             if not skip_templates and len(lib_groups) != 0:
                 for group in lib_groups:
                     f.write("[Include]\n")
@@ -148,6 +152,7 @@ def build(
                 project.global_forwards.append(ForwardParameter(global_variable.name, global_variable.type.name, is_system = global_variable.is_system, scope = scoped))
             ## system globals
             project.global_forwards.append(ForwardParameter("mdk_internalTrigger", "int", is_system = False, scope = StateDefinitionScope(MtlScopeType.SHARED, None)))
+            project.profile = profile
             mtlcc.runCompilerFromDef(def_file, os.path.join(os.path.abspath(os.path.dirname(def_file)), target_folder), project)
 
         ## delete the output file if we're not preserving IR
@@ -160,6 +165,9 @@ def build(
     except Exception as exc:
         print("An internal error occurred while compiling a template, bug the developers.")
         raise exc
+    finally:
+        if owns_profile and profile != None:
+            profiler.finish(profile)
 
 def library(inputs: list[Callable[..., None] | TypeSpecifier], dirname: str = "", output: Optional[str] = None, locations: bool = True, preserve_ir: bool = False) -> None:
     if len(inputs) == 0:
@@ -116,6 +116,7 @@ class CompilerContext:
     if_stack: list[int]
     animations: list[Animation]
     debug_build: bool
+    anonymous_count: int
 
     def __init__(self):
         self.statedefs = {}
@@ -134,6 +135,7 @@ class CompilerContext:
         self.if_stack = []
         self.animations = []
         self.debug_build = False
+        self.anonymous_count = 0
     
     @classmethod
     def instance(cls):
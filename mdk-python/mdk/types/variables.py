@@ -8,7 +8,12 @@ from mdk.types.specifier import TypeSpecifier
 from mdk.types.context import CompilerContext, ParameterDefinition, StateController, StateScope
 from mdk.types.builtins import IntType, FloatType, ShortType, ByteType, BoolType
 
-from mdk.utils.shared import generate_random_string, convert, format_bool
+from mdk.utils.shared import convert, format_bool
+
+## anonymous variables are numbered in the order they are created, so repeated builds produce identical output.
+def anonymous_name(context: CompilerContext) -> str:
+    context.anonymous_count += 1
+    return f"_anon_{context.anonymous_count}"
 
 ## a special type of Expression which represents a variable access.
 ## generally speaking this is just treated differently so that we can
@@ -48,13 +53,13 @@ class VariableExpression(Expression):
         
         ## if it could not be found, print a warning and assign a variable name.
         if context.current_state != None and self.exprn == "":
-            self.exprn = f"_anon_{generate_random_string(8)}"
+            self.exprn = anonymous_name(context)
             print(f"Warning: Could not automatically identify the name of a variable in {context.current_state.fn.__name__}, assigning anonymous name {self.exprn}.")
         elif context.current_template != None and self.exprn == "":
-            self.exprn = f"_anon_{generate_random_string(8)}"
+            self.exprn = anonymous_name(context)
             print(f"Warning: Could not automatically identify the name of a variable in {context.current_template.fn.__name__}, assigning anonymous name {self.exprn}.")
         elif context.current_template == None and context.current_state == None and self.exprn == "":
-            self.exprn = f"_anon_{generate_random_string(8)}"
+            self.exprn = anonymous_name(context)
             print(f"Warning: Could not automatically identify the name of a variable in global state, assigning anonymous name {self.exprn}.")
 
     def make_expression(self, exprn: str):
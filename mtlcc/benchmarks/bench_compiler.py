@@ -0,0 +1,176 @@
+## end-to-end compiler benchmark.
+## generates synthetic characters (see `synthetic.py`) and compiles each one in a fresh process with the compile cache disabled,
+## timing the parser (`loadFile`), each `translator` phase and the writer (state file and debugging database) through `mtl.utils.profiler`.
+## the results are compared against the stored baseline (`baseline.json` beside this file) and any regression beyond the tolerance is reported.
+## timings are only comparable on the machine the baseline was recorded on, so re-record it with `--update-baseline` when switching machines.
+## usage: python benchmarks/bench_compiler.py [--scenario NAME ...] [--repeat N] [--tolerance FRACTION] [--update-baseline]
+##        python benchmarks/bench_compiler.py --shape statedefs=500 controllers=20 (runs a single ad-hoc character without comparing)
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from synthetic import CharacterShape, generate_character, parse_shape
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SCENARIOS: dict[str, CharacterShape] = {
+    "small": CharacterShape(statedefs = 50, controllers = 10),
+    "medium": CharacterShape(statedefs = 200, controllers = 20, files = 4),
+    "deep-templates": CharacterShape(statedefs = 100, controllers = 10, template_depth = 8),
+    "wide-includes": CharacterShape(statedefs = 100, controllers = 10, triggers = 200, structs = 16, includes = 16),
+}
+
+## phases reported individually, in order. `parse` and `write` are combinations of the profiled phases.
+## `parse` covers every file loaded, including included files, which are also part of the `processIncludes` time.
+PHASES = ["parse", "processIncludes", "translateTypes", "translateStructs", "translateTriggers", "translateTemplates", "translateStateDefinitions",
+          "replaceTemplates", "createGlobalsTable", "fullPassTypeCheck", "replaceTriggers", "replaceStructAssigns", "checkScopes",
+          "assignVariables", "applyPersist", "applyStateNumbers", "write"]
+COMBINED = {"parse": ["loadFile"], "write": ["createOutput", "writeDatabase"]}
+
+## timings below this many seconds are too noisy to flag as regressions.
+NOISE_FLOOR = 0.05
+
+def peak_rss() -> int:
+    ## peak resident set size of this process, in bytes.
+    if sys.platform == "win32":
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+def run_compile(definition: str, output: str):
+    ## runs in a child process: compiles the character once and prints the measurements as JSON.
+    import mtlcc
+    from mtl import project
+    from mtl.utils import profiler
+
+    projectContext = project.loadDefinition(definition)
+    ## memory tracing is disabled so it does not distort the timings, peak RSS is measured for the whole process instead.
+    profiler.start(memory = False)
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        mtlcc.runCompilerFromDef(definition, output, projectContext)
+    elapsed = time.perf_counter() - start
+    profile = profiler.stop()
+    assert profile != None
+    if "Translation terminated with an error." in log.getvalue():
+        print(log.getvalue(), file = sys.stderr)
+        sys.exit(1)
+
+    phases = {name: total.duration / 1e9 for (name, total) in profile.totals("phase", lambda k: k.name).items()}
+    statedefs = len(set(event.name for event in profile.events if event.category == "statedef" and event.args.get("phase") == "replaceTriggers"))
+    result = {"total": elapsed, "statedefs": statedefs, "states_per_sec": statedefs / elapsed, "peak_rss_mib": peak_rss() / 1048576}
+    for phase in PHASES:
+        result[phase] = sum(phases.get(name, 0) for name in COMBINED.get(phase, [phase]))
+    print(json.dumps(result))
+
+def measure(shape: CharacterShape, repeat: int) -> dict[str, float]:
+    ## generates the character and compiles it `repeat` times, keeping the best result for each measurement.
+    best: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as working:
+        definition = generate_character(os.path.join(working, "character"), shape)
+        for _ in range(repeat):
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "--compile", definition, os.path.join(working, "output")], capture_output = True, text = True)
+            if result.returncode != 0:
+                print(result.stdout)
+                print(result.stderr)
+                raise Exception(f"Failed to compile synthetic character ({shape.describe()}).")
+            measurements = json.loads(result.stdout.strip().splitlines()[-1])
+            for key in measurements:
+                keep = max if key == "states_per_sec" else min
+                best[key] = keep(best[key], measurements[key]) if key in best else measurements[key]
+    return best
+
+def print_results(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]]):
+    names = list(results)
+    print(f"{'':<28}" + "".join(f"{name:>16}" for name in names))
+    for key in ["statedefs", "total", "states_per_sec", "peak_rss_mib"] + PHASES:
+        row = f"{key:<28}"
+        for name in names:
+            value = results[name].get(key, 0)
+            cell = f"{value:.0f}" if key == "statedefs" else f"{value:.3f}" if key not in ["states_per_sec", "peak_rss_mib"] else f"{value:.1f}"
+            if name in baseline and key in baseline[name] and baseline[name][key] != 0 and key != "statedefs":
+                cell += f" ({value / baseline[name][key] - 1:+.0%})"
+            row += f"{cell:>16}"
+        print(row)
+
+def find_regressions(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float) -> list[str]:
+    regressions: list[str] = []
+    for name in results:
+        if name not in baseline: continue
+        for key in results[name]:
+            if key not in baseline[name] or key == "statedefs": continue
+            (current, previous) = (results[name][key], baseline[name][key])
+            if key == "states_per_sec":
+                if current < previous * (1 - tolerance):
+                    regressions.append(f"{name}: states/sec dropped from {previous:.1f} to {current:.1f}")
+            elif key == "peak_rss_mib":
+                if current > previous * (1 + tolerance):
+                    regressions.append(f"{name}: peak RSS grew from {previous:.1f} MiB to {current:.1f} MiB")
+            elif current > previous * (1 + tolerance) and current - previous > NOISE_FLOOR:
+                regressions.append(f"{name}: {key} went from {previous:.3f}s to {current:.3f}s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark mtlcc on synthetic characters")
+    parser.add_argument("--scenario", help = "Scenario to run (may be repeated, defaults to all)", action = "append", choices = list(SCENARIOS))
+    parser.add_argument("--shape", help = "Run a single character with the given shape (key=value ...) instead of the scenarios", nargs = "+")
+    parser.add_argument("--repeat", help = "Number of times to compile each character, keeping the best result", type = int, default = 3)
+    parser.add_argument("--tolerance", help = "Fraction by which a measurement may exceed the baseline before it is reported", type = float, default = 0.25)
+    parser.add_argument("--update-baseline", help = "Store the results as the new baseline", action = "store_true")
+    parser.add_argument("--compile", help = argparse.SUPPRESS, nargs = 2)
+    args = parser.parse_args()
+
+    if args.compile != None:
+        run_compile(args.compile[0], args.compile[1])
+        return
+
+    if args.shape != None:
+        shape = parse_shape(args.shape)
+        print(f"custom: {shape.describe()}")
+        print_results({"custom": measure(shape, args.repeat)}, {})
+        return
+
+    stored = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            stored = json.load(f)
+    baseline: dict[str, dict[str, float]] = stored.get("scenarios", {})
+
+    results: dict[str, dict[str, float]] = {}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"{name}: {SCENARIOS[name].describe()}")
+        results[name] = measure(SCENARIOS[name], args.repeat)
+    print()
+    if "machine" in stored:
+        print(f"baseline recorded on {stored['machine']}")
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        baseline.update({name: {key: round(value, 4) for (key, value) in results[name].items()} for name in results})
+        with open(BASELINE, mode="w") as f:
+            json.dump({"machine": f"{platform.platform()}, Python {platform.python_version()}", "scenarios": baseline}, f, indent = 4)
+            f.write("\n")
+        print(f"Stored baseline in {BASELINE}.")
+        return
+
+    if len(regressions := find_regressions(results, baseline, args.tolerance)) != 0:
+        print()
+        print(f"Regressions beyond {args.tolerance:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"\t{regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
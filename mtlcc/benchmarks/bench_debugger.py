@@ -0,0 +1,149 @@
+## debugger memory access benchmark.
+## builds a snapshot of MUGEN's memory (see `mtl.debugging.memory.SnapshotMemory`) holding a game with two players and a number of helpers,
+## then runs the debugger's read paths against it: listing players, displaying every player's variables (as `info variables` does)
+## and reading each trigger supported by `info trigger`. no MUGEN process is needed, so this runs on any platform.
+## each path reports its duration along with the number of reads and bytes read, which are what a live process makes expensive.
+## paths are run both reading each value directly, and through a per-break snapshot (see `process.snapshotPlayers`), including the cost of taking it.
+## usage: python benchmarks/bench_debugger.py [--database FILE.mdbg] [--helpers N] [--globals N] [--version 1.1b1] [--repeat N]
+##        python benchmarks/bench_debugger.py --save FILE (stores the generated snapshot) / --snapshot FILE (runs against a stored snapshot)
+## the debugger imports the breakpoint/passpoint patches from mtl/debugging/asmbin, which is checked in as empty placeholders.
+## on a clean checkout (ImportError: BREAKPOINT_FUNC_11B1), generate it first
+## (as in .github/workflows/build-wheel.yml) for each MUGEN version in asm/ (1.1b1, 1.1a4, 1.0, win), from the repository root:
+##   nasm -o mtlcc/asm/1.1b1/breakpoint.bin mtlcc/asm/1.1b1/breakpoint.asm
+##   nasm -o mtlcc/asm/1.1b1/passpoint.bin mtlcc/asm/1.1b1/passpoint.asm
+##   python3 .github/copy_binary.py mtlcc/asm/1.1b1/breakpoint.bin mtlcc/mtl/debugging/asmbin/breakpoint_11b1.py BREAKPOINT_FUNC_11B1
+##   python3 .github/copy_binary.py mtlcc/asm/1.1b1/passpoint.bin mtlcc/mtl/debugging/asmbin/passpoint_11b1.py PASSPOINT_FUNC_11B1
+## (the other versions write breakpoint_11a4/_100/_win.py and passpoint_11a4/_100/_win.py, with names BREAKPOINT_FUNC_11A4 etc.)
+import argparse
+import contextlib
+import io
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mtl.debugging import cli_function, common_function, database, process
+from mtl.debugging.address import SELECT_VERSION_ADDRESS, ADDRESS_DATABASE, ADDRESS_MUGEN_WIN, ADDRESS_MUGEN_100, ADDRESS_MUGEN_11A4, ADDRESS_MUGEN_11B1
+from mtl.debugging.memory import CachedMemory, SnapshotMemory, load_snapshot
+from mtl.types.debugging import DebuggerLaunchInfo, DebuggerTarget, DebuggingContext, DebugParameterInfo, DebugProcessState, DebugStateInfo, DebugTypeInfo
+from mtl.types.shared import Location
+from mtl.types.translation import StateDefinitionScope, StateScopeType, TypeCategory
+
+VERSIONS = {"win": ADDRESS_MUGEN_WIN, "1.0": ADDRESS_MUGEN_100, "1.1a4": ADDRESS_MUGEN_11A4, "1.1b1": ADDRESS_MUGEN_11B1}
+
+## synthetic addresses for the game and player structures.
+GAME_ADDRESS = 0x10000000
+PLAYER_ADDRESS = 0x20000000
+PLAYER_STRIDE = 0x10000
+
+def generate_snapshot(addresses: dict, helpers: int, stateno: int) -> SnapshotMemory:
+    ## player 1 and player 2 occupy the first two player slots, and player 1's helpers occupy slots from 4.
+    memory = SnapshotMemory()
+    version = next(key for (key, value) in ADDRESS_DATABASE.items() if value is addresses)
+    memory.map(SELECT_VERSION_ADDRESS, struct.pack("<I", version))
+    memory.map(addresses["game"], struct.pack("<I", GAME_ADDRESS))
+    memory.map(addresses["SCTRL_BREAKPOINT_TABLE"], bytes(addresses["SCTRL_STEP_ADDR"] + 8 - addresses["SCTRL_BREAKPOINT_TABLE"]))
+
+    game = bytearray(max([addresses["player"] + 60 * 4] + [trigger[0] + 8 for trigger in addresses["game_triggers"].values()]))
+    slots = [0, 1] + list(range(4, 4 + helpers))
+    size = process.player_snapshot_size(addresses)
+    rng = random.Random(0)
+    for slot in slots:
+        address = PLAYER_ADDRESS + slot * PLAYER_STRIDE
+        struct.pack_into("<I", game, addresses["player"] + slot * 4, address)
+        player = bytearray(rng.randbytes(size))
+        struct.pack_into("<I", player, 0x04, 56 + slot)
+        player[0x20:0x30] = f"Bench{slot}".encode("utf-8").ljust(16, b'\x00')
+        struct.pack_into("<I", player, addresses["exist"], 1)
+        struct.pack_into("<I", player, addresses["stateno"], stateno)
+        struct.pack_into("<I", player, addresses["root_addr"], PLAYER_ADDRESS if slot >= 4 else 0)
+        struct.pack_into("<I", player, addresses["helperid"], slot)
+        struct.pack_into("<I", player, addresses["state_owner"], 0xFFFFFFFF)
+        memory.map(address, player)
+    memory.map(GAME_ADDRESS, game)
+    return memory
+
+def generate_context(globals: int) -> DebuggingContext:
+    ## a single player-scoped state, with integer globals packed 2 per variable.
+    ctx = DebuggingContext()
+    scope = StateDefinitionScope(StateScopeType.PLAYER, None)
+    short = DebugTypeInfo("short", TypeCategory.BUILTIN, [], [], 16, Location("<builtin>", 0))
+    for index in range(globals):
+        ctx.globals.append(DebugParameterInfo(f"global{index}", short, scope, [((index // 2) % 60, (index % 2) * 16)], False))
+    ctx.states.append(DebugStateInfo("bench", 0, scope, False, Location("<bench>", 0), [], [Location("<bench>", 1)], []))
+    return ctx
+
+def measure(name: str, run, target: DebuggerTarget, memory: SnapshotMemory, snapshot: bool, repeat: int, ctx: DebuggingContext) -> tuple[str, float, int, int]:
+    best = None
+    for _ in range(repeat):
+        memory.reads = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if snapshot: process.snapshotPlayers(target, ctx)
+            run()
+        elapsed = time.perf_counter() - start
+        target.launch_info.memory.invalidate()
+        best = elapsed if best == None else min(best, elapsed)
+    assert best != None
+    return (name, best, len(memory.reads), sum(count for (_, count) in memory.reads))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark mtldbg memory access against a memory snapshot")
+    parser.add_argument("--database", help = "Debugging database to use (defaults to a synthetic database)")
+    parser.add_argument("--snapshot", help = "Snapshot file to run against, instead of generating one")
+    parser.add_argument("--save", help = "Store the generated snapshot in this file")
+    parser.add_argument("--version", help = "MUGEN version to lay out the snapshot for", choices = list(VERSIONS), default = "1.1b1")
+    parser.add_argument("--helpers", help = "Number of helpers owned by player 1", type = int, default = 16)
+    parser.add_argument("--globals", help = "Number of globals in the synthetic database", type = int, default = 100)
+    parser.add_argument("--repeat", help = "Number of times to run each path, keeping the best result", type = int, default = 5)
+    args = parser.parse_args()
+
+    ctx = database.load(args.database) if args.database != None else generate_context(args.globals)
+    ctx.quiet = True
+    if args.snapshot != None:
+        memory = load_snapshot(args.snapshot)
+        addresses = ADDRESS_DATABASE[struct.unpack("<I", memory.read(SELECT_VERSION_ADDRESS, 4))[0]]
+    else:
+        addresses = VERSIONS[args.version]
+        ## players are placed in the first player-scoped state of the database.
+        stateno = next((state.id for state in ctx.states if state.scope.type == StateScopeType.PLAYER), ctx.states[0].id)
+        memory = generate_snapshot(addresses, args.helpers, stateno)
+        if args.save != None:
+            memory.save(args.save)
+            print(f"Stored snapshot in {args.save}.")
+
+    target = DebuggerTarget(None, DebuggerLaunchInfo(0, 0, {}, None, DebugProcessState.PAUSED, addresses, False, CachedMemory(memory))) # type: ignore
+    game_address = process.getValue(addresses["game"], target, ctx)
+    p1_address = process.getValue(game_address + addresses["player"], target, ctx)
+    players = [address for idx in range(60) if (address := process.getValue(game_address + addresses["player"] + idx * 4, target, ctx)) != 0]
+
+    def list_players():
+        common_function.listPlayers(game_address, p1_address, True, target, ctx)
+
+    def display_variables():
+        for player_address in players:
+            cli_function.displayVariables(player_address, p1_address, target, ctx)
+
+    def read_triggers():
+        for player_address in players:
+            for trigger in list(addresses["triggers"]) + list(addresses["game_triggers"]):
+                common_function.getTriggerValue(trigger, player_address, game_address, target, ctx)
+
+    def write_breakpoints():
+        process.write_breakpoint_table([(state.id, 0) for state in ctx.states[:8]], [], target.launch_info, ctx)
+
+    print(f"{len(players)} players, {len(ctx.globals)} globals, {len(ctx.states)} states")
+    for snapshot in [False, True]:
+        print("")
+        print(f"{'path (snapshot)' if snapshot else 'path':<24}{'time (ms)':>12}{'reads':>10}{'bytes':>10}")
+        for (name, run) in [("list players", list_players), ("display variables", display_variables), ("read triggers", read_triggers), ("write breakpoints", write_breakpoints)]:
+            if snapshot and run == write_breakpoints:
+                continue
+            (name, elapsed, reads, count) = measure(name, run, target, memory, snapshot, args.repeat, ctx)
+            print(f"{name:<24}{elapsed * 1000:>12.3f}{reads:>10}{count:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+## stress benchmark for trigger emission with deeply nested `&&`/`||` chains.
+## operators emit their children speculatively to detect enum types before emitting them for real,
+## so without memoization the emitter does 2^depth work for a nested chain.
+## usage: python benchmarks/bench_nested_triggers.py [max depth]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mtl import builtins
+from mtl.types.context import TranslationContext, CompilerConfiguration
+from mtl.types.shared import Location
+from mtl.parser.trigger import parseTrigger
+from mtl.writer import emit_trigger_recursive
+
+class DisabledMemo(dict):
+    ## memo which never stores anything, to measure emission without memoization.
+    def __setitem__(self, key, value):
+        pass
+
+def make_context() -> TranslationContext:
+    ctx = TranslationContext("benchmark", CompilerConfiguration())
+    ctx.types.extend(builtins.getBaseTypes())
+    ctx.triggers.extend(builtins.getBaseTriggers())
+    ctx.templates.extend(builtins.getBaseTemplates())
+    return ctx
+
+def make_trigger(depth: int) -> str:
+    ## builds e.g. `(Time > 0 && (Time < 1 || (Time > 2 && ...)))`
+    result = f"Time = {depth}"
+    for level in reversed(range(depth)):
+        operator = "&&" if level % 2 == 0 else "||"
+        comparison = f"Time > {level}" if level % 2 == 0 else f"Time < {level}"
+        result = f"({comparison} {operator} {result})"
+    return result
+
+def measure(ctx: TranslationContext, text: str, memoize: bool) -> tuple[float, str]:
+    tree = parseTrigger(text, Location("benchmark", 0))
+    start = time.perf_counter()
+    result = emit_trigger_recursive(tree, [], ctx, memo = None if memoize else DisabledMemo())
+    return (time.perf_counter() - start, result.value)
+
+def main():
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 14
+    ctx = make_context()
+    print(f"{'depth':>6} {'memoized (s)':>14} {'unmemoized (s)':>16} {'speedup':>9}")
+    for depth in range(2, max_depth + 1, 2):
+        text = make_trigger(depth)
+        (memoized, memoized_value) = measure(ctx, text, True)
+        (unmemoized, unmemoized_value) = measure(ctx, text, False)
+        if memoized_value != unmemoized_value:
+            raise RuntimeError(f"Memoized output differs from unmemoized output at depth {depth}.")
+        print(f"{depth:>6} {memoized:>14.4f} {unmemoized:>16.4f} {unmemoized / memoized:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+## memory benchmark for the parsed representation of source files.
+## loads sample/UnitTest and stdlib/common1.mtl (without translating them) and reports the number of
+## TriggerTree and Location objects retained, the traced Python heap, and the peak RSS of the process.
+## usage: python benchmarks/bench_parse_memory.py [repeat count]
+import gc
+import io
+import os
+import sys
+import contextlib
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from mtl import loader
+from mtl.types.context import CompilerConfiguration
+from mtl.types.shared import Location
+from mtl.types.trigger import TriggerTree
+
+SOURCES = [
+    os.path.join(ROOT, "stdlib", "common1.mtl"),
+    os.path.join(ROOT, "stdlib", "libmtl.inc"),
+    os.path.join(ROOT, "sample", "UnitTest", "UnitTest.states0.mtl"),
+    os.path.join(ROOT, "sample", "UnitTest", "UnitTest.states1.mtl"),
+    os.path.join(ROOT, "sample", "UnitTest", "UnitTest.commands.mtl"),
+]
+
+def peak_rss() -> str:
+    try:
+        import resource
+    except ImportError:
+        return "unavailable"
+    ## ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin": usage //= 1024
+    return f"{usage / 1024:.1f} MiB"
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tracemalloc.start()
+
+    ## load the sources several times over to approximate the size of a large character.
+    loaded = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for source in SOURCES:
+                loaded.append(loader.loadFile(source, CompilerConfiguration(), []))
+
+    gc.collect()
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    trees = len([obj for obj in gc.get_objects() if isinstance(obj, TriggerTree)])
+    locations = len([obj for obj in gc.get_objects() if isinstance(obj, Location)])
+
+    print(f"sources loaded:        {len(loaded)}")
+    print(f"TriggerTree objects:   {trees}")
+    print(f"Location objects:      {locations}")
+    print(f"traced heap retained:  {current / (1024 * 1024):.1f} MiB")
+    print(f"traced heap peak:      {peak / (1024 * 1024):.1f} MiB")
+    print(f"peak RSS:              {peak_rss()}")
+
+if __name__ == "__main__":
+    main()
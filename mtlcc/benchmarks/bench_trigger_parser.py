@@ -0,0 +1,78 @@
+## throughput benchmark for the trigger parser.
+## parses every property value from the state controllers in stdlib/common1.mtl and sample/kfm.cns
+## and reports the number of expressions parsed per second.
+## the "parser" line times the tokenizer and tree builder directly (`parseExpression`), bypassing the parse cache, and is the figure to compare
+## parser changes against. the "cached" line times `parseTrigger` as the compiler calls it, starting from an empty cache: every repeat after the
+## first, and every expression repeated within the sources, is a cache hit plus a `relocateTrigger` copy. its hit/miss counts are reported with it.
+## usage: python benchmarks/bench_trigger_parser.py [repeat count]
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from mtl.parser import ini
+from mtl.parser.trigger import parseTrigger, parseExpression, parseTriggerCached, getParseCacheInfo
+from mtl.types.ini import INIParserContext
+from mtl.types.shared import Location, TranslationError
+
+SOURCES = [
+    os.path.join(ROOT, "stdlib", "common1.mtl"),
+    os.path.join(ROOT, "sample", "kfm.cns"),
+]
+
+def collect_expressions() -> list[tuple[str, Location]]:
+    expressions: list[tuple[str, Location]] = []
+    for source in SOURCES:
+        with open(source, errors="ignore") as f:
+            sections = ini.parse(f.read(), INIParserContext(source, Location(source, 0)))
+        for section in sections:
+            if not section.name.lower().startswith("state "):
+                continue
+            for property in section.properties:
+                if not property.key.lower().startswith("mtl."):
+                    expressions.append((property.value, property.location))
+    return expressions
+
+def parse_uncached(expression: str, location: Location):
+    ## any exception counts as a failure, as `parseTrigger` reports them all as a TranslationError.
+    try:
+        parseExpression(expression, location)
+        return True
+    except Exception:
+        return False
+
+def parse_cached(expression: str, location: Location):
+    try:
+        parseTrigger(expression, location)
+        return True
+    except TranslationError:
+        return False
+
+def run(expressions: list[tuple[str, Location]], repeat: int, parse) -> tuple[int, float]:
+    failed = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for (expression, location) in expressions:
+            if not parse(expression, location):
+                failed += 1
+    return (failed // repeat, time.perf_counter() - start)
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    expressions = collect_expressions()
+    parsed = len(expressions) * repeat
+
+    (failed, elapsed) = run(expressions, repeat, parse_uncached)
+    parseTriggerCached.cache_clear()
+    (_, cached_elapsed) = run(expressions, repeat, parse_cached)
+    info = getParseCacheInfo()
+
+    print(f"expressions:     {len(expressions)} (x{repeat})")
+    print(f"failed to parse: {failed}")
+    print(f"parser:          {elapsed:.3f} s, {parsed / elapsed:,.0f} expressions/sec")
+    print(f"cached:          {cached_elapsed:.3f} s, {parsed / cached_elapsed:,.0f} expressions/sec ({info.hits} hits, {info.misses} misses)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+## reproducibility check for compiler output.
+## compiles a project twice in separate processes (with the compile cache disabled) and checks every output file is byte-identical.
+## usage: python benchmarks/check_reproducible.py [path to .def file]
+## with no .def file, a synthetic character (see `synthetic.py`) is generated with its default shape and checked instead.
+import os
+import sys
+import filecmp
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import CharacterShape, generate_character
+
+def build(input: str, output: str):
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "mtlcc.py"), "--no-cache", input, output], cwd = ROOT, capture_output = True, text = True)
+    if result.returncode != 0 or not os.path.exists(output):
+        print(result.stdout)
+        print(result.stderr)
+        raise Exception(f"Failed to compile {input}.")
+
+def main():
+    with tempfile.TemporaryDirectory() as working:
+        input = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else generate_character(os.path.join(working, "character"), CharacterShape())
+        first = os.path.join(working, "first")
+        second = os.path.join(working, "second")
+        build(input, first)
+        build(input, second)
+
+        files = sorted(os.listdir(first))
+        if sorted(os.listdir(second)) != files:
+            print(f"Builds produced different sets of files: {files} vs {sorted(os.listdir(second))}")
+            sys.exit(1)
+        (match, mismatch, errors) = filecmp.cmpfiles(first, second, files, shallow = False)
+
+    print(f"input:      {input}")
+    print(f"identical:  {len(match)} files")
+    for file in mismatch + errors:
+        print(f"DIFFERENT:  {file}")
+    if len(mismatch) + len(errors) != 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+## generator for synthetic MTL characters, used by `bench_compiler.py`.
+## the generated character is not meant to be playable, it only needs to exercise each part of the compiler:
+## - `statedefs` statedefs (split across `files` state files) with `controllers` controllers each;
+## - a chain of `template_depth` templates, each calling the previous one;
+## - `triggers` user-defined triggers and `structs` structure types, each with a global variable of that type;
+## - `includes` library files holding the triggers and structures, included from the first state file.
+## usage: python benchmarks/synthetic.py <output folder> [key=value ...] (e.g. statedefs=500 controllers=20)
+import os
+import sys
+import shutil
+from dataclasses import dataclass, fields
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE = os.path.join(ROOT, "sample", "UnitTest")
+
+@dataclass
+class CharacterShape:
+    statedefs: int = 100
+    controllers: int = 10
+    template_depth: int = 3
+    triggers: int = 20
+    structs: int = 4
+    includes: int = 2
+    files: int = 2
+
+    def describe(self) -> str:
+        return ", ".join(f"{field.name}={getattr(self, field.name)}" for field in fields(self))
+
+def parse_shape(args: list[str]) -> CharacterShape:
+    shape = CharacterShape()
+    for arg in args:
+        (key, value) = arg.split("=", 1)
+        if key not in [field.name for field in fields(shape)]:
+            raise ValueError(f"Unknown character shape property {key}.")
+        setattr(shape, key, int(value))
+    return shape
+
+def trigger_name(index: int) -> str:
+    return f"BenchTrigger{index}"
+
+def struct_name(index: int) -> str:
+    return f"BenchStruct{index}"
+
+def template_name(level: int) -> str:
+    return f"BenchTemplate{level}"
+
+def write_library(lines: list[str], shape: CharacterShape, library: int, libraries: int):
+    ## triggers and structures are spread evenly across the libraries.
+    for index in range(library, shape.triggers, libraries):
+        lines += ["[Define Trigger]", f"name = {trigger_name(index)}", "type = int", f"value = ifelse(x > {index}, x - {index}, x + {index})", ""]
+        lines += ["[Define Parameters]", "x = int", ""]
+    for index in range(library, shape.structs, libraries):
+        lines += ["[Define Structure]", f"name = {struct_name(index)}", ""]
+        lines += ["[Define Members]", "first = int", "second = int", ""]
+
+def write_templates(lines: list[str], shape: CharacterShape):
+    ## each template does some work on a local and then calls the template below it.
+    for level in range(shape.template_depth):
+        lines += ["[Define Template]", f"name = {template_name(level)}", f"local = counter{level} = int", ""]
+        lines += ["[Define Parameters]", "amount = int", ""]
+        lines += ["[State ]", "type = Null", f"triggerall = counter{level} < amount + {level}", f"trigger1 = counter{level} := counter{level} + amount", ""]
+        if level > 0:
+            lines += ["[State ]", f"type = {template_name(level - 1)}", f"trigger1 = counter{level} > {level}", f"amount = counter{level} * 2", ""]
+        lines += ["[State ]", "type = Null", f"trigger1 = counter{level} = amount", f"trigger2 = Time > {level} && counter{level} != 0", ""]
+
+def write_controller(lines: list[str], shape: CharacterShape, state: int, index: int):
+    kind = (state + index) % 5
+    trigger = trigger_name((state + index) % shape.triggers) if shape.triggers > 0 else ""
+    if kind == 0:
+        value = f"{trigger}(Time + {index})" if trigger != "" else f"Time + {index}"
+        lines += ["[State ]", "type = VarSet", f"trigger1 = Time > {index}", f"local{state % 4} = {value}", ""]
+    elif kind == 1:
+        condition = f"{trigger}(local{state % 4}) > {index}" if trigger != "" else f"local{state % 4} > {index}"
+        lines += ["[State ]", "type = Null", "triggerall = Alive", f"trigger1 = {condition} && Life > {index}", f"trigger2 = (Time % {index + 2}) = 0 || Power >= {index * 10}", ""]
+    elif kind == 2 and shape.template_depth > 0:
+        lines += ["[State ]", f"type = {template_name(shape.template_depth - 1)}", f"trigger1 = Time = {index}", f"amount = local{state % 4} + {index}", ""]
+    elif kind == 3 and shape.structs > 0:
+        struct = (state + index) % shape.structs
+        lines += ["[State ]", "type = VarSet", f"trigger1 = Time = {index}", f"benchGlobal{struct} = {struct_name(struct)}(Time, {index})", ""]
+        lines += ["[State ]", "type = Null", f"trigger1 = benchGlobal{struct} first > {index}", ""]
+    else:
+        lines += ["[State ]", "type = PosAdd", f"trigger1 = Time > {index} && local{(state + 1) % 4} < {index * 3}", f"x = {index % 7}", ""]
+
+def write_statedef(lines: list[str], shape: CharacterShape, state: int):
+    lines += [f"[Statedef BENCH_{state}]", "type = S", "movetype = I", "physics = S", "anim = 0"]
+    lines += [f"local = local{index} = int" for index in range(4)]
+    lines += [""]
+    for index in range(max(0, shape.controllers - 1)):
+        write_controller(lines, shape, state, index)
+    lines += ["[State ]", "type = ChangeState", "trigger1 = AnimTime = 0", f"value = BENCH_{(state + 1) % shape.statedefs}", ""]
+
+def generate_character(target: str, shape: CharacterShape) -> str:
+    ## writes the character to `target` and returns the path to its DEF file.
+    os.makedirs(target, exist_ok = True)
+    for asset in ["UnitTest.air", "UnitTest.cns", "UnitTest.sff", "UnitTest.snd"]:
+        shutil.copy2(os.path.join(SAMPLE, "system", asset), os.path.join(target, asset))
+    shutil.copy2(os.path.join(SAMPLE, "UnitTest.commands.mtl"), os.path.join(target, "Bench.commands.mtl"))
+
+    libraries = max(shape.includes, 1)
+    for library in range(shape.includes):
+        lines: list[str] = []
+        write_library(lines, shape, library, libraries)
+        with open(os.path.join(target, f"BenchLibrary{library}.inc"), mode="w") as f:
+            f.write("\n".join(lines))
+
+    files = max(1, min(shape.files, shape.statedefs))
+    state_files: list[str] = []
+    for file in range(files):
+        lines: list[str] = []
+        if file == 0:
+            for library in range(shape.includes):
+                lines += ["[Include]", f"source = BenchLibrary{library}.inc", ""]
+            if shape.includes == 0:
+                write_library(lines, shape, 0, 1)
+            write_templates(lines, shape)
+        for state in range(file, shape.statedefs, files):
+            write_statedef(lines, shape, state)
+        state_files.append(f"Bench.states{file}.mtl")
+        with open(os.path.join(target, state_files[-1]), mode="w") as f:
+            f.write("\n".join(lines))
+
+    definition = os.path.join(target, "Bench.def")
+    with open(definition, mode="w") as f:
+        f.write("[Info]\nname = \"Bench\"\ndisplayname = \"MTL Benchmark\"\nmugenversion = 1.0\nlocalcoord = 320,240\n\n")
+        f.write("[Files]\ncmd = Bench.commands.mtl\nstcommon = common1.mtl\n")
+        for (index, file) in enumerate(state_files):
+            f.write(f"st{'' if index == 0 else index} = {file}\n")
+        f.write("cns = UnitTest.cns\nsprite = UnitTest.sff\nanim = UnitTest.air\nsound = UnitTest.snd\n")
+    return definition
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python benchmarks/synthetic.py <output folder> [key=value ...]")
+        sys.exit(1)
+    shape = parse_shape(sys.argv[2:])
+    print(f"Generated {generate_character(sys.argv[1], shape)} ({shape.describe()}).")
+
+if __name__ == "__main__":
+    main()
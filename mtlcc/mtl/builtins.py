@@ -7,6 +7,10 @@ from mtl.utils.func import tryparse
 from mtl.writer import emit_enum
 
 from ctypes import c_int32
+from dataclasses import dataclass
+from functools import cache
+from types import MappingProxyType
+from typing import Mapping, Sequence, TypeVar
 
 def getBaseTypes() -> list[TypeDefinition]:
     return [
@@ -503,4 +507,39 @@ def getBaseTemplates() -> list[TemplateDefinition]:
         TemplateDefinition("VelSet", [TemplateParameter("x", [TypeSpecifier(BUILTIN_FLOAT)], False), TemplateParameter("y", [TypeSpecifier(BUILTIN_FLOAT)], False)], [], [], Location("mtl/builtins.py", line_number()), TemplateCategory.BUILTIN),
         TemplateDefinition("VictoryQuote", [TemplateParameter("value", [TypeSpecifier(BUILTIN_INT)], False)], [], [], Location("mtl/builtins.py", line_number()), TemplateCategory.BUILTIN),
         TemplateDefinition("Width", [TemplateParameter("edge", [TypeSpecifier(BUILTIN_INT), TypeSpecifier(BUILTIN_INT)], False), TemplateParameter("player", [TypeSpecifier(BUILTIN_INT), TypeSpecifier(BUILTIN_INT)], False), TemplateParameter("value", [TypeSpecifier(BUILTIN_INT), TypeSpecifier(BUILTIN_INT)], False)], [], [], Location("mtl/builtins.py", line_number()), TemplateCategory.BUILTIN)
-    ]
\ No newline at end of file
+    ]
+
+T = TypeVar('T', TypeDefinition, TriggerDefinition, TemplateDefinition)
+
+## the builtin types, triggers and templates are the same for every translation, so they are built once per process
+## and shared by every TranslationContext (see `translateContext`). they must not be modified after creation;
+## `no_numeric` removes BUILTIN_NUMERIC from the context's copy of the type list, not from the shared table.
+@dataclass(frozen=True)
+class BuiltinTables:
+    types: tuple[TypeDefinition, ...]
+    triggers: tuple[TriggerDefinition, ...]
+    templates: tuple[TemplateDefinition, ...]
+    ## lowercase name -> every definition with that name in definition order (i.e. the overload group for triggers).
+    type_index: Mapping[str, tuple[TypeDefinition, ...]]
+    trigger_index: Mapping[str, tuple[TriggerDefinition, ...]]
+    template_index: Mapping[str, tuple[TemplateDefinition, ...]]
+
+def buildIndex(items: Sequence[T]) -> Mapping[str, tuple[T, ...]]:
+    index: dict[str, list[T]] = {}
+    for item in items:
+        index.setdefault(item.name.lower(), []).append(item)
+    return MappingProxyType({name: tuple(group) for (name, group) in index.items()})
+
+@cache
+def getBuiltinTables() -> BuiltinTables:
+    types = tuple(getBaseTypes())
+    triggers = tuple(getBaseTriggers())
+    templates = getBaseTemplates()
+    for template in templates:
+        addDefaultParameters(template)
+    return BuiltinTables(types, triggers, tuple(templates), buildIndex(types), buildIndex(triggers), buildIndex(templates))
+
+def addDefaultParameters(template: TemplateDefinition):
+    ## add the default parameters ignorehitpause and persistent, which every state controller accepts.
+    template.params.append(TemplateParameter("ignorehitpause", [TypeSpecifier(BUILTIN_BOOL)], False))
+    template.params.append(TemplateParameter("persistent", [TypeSpecifier(BUILTIN_INT)], False))
@@ -0,0 +1,222 @@
+## long-running compile server (`mtlcc --daemon`).
+## the daemon keeps the compiler loaded in a single process, so repeated builds skip interpreter startup and keep the trigger parse cache warm.
+## each loaded source file (including the stdlib) is kept in memory (see `cache.MemoryCache`), so a rebuild only parses the files which changed.
+## the builtin type, trigger and template tables are built once per process (see `builtins.getBuiltinTables`), and each project's
+## common statedefs (e.g. common1.mtl) are kept after type checking and trigger replacement, along with their output, so a rebuild
+## only checks and emits them again if they or the definitions they depend on changed (see `translator.restoreCommonStatedefs`).
+## projects can also be watched: their source files and assets are polled for changes, and rebuilt whenever one changes.
+##
+## requests are JSON-RPC 2.0 messages, one per line, read from stdin (the default) or from TCP connections on localhost (`--port`).
+## compiler output is captured and returned in the result rather than written to stdout. supported methods:
+## - build(input, output, incremental = false): builds the project at `input` (path to the DEF file) into the folder `output`.
+## - check(input): checks the project for errors without writing any output (see `mtlcc.runCheckFromDef`).
+## - watch(input, output = null, incremental = false): builds (or checks, if `output` is null) the project now and whenever its files change,
+##   sending the result of each rebuild as a `rebuilt` notification to the client which requested the watch.
+## - unwatch(input): stops watching the project.
+## - status(): lists the watched projects and cached files.
+## - shutdown(): stops the daemon.
+## build, check and watch results hold `success`, `errors` and `warnings` (each a list of {message, file, line}), `duration` in seconds,
+## `reloaded` (the files which had to be loaded from disk rather than memory), and `log` (the compiler output).
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Any, TextIO
+
+from mtl import project
+from mtl.types.shared import Diagnostic, DiagnosticLevel
+from mtl.utils import cache, diagnostics
+
+## standard JSON-RPC error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+@dataclass
+class Watch:
+    input: str
+    output: Optional[str]
+    incremental: bool
+    notify: Callable[[dict[str, Any]], None]
+    ## signature of each file the project depended on at its last build.
+    signatures: dict[str, Optional[tuple[int, int]]] = field(default_factory = lambda: {})
+
+def get_signature(file: str) -> Optional[tuple[int, int]]:
+    try:
+        return cache.get_file_signature(file)
+    except OSError:
+        return None
+
+def diagnostic_to_json(diagnostic: Diagnostic) -> dict[str, Any]:
+    return {"message": diagnostic.message, "file": os.path.realpath(diagnostic.location.filename), "line": diagnostic.location.line}
+
+class CompileServer:
+    def __init__(self, cache_dir: Optional[str], jobs: int, interval: float):
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.interval = interval
+        ## builds are serialized, as the compiler keeps global state (e.g. the active diagnostics and profiler).
+        self.lock = threading.Lock()
+        self.watches: dict[str, Watch] = {}
+        self.stopped = threading.Event()
+        cache.memory = cache.MemoryCache()
+
+    def run(self, input: str, output: Optional[str], incremental: bool) -> tuple[dict[str, Any], list[str]]:
+        ## builds or checks a project, and returns the result along with every file the project depends on.
+        import mtlcc
+        with self.lock:
+            assert cache.memory != None
+            cache.memory.take_loaded()
+            start = time.perf_counter()
+            log = io.StringIO()
+            with diagnostics.collect() as found, contextlib.redirect_stdout(log):
+                projectContext = project.loadDefinition(input)
+                projectContext.cache_dir = self.cache_dir
+                projectContext.incremental = incremental
+                projectContext.jobs = self.jobs
+                if output == None:
+                    found = mtlcc.runCheckFromDef(input, projectContext)
+                else:
+                    mtlcc.runCompilerFromDef(input, output, projectContext)
+            (loaded, reloaded) = cache.memory.take_loaded()
+
+        errors = [diagnostic_to_json(d) for d in found if d.level == DiagnosticLevel.ERROR]
+        warnings = [diagnostic_to_json(d) for d in found if d.level == DiagnosticLevel.WARNING]
+        result = {
+            "success": len(errors) == 0, "errors": errors, "warnings": warnings, "duration": time.perf_counter() - start,
+            "reloaded": [os.path.realpath(file) for file in reloaded], "log": log.getvalue().splitlines()
+        }
+        assets = [projectContext.anim_file, projectContext.snd_file, projectContext.spr_file, projectContext.cns_file, projectContext.ai_file]
+        depends = [input] + loaded + [asset for asset in assets if asset != None and asset != ""]
+        return (result, list(dict.fromkeys(os.path.realpath(file) for file in depends)))
+
+    def build(self, input: str, output: str, incremental: bool = False) -> dict[str, Any]:
+        return self.run(input, output, incremental)[0]
+
+    def check(self, input: str) -> dict[str, Any]:
+        return self.run(input, None, False)[0]
+
+    def watch(self, input: str, notify: Callable[[dict[str, Any]], None], output: Optional[str] = None, incremental: bool = False) -> dict[str, Any]:
+        watch = Watch(input, output, incremental, notify)
+        result = self.rebuild(watch)
+        self.watches[os.path.realpath(input)] = watch
+        return result
+
+    def unwatch(self, input: str) -> bool:
+        return self.watches.pop(os.path.realpath(input), None) != None
+
+    def status(self) -> dict[str, Any]:
+        assert cache.memory != None
+        return {
+            "watching": [{"input": watch.input, "output": watch.output, "files": len(watch.signatures)} for watch in self.watches.values()],
+            "cached": sorted(set(os.path.realpath(key[0]) for key in cache.memory.entries))
+        }
+
+    def rebuild(self, watch: Watch) -> dict[str, Any]:
+        ## signatures are taken before building, so a change made during the build triggers another one.
+        before = {file: get_signature(file) for file in watch.signatures}
+        (result, depends) = self.run(watch.input, watch.output, watch.incremental)
+        watch.signatures = {file: before[file] if file in before else get_signature(file) for file in depends}
+        return result
+
+    def poll(self):
+        while not self.stopped.wait(self.interval):
+            for watch in list(self.watches.values()):
+                if any(get_signature(file) != signature for (file, signature) in watch.signatures.items()):
+                    try:
+                        result = self.rebuild(watch)
+                    except Exception as exc:
+                        result = {"success": False, "errors": [{"message": f"Internal error: {exc}", "file": None, "line": 0}], "warnings": [], "log": traceback.format_exc().splitlines()}
+                    watch.notify({"jsonrpc": "2.0", "method": "rebuilt", "params": {"input": watch.input, "result": result}})
+
+    def handle(self, line: str, notify: Callable[[dict[str, Any]], None]) -> Optional[dict[str, Any]]:
+        ## handles a single JSON-RPC request, returning the response (or None for notifications).
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as exc:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(exc)}}
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Requests must be objects with a method."}}
+
+        id = request.get("id")
+        params = request.get("params", {})
+        methods: dict[str, Callable[..., Any]] = {
+            "build": self.build, "check": self.check, "unwatch": self.unwatch, "status": self.status,
+            "watch": lambda **kwargs: self.watch(notify = notify, **kwargs),
+            "shutdown": self.stopped.set,
+        }
+        try:
+            if (method := methods.get(request["method"])) == None:
+                return {"jsonrpc": "2.0", "id": id, "error": {"code": METHOD_NOT_FOUND, "message": f"Unknown method {request['method']}."}}
+            if not isinstance(params, dict):
+                return {"jsonrpc": "2.0", "id": id, "error": {"code": INVALID_PARAMS, "message": "Parameters must be passed by name."}}
+            result = method(**params)
+        except TypeError as exc:
+            return {"jsonrpc": "2.0", "id": id, "error": {"code": INVALID_PARAMS, "message": str(exc)}}
+        except Exception as exc:
+            return {"jsonrpc": "2.0", "id": id, "error": {"code": INTERNAL_ERROR, "message": str(exc), "data": traceback.format_exc().splitlines()}}
+        return None if id == None else {"jsonrpc": "2.0", "id": id, "result": result}
+
+def make_writer(stream: TextIO) -> Callable[[dict[str, Any]], None]:
+    ## responses and notifications can be sent from the polling thread, so writes are serialized.
+    lock = threading.Lock()
+    def write(message: dict[str, Any]):
+        with lock:
+            stream.write(json.dumps(message) + "\n")
+            stream.flush()
+    return write
+
+def serve_stdio(server: CompileServer):
+    ## stdout is captured while compiling, so responses go to the original stream.
+    write = make_writer(sys.stdout)
+    for line in sys.stdin:
+        if line.strip() == "":
+            continue
+        if (response := server.handle(line, write)) != None:
+            write(response)
+        if server.stopped.is_set():
+            break
+    server.stopped.set()
+
+def serve_socket(server: CompileServer, port: int):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            stream = io.TextIOWrapper(self.wfile, encoding = "utf-8", write_through = True)
+            write = make_writer(stream)
+            for line in self.rfile:
+                if line.strip() == b"":
+                    continue
+                if (response := server.handle(line.decode("utf-8"), write)) != None:
+                    write(response)
+                if server.stopped.is_set():
+                    break
+            ## watches registered by this client cannot notify it once it disconnects.
+            for (input, watch) in list(server.watches.items()):
+                if watch.notify == write:
+                    server.watches.pop(input, None)
+
+    class Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    with Server(("127.0.0.1", port), Handler) as tcp:
+        print(f"mtlcc daemon listening on 127.0.0.1:{tcp.server_address[1]}", file = sys.stderr)
+        threading.Thread(target = tcp.serve_forever, daemon = True).start()
+        server.stopped.wait()
+        tcp.shutdown()
+
+def runDaemon(cache_dir: Optional[str], jobs: int = 1, port: Optional[int] = None, interval: float = 0.5):
+    server = CompileServer(cache_dir, jobs, interval)
+    threading.Thread(target = server.poll, daemon = True).start()
+    if port == None:
+        serve_stdio(server)
+    else:
+        serve_socket(server, port)
@@ -8,8 +8,8 @@ from mtl.debugging.commands import DebuggerCommand, processDebugCommand
 from mtl.types.translation import TypeCategory
 from mtl.types.debugging import DebugParameterInfo, DebuggerTarget, DebuggingContext, DebugTypeInfo, DebuggerCommand, DebugProcessState
 
-from mtl.utils.func import mask_variable, search_file, match_filenames
-from mtl.utils.debug import get_state_by_id, get_state_by_name
+from mtl.utils.func import mask_variable, search_file
+from mtl.utils.debug import get_state_by_id, get_state_by_name, find_location
 
 def print_variable(base_addr: int, scope: str, var: DebugParameterInfo, debugger: DebuggerTarget, ctx: DebuggingContext):
     alloc = var.allocations[0]
@@ -22,8 +22,9 @@ def print_variable(base_addr: int, scope: str, var: DebugParameterInfo, debugger
     if var.type.name == "bool": 
         target_value = "true" if target_value != 0 else "false"
     elif var.type.name == "state":
-        if (state := next(filter(lambda k: str(k.id) == str(target_value), ctx.states), None)) != None:
-            target_value = state.name
+        ctx.index_states()
+        if len(matches := ctx.state_ids.get(int(target_value), [])) != 0:
+            target_value = ctx.states[matches[0]].name
     elif var.type.category == TypeCategory.ENUM and isinstance(var.type, DebugTypeInfo):
         if int(target_value) < len(var.type.members):
             target_value = var.type.members[int(target_value)]
@@ -46,8 +47,7 @@ def displayVariables(base_addr: int, p1_address: int, target: DebuggerTarget, ct
         return
     scope = state.scope
     ## display a header for the player
-    player_id = process.getValue(base_addr + 0x04, target, ctx)
-    helper_id = process.getValue(base_addr + target.launch_info.database["helperid"], target, ctx)
+    (player_id, helper_id) = process.getValues([base_addr + 0x04, base_addr + target.launch_info.database["helperid"]], target, ctx)
     player_scope = "Player" if base_addr == p1_address else f"Helper({helper_id})"
     player_name = process.getString(base_addr + 0x20, target, ctx)
     print(f"Player {player_id} - {player_scope} - {player_name}")
@@ -64,6 +64,7 @@ def displayMultipleVariables(scope: str, target: DebuggerTarget, ctx: DebuggingC
     ## fetch a list of all targets to display variables for.
     ## we have to suspend the process here otherwise the data will likely be junk!
     process.suspendExternal(target)
+    process.snapshotPlayers(target, ctx)
 
     ## iterate each player
     game_address = process.getValue(target.launch_info.database["game"], target, ctx)
@@ -79,8 +80,7 @@ def displayMultipleVariables(scope: str, target: DebuggerTarget, ctx: DebuggingC
         player_address = process.getValue(game_address + target.launch_info.database["player"] + idx * 4, target, ctx)
         if player_address == 0:
             continue
-        root_address = process.getValue(player_address + target.launch_info.database["root_addr"], target, ctx)
-        helper_id = process.getValue(player_address + target.launch_info.database["helperid"], target, ctx)
+        (root_address, helper_id) = process.getValues([player_address + target.launch_info.database["root_addr"], player_address + target.launch_info.database["helperid"]], target, ctx)
         if (player_address == p1_address and scope in ["all", "player"]) \
            or (root_address == p1_address and scope == "all") \
            or (root_address == p1_address and scope == f"helper({helper_id})"):
@@ -162,21 +162,10 @@ def runDebugger(target: str, mugen: str, p2: str, ai: str):
                     # if it's a statedef set on controller 0.
                     match = None
                     match_location = None
-                    match_distance = 99999999
-                    for statedef in ctx.states:
-                        if (fn := match_filenames(filename, statedef.location.filename)) != None:
-                            if line >= statedef.location.line and (line - statedef.location.line) < match_distance:
-                                match = (statedef.id, 0)
-                                match_location = statedef.states[0]
-                                match_location.filename = fn
-                                match_distance = line - statedef.location.line
-                            for cindex in range(len(statedef.states)):
-                                controller = statedef.states[cindex]
-                                if line >= controller.line and (line - controller.line) < match_distance:
-                                    match = (statedef.id, cindex)
-                                    match_location = controller
-                                    match_location.filename = fn
-                                    match_distance = line - controller.line
+                    if (found := find_location(filename, line, ctx)) != None:
+                        statedef = ctx.states[found[0]]
+                        match = (statedef.id, found[1])
+                        match_location = statedef.states[found[1]]
                     if match == None:
                         print(f"Could not determine the state or controller to use for breakpoint {filename}:{line}")
                     elif debugger != None:
@@ -295,6 +284,7 @@ def runDebugger(target: str, mugen: str, p2: str, ai: str):
                         print(f"Offsets for trigger with name {request.params[1]} are not known; cannot display value.")
                         continue
                     offset = debugger.launch_info.database["triggers"][trigger]
+                    process.snapshotPlayers(debugger, ctx)
                     raw_value = process.getValue(ctx.current_owner + offset[0], debugger, ctx)
                     if offset[1] == int:
                         value = raw_value
@@ -368,6 +358,7 @@ def runDebugger(target: str, mugen: str, p2: str, ai: str):
                     if ctx.current_breakpoint == None or debugger == None:
                         print("Can't show variables unless a breakpoint has been reached.")
                         continue
+                    process.snapshotPlayers(debugger, ctx)
                     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
                     if game_address == 0:
                         print("Can't fetch variables, game has not been initialized.")
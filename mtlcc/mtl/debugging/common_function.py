@@ -8,8 +8,7 @@ from mtl.types.translation import StateDefinition, StateDefinitionParameters, St
 from mtl.types.context import LoadContext, CompilerConfiguration, TranslationMode
 from mtl.types.debugging import DebuggingContext, DebuggerTarget, DebugTypeInfo
 
-from mtl.utils.func import match_filenames
-from mtl.utils.debug import get_state_by_id
+from mtl.utils.debug import get_state_by_id, find_location
 
 from mtl.project import loadDefinition
 from mtl.parser import ini
@@ -66,23 +65,11 @@ def insertBreakpoint(filename: str, line: int, ctx: DebuggingContext, debugger:
     # find the closest match to `filename:line` in the database,
     # which is either a statedef or a controller.
     # if it's a statedef set on controller 0.
-    match = None
-    match_location = None
-    match_distance = 99999999
-    for statedef in ctx.states:
-        if match_filenames(filename, statedef.location.filename) != None:
-            if line >= statedef.location.line and (line - statedef.location.line) < match_distance:
-                match = (statedef.id, 0)
-                match_location = statedef.states[0]
-                match_distance = line - statedef.location.line
-            for cindex in range(len(statedef.states)):
-                controller = statedef.states[cindex]
-                if line >= controller.line and (line - controller.line) < match_distance and match_filenames(filename, controller.filename) != None:
-                    match = (statedef.id, cindex)
-                    match_location = controller
-                    match_distance = line - controller.line
-    if match == None or match_location == None:
+    if (found := find_location(filename, line, ctx)) == None:
         return None
+    statedef = ctx.states[found[0]]
+    match = (statedef.id, found[1])
+    match_location = statedef.states[found[1]]
     if mode == "bp":
         process.setBreakpoint(match[0], match[1], debugger, ctx)
         return { "filename": match_location.filename, "line": match_location.line, "id": len(ctx.breakpoints) - 1 }
@@ -143,8 +130,7 @@ def listPlayers(game_address: int, p1_address: int, include_enemy: bool, debugge
         player_exist = process.getValue(player_address + debugger.launch_info.database["exist"], debugger, ctx)
         if player_exist == 0:
             continue
-        root_address = process.getValue(player_address + debugger.launch_info.database["root_addr"], debugger, ctx)
-        helper_id = process.getValue(player_address + debugger.launch_info.database["helperid"], debugger, ctx)
+        (root_address, helper_id) = process.getValues([player_address + debugger.launch_info.database["root_addr"], player_address + debugger.launch_info.database["helperid"]], debugger, ctx)
         if player_address == p1_address or root_address == p1_address or include_enemy:
             player_name = process.getString(player_address + 0x20, debugger, ctx)
             player_type = "Player" if idx < 4 else f"Helper({helper_id})"
@@ -1,14 +1,17 @@
 import os
+import struct
+from typing import Any, Iterator, Optional, Sequence
 
 from mtl.types.context import *
 from mtl.types.shared import TranslationError, DebuggerError
-from mtl.utils.compiler import find_trigger, find_type, find, equals_insensitive, compiler_internal
+from mtl.utils.compiler import find_trigger, find_type, compiler_internal
 from mtl.utils.constant import MTL_VERSION, DEBUGGER_VERSION
 from mtl.utils.binary import *
+from mtl.utils.profiler import profiled
+from mtl.utils.debug import add_state_locations, sort_locations
 
 def addStringToDatabase(name: str, ctx: TranslationContext):
-    if name not in ctx.debugging.strings:
-        ctx.debugging.strings.append(name)
+    ctx.debugging.add_string(name)
 
 def getDefRelativePath(name: str, base: str) -> str:
     """
@@ -21,8 +24,11 @@ def getDefRelativePath(name: str, base: str) -> str:
     return os.path.abspath(name)
 
 def addPathToDatabase(name: str, ctx: TranslationContext):
-    addStringToDatabase(getDefRelativePath(name, ctx.filename), ctx)
+    ## every controller references its file, so the resolved path is only computed once per file.
+    if name not in ctx.debugging.path_ids:
+        ctx.debugging.path_ids[name] = ctx.debugging.add_string(getDefRelativePath(name, ctx.filename))
 
+@profiled
 def addTypesToDatabase(ctx: TranslationContext):
     ## iterate each type.
     for type in ctx.types:
@@ -45,8 +51,9 @@ def addTypesToDatabase(ctx: TranslationContext):
                 if (target := find_type(member, ctx)) == None:
                     raise TranslationError(f"Could not identify type specified by name {member}.", type.location)
                 info.members.append(target)
-        ctx.debugging.types.append(info)
+        ctx.debugging.add_type(info)
 
+@profiled
 def addTriggersToDatabase(ctx: TranslationContext):
     for trigger in ctx.triggers:
         info = DebugTriggerInfo(trigger.name, trigger.category, trigger.type, [], [], trigger.exprn, trigger.location)
@@ -58,6 +65,7 @@ def addTriggersToDatabase(ctx: TranslationContext):
             info.parameter_types.append(param.type)
         ctx.debugging.triggers.append(info)
 
+@profiled
 def addTemplatesToDatabase(ctx: TranslationContext):
     for template in ctx.templates:
         info = DebugTemplateInfo(template.name, template.category, [], [], [], [], template.location)
@@ -73,13 +81,17 @@ def addTemplatesToDatabase(ctx: TranslationContext):
             info.local_types.append(param.type)
         ctx.debugging.templates.append(info)
 
+@profiled
 def addGlobalsToDatabase(ctx: TranslationContext):
     for var in ctx.globals:
         info = DebugParameterInfo(var.name, var.type, var.scope, var.allocations, var.is_system)
         addStringToDatabase(var.name, ctx)
         ctx.debugging.globals.append(info)
 
+@profiled
 def addStateDefinitionsToDatabase(ctx: TranslationContext):
+    ## referenced triggers are resolved by name only, so each name is looked up once.
+    resolved: dict[str, Optional[str]] = {}
     for statedef in ctx.statedefs:
         addStringToDatabase(statedef.name, ctx)
         addPathToDatabase(statedef.location.filename, ctx)
@@ -96,172 +108,318 @@ def addStateDefinitionsToDatabase(ctx: TranslationContext):
             addStringToDatabase(controller.name, ctx)
             ctrl_info = DebugControllerInfo(controller.name, [])
             for trigger in controller.properties:
-                addReferencedTriggerToDatabase(trigger.value, ctrl_info, ctx)
+                addReferencedTriggerToDatabase(trigger.value, ctrl_info, ctx, resolved)
             for idx in controller.triggers:
                 for trigger in controller.triggers[idx].triggers:
-                    addReferencedTriggerToDatabase(trigger, ctrl_info, ctx)
+                    addReferencedTriggerToDatabase(trigger, ctrl_info, ctx, resolved)
             info.state_data.append(ctrl_info)
         ctx.debugging.states.append(info)
 
-def addReferencedTriggerToDatabase(trigger: TriggerTree, info: DebugControllerInfo, ctx: TranslationContext):
-    if trigger.node == TriggerTreeNode.ATOM and (resolved := find_trigger(trigger.operator, [], ctx, trigger.location)) != None:
-        if resolved.name not in info.triggers:
-            info.triggers.append(resolved.name)
+def addReferencedTriggerToDatabase(trigger: TriggerTree, info: DebugControllerInfo, ctx: TranslationContext, resolved: dict[str, Optional[str]]):
+    if trigger.node == TriggerTreeNode.ATOM:
+        if trigger.operator not in resolved:
+            match = find_trigger(trigger.operator, [], ctx, trigger.location)
+            resolved[trigger.operator] = match.name if match != None else None
+        if (name := resolved[trigger.operator]) != None and name not in info.triggers:
+            info.triggers.append(name)
     for child in trigger.children:
-        addReferencedTriggerToDatabase(child, info, ctx)
+        addReferencedTriggerToDatabase(child, info, ctx, resolved)
 
+def getTypeId(name: str, ctx: DebuggingContext, location: Location) -> int:
+    if (id := ctx.get_type_id(name)) == None:
+        raise TranslationError(f"Could not find debug info for type definition with name {name}.", location)
+    return id
+
+def getPathId(name: str, ctx: DebuggingContext) -> int:
+    if (id := ctx.path_ids.get(name)) != None:
+        return id
+    return ctx.string_ids[getDefRelativePath(name, ctx.filename)]
+
+## database layout.
+## the header is 80 bytes: the MTL version string (as written by `write_string`) at offset 0 and the database version at offset 16.
+## up to version 2 the tables followed the header as a single sequential stream (see `loadSequential`).
+## from version 3 the header also holds the number of sections at offset 20, and is followed by a table of (offset, count)
+## for each section below. every section except STRING_DATA is an array of fixed-width records, so sections can be located
+## and decoded without reading the rest of the file. variable-length lists are stored as (start, count) ranges into the pool sections.
+INDEXED_VERSION = 3
+SECTION_ENTRY = struct.Struct("<ii")
+(STRINGS, STRING_DATA, TYPES, TYPE_MEMBERS, TRIGGERS, PARAMETERS, TEMPLATES, TEMPLATE_PARAMETERS, SPECIFIERS,
+ GLOBALS, ALLOCATIONS, STATES, LOCALS, CONTROLLERS, CONTROLLER_DATA, REFERENCES) = range(16)
+RECORDS = [
+    ## STRINGS: offset in STRING_DATA, length in bytes.
+    struct.Struct("<ii"),
+    ## STRING_DATA: UTF-8 string contents, the section count is its length in bytes.
+    struct.Struct("<B"),
+    ## TYPES: name, category, size, TYPE_MEMBERS range, file, line.
+    struct.Struct("<ibiiiii"),
+    ## TYPE_MEMBERS: member (a string for enum/flag types and a type otherwise), member name (or -1).
+    struct.Struct("<ii"),
+    ## TRIGGERS: name, category, return type, PARAMETERS range, file, line.
+    struct.Struct("<ibiiiii"),
+    ## PARAMETERS (trigger parameters and template locals): type, name.
+    struct.Struct("<ii"),
+    ## TEMPLATES: name, category, TEMPLATE_PARAMETERS range, PARAMETERS range for locals, file, line.
+    struct.Struct("<ibiiiiii"),
+    ## TEMPLATE_PARAMETERS: name, SPECIFIERS range.
+    struct.Struct("<iii"),
+    ## SPECIFIERS: type.
+    struct.Struct("<i"),
+    ## GLOBALS: name, type, scope, scope target (or -1), ALLOCATIONS range, system.
+    struct.Struct("<iibiiib"),
+    ## ALLOCATIONS: index, offset.
+    struct.Struct("<bb"),
+    ## STATES: name, ID, scope, scope target (or -1), common, file, line, LOCALS range, CONTROLLERS range, CONTROLLER_DATA range.
+    struct.Struct("<iibibiiiiiiii"),
+    ## LOCALS: name, type, ALLOCATIONS range.
+    struct.Struct("<iiii"),
+    ## CONTROLLERS: file, line.
+    struct.Struct("<ii"),
+    ## CONTROLLER_DATA: controller type, REFERENCES range.
+    struct.Struct("<iii"),
+    ## REFERENCES: name of a trigger referenced by a controller.
+    struct.Struct("<i"),
+]
+
+@profiled
 def writeDatabase(filename: str, ctx: DebuggingContext):
-    with open(filename, mode='wb') as f:
-        ## write header
-        write_string(MTL_VERSION, f)
-        f.seek(16)
-        write_integer(DEBUGGER_VERSION, f)
-        f.seek(80)
+    ## every string and type referenced below was interned while the database was built,
+    ## so references are resolved through `string_ids` and `type_ids` rather than searching the tables.
+    strings = ctx.string_ids
+    sections = [bytearray() for _ in RECORDS]
+    counts = [0 for _ in RECORDS]
 
-        ## write strings table
-        write_integer(len(ctx.strings), f)
-        for string in ctx.strings:
-            write_string(string, f)
-
-        ## write types table
-        write_integer(len(ctx.types), f)
-        for type in ctx.types:
-            write_integer(ctx.strings.index(type.name), f)
-            write_byte(type.category.value, f)
-            write_integer(type.size, f)
-            write_short(len(type.members), f)
-            for index in range(len(type.members)):
-                member = type.members[index]
-                if isinstance(member, str):
-                    write_integer(ctx.strings.index(member), f)
-                    if index < len(type.member_names):
-                        write_integer(ctx.strings.index(type.member_names[index]), f)
-                    else:
-                        write_integer(-1, f)
-                elif isinstance(member, TypeDefinition):
-                    if (target := find(ctx.types, lambda k: equals_insensitive(member.name, k.name))) == None: # type: ignore
-                        raise TranslationError(f"Could not find debug info for type definition with name {member.name}.", member.location)
-                    write_integer(ctx.types.index(target), f)
-                    if index < len(type.member_names):
-                        write_integer(ctx.strings.index(type.member_names[index]), f)
-                    else:
-                        write_integer(-1, f)
-            write_integer(ctx.strings.index(getDefRelativePath(type.location.filename, ctx.filename)), f)
-            write_integer(type.location.line, f)
-
-        ## write triggers table
-        write_integer(len(ctx.triggers), f)
-        for trigger in ctx.triggers:
-            write_integer(ctx.strings.index(trigger.name), f)
-            write_byte(trigger.category.value, f)
-            if (target := find(ctx.types, lambda k: equals_insensitive(trigger.returns.name, k.name))) == None:
-                raise TranslationError(f"Could not find debug info for type definition with name {trigger.returns.name}.", trigger.location)
-            write_integer(ctx.types.index(target), f)
-            write_short(len(trigger.parameter_types), f)
-            for index in range(len(trigger.parameter_types)):
-                if (target := find(ctx.types, lambda k: equals_insensitive(trigger.parameter_types[index].name, k.name))) == None:
-                    raise TranslationError(f"Could not find debug info for type definition with name {trigger.parameter_types[index].name}.", trigger.location)
-                write_integer(ctx.types.index(target), f)
-                write_integer(ctx.strings.index(trigger.parameter_names[index]), f)
-            """
-            if trigger.expression != None:
-                write_tree(trigger.expression, f)
-            else:
-                write_byte(-2, f)
-            """
-            write_integer(ctx.strings.index(getDefRelativePath(trigger.location.filename, ctx.filename)), f)
-            write_integer(trigger.location.line, f)
-
-        ## write templates table
-        write_integer(len(ctx.templates), f)
-        for template in ctx.templates:
-            write_integer(ctx.strings.index(template.name), f)
-            write_byte(template.category.value, f)
-            write_short(len(template.parameter_types), f)
-            for index in range(len(template.parameter_types)):
-                write_byte(len(template.parameter_types[index]), f)
-                for param in template.parameter_types[index]:
-                    if (target := find(ctx.types, lambda k: equals_insensitive(param.type.name, k.name))) == None: # type: ignore
-                        raise TranslationError(f"Could not find debug info for type definition with name {param.type.name}.", template.location) # type: ignore
-                    write_integer(ctx.types.index(target), f)
-                write_integer(ctx.strings.index(template.parameter_names[index]), f)
-            write_short(len(template.local_types), f)
-            for index in range(len(template.local_types)):
-                if (target := find(ctx.types, lambda k: equals_insensitive(template.local_types[index].name, k.name))) == None:
-                    raise TranslationError(f"Could not find debug info for type definition with name {template.local_types[index].name}.", template.location)
-                write_integer(ctx.types.index(target), f)
-                write_integer(ctx.strings.index(template.local_names[index]), f)
-            write_integer(ctx.strings.index(getDefRelativePath(template.location.filename, ctx.filename)), f)
-            write_integer(template.location.line, f)
-
-        ## write global variables table
-        write_integer(len(ctx.globals), f)
-        for var in ctx.globals:
-            write_integer(ctx.strings.index(var.name), f)
-            if (target := find(ctx.types, lambda k: equals_insensitive(var.type.name, k.name))) == None: # type: ignore
-                raise TranslationError(f"Could not find debug info for type definition with name {var.type.name}.", template.location) # type: ignore
-            write_integer(ctx.types.index(target), f)
-            write_byte(var.scope.type.value, f)
-            if var.scope.target != None:
-                write_integer(var.scope.target, f)
-            else:
-                write_integer(-1, f)
-            write_short(len(var.allocations), f)
+    def add(section: int, *values: int) -> int:
+        ## appends a record to a section, and returns its index.
+        sections[section] += RECORDS[section].pack(*values)
+        counts[section] += 1
+        return counts[section] - 1
+
+    ## strings table
+    for string in ctx.strings:
+        encoded = string.encode("utf-8")
+        add(STRINGS, len(sections[STRING_DATA]), len(encoded))
+        sections[STRING_DATA] += encoded
+    counts[STRING_DATA] = len(sections[STRING_DATA])
+
+    ## types table
+    for type in ctx.types:
+        start = counts[TYPE_MEMBERS]
+        for index in range(len(type.members)):
+            member = type.members[index]
+            member_name = strings[type.member_names[index]] if index < len(type.member_names) else -1
+            if isinstance(member, str):
+                add(TYPE_MEMBERS, strings[member], member_name)
+            elif isinstance(member, TypeDefinition):
+                add(TYPE_MEMBERS, getTypeId(member.name, ctx, member.location), member_name)
+        add(TYPES, strings[type.name], type.category.value, type.size, start, counts[TYPE_MEMBERS] - start,
+            getPathId(type.location.filename, ctx), type.location.line)
+
+    ## triggers table
+    for trigger in ctx.triggers:
+        start = counts[PARAMETERS]
+        for index in range(len(trigger.parameter_types)):
+            add(PARAMETERS, getTypeId(trigger.parameter_types[index].name, ctx, trigger.location), strings[trigger.parameter_names[index]])
+        add(TRIGGERS, strings[trigger.name], trigger.category.value, getTypeId(trigger.returns.name, ctx, trigger.location), start, counts[PARAMETERS] - start,
+            getPathId(trigger.location.filename, ctx), trigger.location.line)
+
+    ## templates table
+    for template in ctx.templates:
+        params_start = counts[TEMPLATE_PARAMETERS]
+        for index in range(len(template.parameter_types)):
+            specifiers_start = counts[SPECIFIERS]
+            for param in template.parameter_types[index]:
+                add(SPECIFIERS, getTypeId(param.type.name, ctx, template.location)) # type: ignore
+            add(TEMPLATE_PARAMETERS, strings[template.parameter_names[index]], specifiers_start, counts[SPECIFIERS] - specifiers_start)
+        locals_start = counts[PARAMETERS]
+        for index in range(len(template.local_types)):
+            add(PARAMETERS, getTypeId(template.local_types[index].name, ctx, template.location), strings[template.local_names[index]])
+        add(TEMPLATES, strings[template.name], template.category.value, params_start, counts[TEMPLATE_PARAMETERS] - params_start,
+            locals_start, counts[PARAMETERS] - locals_start, getPathId(template.location.filename, ctx), template.location.line)
+
+    ## global variables table
+    for var in ctx.globals:
+        start = counts[ALLOCATIONS]
+        for allocation in var.allocations:
+            add(ALLOCATIONS, allocation[0], allocation[1])
+        add(GLOBALS, strings[var.name], getTypeId(var.type.name, ctx, compiler_internal(None)), var.scope.type.value,
+            var.scope.target if var.scope.target != None else -1, start, len(var.allocations), 1 if var.system else 0)
+
+    ## state definitions
+    for state in ctx.states:
+        locals_start = counts[LOCALS]
+        for var in state.locals:
+            allocations_start = counts[ALLOCATIONS]
             for allocation in var.allocations:
-                write_byte(allocation[0], f)
-                write_byte(allocation[1], f)
-            write_byte(1 if var.system else 0, f)
-
-        ## write state definitions
-        write_integer(len(ctx.states), f)
-        for state in ctx.states:
-            write_integer(ctx.strings.index(state.name), f)
-            write_integer(state.id, f)
-            write_byte(state.scope.type.value, f)
-            if state.scope.target != None:
-                write_integer(state.scope.target, f)
-            else:
-                write_integer(-1, f)
-            write_byte(1 if state.is_common else 0, f)
-            write_integer(ctx.strings.index(getDefRelativePath(state.location.filename, ctx.filename)), f)
-            write_integer(state.location.line, f)
-            write_short(len(state.locals), f)
-            for var in state.locals:
-                write_integer(ctx.strings.index(var.name), f)
-                if (target := find(ctx.types, lambda k: equals_insensitive(var.type.name, k.name))) == None: # type: ignore
-                    raise TranslationError(f"Could not find debug info for type definition with name {var.type.name}.", template.location) # type: ignore
-                write_integer(ctx.types.index(target), f)
-                write_short(len(var.allocations), f)
-                for allocation in var.allocations:
-                    write_byte(allocation[0], f)
-                    write_byte(allocation[1], f)
-            write_short(len(state.states), f)
-            for controller in state.states:
-                write_integer(ctx.strings.index(getDefRelativePath(controller.filename, ctx.filename)), f)
-                write_integer(controller.line, f)
-            ## because the database spec specifies a new table after the controller locations table for controller triggers,
-            ## we need to redo this iteration.
-            write_short(len(state.state_data), f)
-            for controller in state.state_data:
-                write_integer(ctx.strings.index(controller.type), f)
-                write_short(len(controller.triggers), f)
-                for trigger in controller.triggers:
-                    write_integer(ctx.strings.index(trigger), f)
+                add(ALLOCATIONS, allocation[0], allocation[1])
+            add(LOCALS, strings[var.name], getTypeId(var.type.name, ctx, state.location), allocations_start, len(var.allocations))
+        controllers_start = counts[CONTROLLERS]
+        for controller in state.states:
+            add(CONTROLLERS, getPathId(controller.filename, ctx), controller.line)
+        data_start = counts[CONTROLLER_DATA]
+        for controller in state.state_data:
+            references_start = counts[REFERENCES]
+            for trigger in controller.triggers:
+                add(REFERENCES, strings[trigger])
+            add(CONTROLLER_DATA, strings[controller.type], references_start, len(controller.triggers))
+        add(STATES, strings[state.name], state.id, state.scope.type.value, state.scope.target if state.scope.target != None else -1,
+            1 if state.is_common else 0, getPathId(state.location.filename, ctx), state.location.line,
+            locals_start, len(state.locals), controllers_start, len(state.states), data_start, len(state.state_data))
+
+    header = bytearray(80)
+    version = MTL_VERSION.encode("utf-8")
+    header[0:2] = SHORT.pack(len(MTL_VERSION))
+    header[2:2 + len(version)] = version
+    header[16:20] = INTEGER.pack(INDEXED_VERSION)
+    header[20:24] = INTEGER.pack(len(RECORDS))
+    offset = len(header) + SECTION_ENTRY.size * len(RECORDS)
+    for index in range(len(RECORDS)):
+        header += SECTION_ENTRY.pack(offset, counts[index])
+        offset += len(sections[index])
+
+    with open(filename, mode='wb') as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
 
 ## loads context.
 def load(filename: str) -> DebuggingContext:
+    ## the whole file is read at once rather than mapped with mmap, as a live mapping would keep the file locked on Windows
+    ## and stop the compiler from replacing it while the debugger is open.
+    with open(filename, mode='rb') as f:
+        data = f.read()
+    ## there's no need to interpret the MTL header for now.
+    if (version := INTEGER.unpack_from(data, 16)[0]) > DEBUGGER_VERSION:
+        raise DebuggerError(f"Cannot launch debugger: input database has version {version}, which is newer than mtldbg installation version {DEBUGGER_VERSION}.")
+    if version < INDEXED_VERSION:
+        return loadSequential(filename)
+    return loadIndexed(IndexedDatabase(data))
+
+class IndexedDatabase:
+    ## read access to the sections of an indexed database.
+    def __init__(self, data: bytes):
+        self.view = memoryview(data)
+        count = INTEGER.unpack_from(self.view, 20)[0]
+        if count < len(RECORDS):
+            raise DebuggerError(f"Cannot launch debugger: input database only has {count} sections, at least {len(RECORDS)} are required.")
+        ## sections beyond the known ones are ignored.
+        self.sections = list(SECTION_ENTRY.iter_unpack(self.view[80:80 + SECTION_ENTRY.size * count]))[:len(RECORDS)]
+
+    def records(self, section: int, start: int = 0, count: Optional[int] = None) -> Iterator[tuple[Any, ...]]:
+        ## returns the records [start, start + count) of a section, or every record if no count is provided.
+        (offset, total) = self.sections[section]
+        if count == None: count = total - start
+        size = RECORDS[section].size
+        return RECORDS[section].iter_unpack(self.view[offset + start * size:offset + (start + count) * size])
+
+    def data(self, section: int) -> memoryview:
+        (offset, total) = self.sections[section]
+        return self.view[offset:offset + total]
+
+class IndexedStates(Sequence[DebugStateInfo]):
+    ## the states table of an indexed database. the state records are read when the database is loaded (to build the
+    ## state indexes), but each state's locals and controllers are only decoded the first time the state is accessed.
+    def __init__(self, database: IndexedDatabase, ctx: DebuggingContext):
+        self.database = database
+        self.ctx = ctx
+        self.records = list(database.records(STATES))
+        self.decoded: list[Optional[DebugStateInfo]] = [None for _ in self.records]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index): # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if (state := self.decoded[index]) == None:
+            state = self.decode(self.records[index])
+            self.decoded[index] = state
+        return state
+
+    def decode(self, record: tuple[Any, ...]) -> DebugStateInfo:
+        (name, id, scope, target, is_common, filename, line, locals_start, locals_count, controllers_start, controllers_count, data_start, data_count) = record
+        strings = self.ctx.strings
+        sds = StateDefinitionScope(StateScopeType(scope), target if target != -1 else None)
+        locals: list[DebugParameterInfo] = []
+        for (local_name, local_type, allocations_start, allocations_count) in self.database.records(LOCALS, locals_start, locals_count):
+            allocations = list(self.database.records(ALLOCATIONS, allocations_start, allocations_count))
+            locals.append(DebugParameterInfo(strings[local_name], self.ctx.types[local_type], sds, allocations, False))
+        controllers = [Location(strings[file], line) for (file, line) in self.database.records(CONTROLLERS, controllers_start, controllers_count)]
+        controller_data: list[DebugControllerInfo] = []
+        for (ctrl_type, references_start, references_count) in self.database.records(CONTROLLER_DATA, data_start, data_count):
+            triggers = [strings[reference] for (reference,) in self.database.records(REFERENCES, references_start, references_count)]
+            controller_data.append(DebugControllerInfo(strings[ctrl_type], triggers))
+        return DebugStateInfo(strings[name], id, sds, is_common != 0, Location(strings[filename], line), locals, controllers, controller_data)
+
+def loadIndexed(database: IndexedDatabase) -> DebuggingContext:
+    ctx = DebuggingContext()
+
+    ## read strings
+    string_data = database.data(STRING_DATA)
+    for (index, (offset, length)) in enumerate(database.records(STRINGS)):
+        ctx.strings.append(string := str(string_data[offset:offset + length], "utf-8"))
+        ctx.string_ids.setdefault(string, index)
+    strings = ctx.strings
+
+    ## read types. members can reference types defined later in the table, so they are filled in after every type is created.
+    type_records = list(database.records(TYPES))
+    for (name, category, size, _, _, filename, line) in type_records:
+        ctx.add_type(DebugTypeInfo(strings[name], TypeCategory(category), [], [], size, Location(strings[filename], line)))
+    for (target, (_, _, _, members_start, members_count, _, _)) in zip(ctx.types, type_records):
+        for (member, member_name) in database.records(TYPE_MEMBERS, members_start, members_count):
+            if target.category in [TypeCategory.ENUM, TypeCategory.FLAG, TypeCategory.STRING_ENUM, TypeCategory.STRING_FLAG]:
+                target.members.append(strings[member])
+            else:
+                target.members.append(ctx.types[member])
+            if member_name != -1:
+                target.member_names.append(strings[member_name])
+    types = ctx.types
+
+    ## read triggers
+    for (name, category, returns, params_start, params_count, filename, line) in database.records(TRIGGERS):
+        parameters = list(database.records(PARAMETERS, params_start, params_count))
+        ctx.triggers.append(DebugTriggerInfo(strings[name], TriggerCategory(category), types[returns], [types[type] for (type, _) in parameters],
+                                             [strings[param] for (_, param) in parameters], None, Location(strings[filename], line)))
+
+    ## read templates
+    for (name, category, params_start, params_count, locals_start, locals_count, filename, line) in database.records(TEMPLATES):
+        parameter_types: list[list[TypeDefinition] | list[DebugTypeInfo]] = []
+        parameter_names: list[str] = []
+        for (param, specifiers_start, specifiers_count) in database.records(TEMPLATE_PARAMETERS, params_start, params_count):
+            parameter_types.append([types[type] for (type,) in database.records(SPECIFIERS, specifiers_start, specifiers_count)])
+            parameter_names.append(strings[param])
+        local_records = list(database.records(PARAMETERS, locals_start, locals_count))
+        ctx.templates.append(DebugTemplateInfo(strings[name], TemplateCategory(category), parameter_types, parameter_names,
+                                               [types[type] for (type, _) in local_records], [strings[local] for (_, local) in local_records], Location(strings[filename], line)))
+
+    ## read globals
+    for (name, type, scope, target, allocations_start, allocations_count, system) in database.records(GLOBALS):
+        allocations = list(database.records(ALLOCATIONS, allocations_start, allocations_count))
+        ctx.globals.append(DebugParameterInfo(strings[name], types[type], StateDefinitionScope(StateScopeType(scope), target if target != -1 else None), allocations, system == 1))
+
+    ## read state definitions. the state and location indexes are built from the records directly, so states are only decoded when used.
+    states = IndexedStates(database, ctx)
+    controllers = list(database.records(CONTROLLERS))
+    for (index, record) in enumerate(states.records):
+        ctx.state_ids.setdefault(record[1], []).append(index)
+        ctx.state_names.setdefault(strings[record[0]].lower(), []).append(index)
+        add_state_locations(index, strings[record[5]], record[5], record[6], controllers[record[9]:record[9] + record[10]], ctx)
+    sort_locations(ctx)
+    ctx.states = states # type: ignore
+    ctx.indexed_states = len(states)
+    ctx.indexed_locations = len(states)
+
+    return ctx
+
+## loads a database written in the sequential layout used up to version 2.
+def loadSequential(filename: str) -> DebuggingContext:
     ctx = DebuggingContext()
     with open(filename, mode='rb') as f:
-        ## read header
-        ## there's no need to interpret the MTL header for now.
-        f.seek(16)
-        if (version := read_integer(f)) > DEBUGGER_VERSION:
-            raise DebuggerError(f"Cannot launch debugger: input database has version {version}, which is newer than mtldbg installation version {DEBUGGER_VERSION}.")
         f.seek(80)
 
         ## read strings
-        for _ in range(read_integer(f)):
-            ctx.strings.append(read_string(f))
+        for index in range(read_integer(f)):
+            ctx.strings.append(string := read_string(f))
+            ctx.string_ids.setdefault(string, index)
         
         ## read types
         start_index = f.tell()
@@ -275,7 +433,7 @@ def load(filename: str) -> DebuggingContext:
                 f.seek(f.tell() + 8)
             filename = ctx.strings[read_integer(f)]
             line = read_integer(f)
-            ctx.types.append(DebugTypeInfo(name, category, [], [], size, Location(filename, line)))
+            ctx.add_type(DebugTypeInfo(name, category, [], [], size, Location(filename, line)))
 
         ## now seek back to the start of the type table and load members.
         f.seek(start_index)
@@ -381,8 +539,7 @@ def loadStates(states: list[StateDefinition], definition: str) -> DebuggingConte
 
     ## this is basically a re-implementation of functions which exist above but rely on TranslationContext.
     def addStringToDatabaseGen(name: str):
-        if name not in context.strings:
-            context.strings.append(name)
+        context.add_string(name)
 
     def addPathToDatabaseGen(name: str):
         addStringToDatabaseGen(getDefRelativePath(name, definition))
@@ -10,8 +10,8 @@ from mtl.debugging import database, process, common_function
 from mtl.debugging.commands import DebuggerCommand, processDebugIPC, sendResponseIPC
 from mtl.debugging.ipc_code import *
 
-from mtl.utils.debug import get_state_by_id
-from mtl.utils.func import search_file, match_filenames
+from mtl.utils.debug import get_state_by_id, find_location_file
+from mtl.utils.func import search_file, normalize_path
 
 def runDebuggerIPC(target: str, mugen: str, p2: str, ai: str):
     ## the early part of this function is identical to `runDebugger`.
@@ -257,7 +257,7 @@ def runDebuggerIPC(target: str, mugen: str, p2: str, ai: str):
 
 def breakpointInFile(bp: tuple[int, int], path: str, ctx: DebuggingContext) -> bool:
     if (state := get_state_by_id(bp[0], ctx)) != None:
-        if match_filenames(path, state.location.filename) != None:
+        if (key := find_location_file(path, ctx)) != None and key == normalize_path(state.location.filename):
             return True
     return False
 
@@ -270,6 +270,8 @@ def ipcListPlayers(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx: D
     if debugger.launch_info.state not in [DebugProcessState.SUSPENDED_PROCEED, DebugProcessState.SUSPENDED_WAIT, DebugProcessState.PAUSED, DebugProcessState.SUSPENDED_DEBUG]:
         process.suspendExternal(debugger)
 
+    process.snapshotPlayers(debugger, ctx)
+
     ## iterate each player
     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
     if game_address == 0:
@@ -300,6 +302,8 @@ def ipcPlayerDetails(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx:
     if debugger.launch_info.state not in [DebugProcessState.SUSPENDED_PROCEED, DebugProcessState.SUSPENDED_WAIT, DebugProcessState.PAUSED, DebugProcessState.SUSPENDED_DEBUG]:
         process.suspendExternal(debugger)
 
+    process.snapshotPlayers(debugger, ctx)
+
     ## iterate each player
     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
     if game_address == 0:
@@ -316,8 +320,7 @@ def ipcPlayerDetails(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx:
         if player_address == 0:
             continue
             
-        root_address = process.getValue(player_address + debugger.launch_info.database["root_addr"], debugger, ctx)
-        player_id = process.getValue(player_address + 0x04, debugger, ctx)
+        (root_address, player_id) = process.getValues([player_address + debugger.launch_info.database["root_addr"], player_address + 0x04], debugger, ctx)
 
         if target_id == player_id:
             if player_address != p1_address and root_address != p1_address:
@@ -421,6 +424,8 @@ def ipcGetTeamside(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx: D
     
     target_id = params['player']
 
+    process.snapshotPlayers(debugger, ctx)
+
     ## iterate each player
     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
     if game_address == 0:
@@ -437,8 +442,7 @@ def ipcGetTeamside(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx: D
         if player_address == 0:
             continue
 
-        root_address = process.getValue(player_address + debugger.launch_info.database["root_addr"], debugger, ctx)
-        player_id = process.getValue(player_address + 0x04, debugger, ctx)
+        (root_address, player_id) = process.getValues([player_address + debugger.launch_info.database["root_addr"], player_address + 0x04], debugger, ctx)
         if target_id == player_id:
             if player_address != p1_address and root_address != p1_address:
                 teamside = 2
@@ -469,6 +473,8 @@ def ipcGetTrigger(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx: De
     target_id = params['player']
     trigger_name: str = params['trigger']
 
+    process.snapshotPlayers(debugger, ctx)
+
     ## iterate each player
     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
     if game_address == 0:
@@ -512,6 +518,8 @@ def ipcGetVariables(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx:
     target_id = params['player']
     variable_type = params['type']
 
+    process.snapshotPlayers(debugger, ctx)
+
     ## iterate each player
     game_address = process.getValue(debugger.launch_info.database["game"], debugger, ctx)
     if game_address == 0:
@@ -581,28 +589,28 @@ def ipcGetVariables(request: DebuggerRequestIPC, debugger: DebuggerTarget, ctx:
                     "value": "No offset for trigger"
                 })
     if variable_type == "INDEXED_INT" or variable_type == "ALL":
-        for idx in range(60):
+        for (idx, value) in enumerate(process.getVariableArray(target_address, 60, False, False, debugger, ctx)):
             detailResult.append({
                 "name": f"var({idx})",
-                "value": process.getVariable(target_address, idx, 0, 32, False, False, debugger, ctx)
+                "value": value
             })
     if variable_type == "INDEXED_FLOAT" or variable_type == "ALL":
-        for idx in range(40):
+        for (idx, value) in enumerate(process.getVariableArray(target_address, 40, True, False, debugger, ctx)):
             detailResult.append({
                 "name": f"fvar({idx})",
-                "value": process.getVariable(target_address, idx, 0, 32, True, False, debugger, ctx)
+                "value": value
             })
     if variable_type == "INDEXED_SYSINT" or variable_type == "ALL":
-        for idx in range(5):
+        for (idx, value) in enumerate(process.getVariableArray(target_address, 5, False, True, debugger, ctx)):
             detailResult.append({
                 "name": f"sysvar({idx})",
-                "value": process.getVariable(target_address, idx, 0, 32, False, True, debugger, ctx)
+                "value": value
             })
     if variable_type == "INDEXED_SYSFLOAT" or variable_type == "ALL":
-        for idx in range(5):
+        for (idx, value) in enumerate(process.getVariableArray(target_address, 5, True, True, debugger, ctx)):
             detailResult.append({
                 "name": f"sysfvar({idx})",
-                "value": process.getVariable(target_address, idx, 0, 32, True, True, debugger, ctx)
+                "value": value
             })
 
     ## we have to suspend the process here otherwise the data will likely be junk!
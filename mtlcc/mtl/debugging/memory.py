@@ -0,0 +1,162 @@
+## memory backends used by the debugger to access the MUGEN process (see `MemoryBackend`).
+## `ProcessMemory` reads and writes a live process through the win32 API, holding a single process handle for the whole launch.
+## `SnapshotMemory` serves reads and writes from regions of memory captured up-front (or loaded from a snapshot file), and records
+## every read it serves. this allows the debugger's access patterns to be tested and benchmarked without MUGEN, including on Linux.
+## `CachedMemory` wraps either of these, and serves reads from regions captured in bulk while the process is paused.
+import bisect
+import ctypes
+import struct
+from ctypes import c_int
+from typing import Optional
+
+from mtl.types.debugging import MemoryBackend, PROCESS_ALL_ACCESS
+from mtl.types.shared import DebuggerError
+
+## snapshot files hold a count of regions, then for each region its address, size and contents.
+SNAPSHOT_HEADER = struct.Struct("<I")
+SNAPSHOT_REGION = struct.Struct("<II")
+
+class ProcessMemory(MemoryBackend):
+    def __init__(self, process_id: int):
+        self.handle = _winapi(ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, process_id))
+
+    def read(self, address: int, count: int) -> bytes:
+        ## reads happen from both the CLI/IPC thread and the debug event handler, so each read uses its own buffer.
+        buf = ctypes.create_string_buffer(count)
+        read = c_int()
+        _winapi(ctypes.windll.kernel32.ReadProcessMemory(self.handle, address, buf, count, ctypes.byref(read)))
+        return buf.raw
+
+    def write(self, address: int, data: bytes):
+        buf = ctypes.create_string_buffer(data, len(data))
+        total = c_int()
+        _winapi(ctypes.windll.kernel32.WriteProcessMemory(self.handle, address, buf, len(data), ctypes.byref(total)))
+
+    def unprotect(self, address: int, size: int):
+        previous = c_int()
+        _winapi(ctypes.windll.kernel32.VirtualProtectEx(self.handle, address, size, 0x40, ctypes.byref(previous)))
+
+    def close(self):
+        ctypes.windll.kernel32.CloseHandle(self.handle)
+
+class SnapshotMemory(MemoryBackend):
+    def __init__(self):
+        ## regions are kept sorted by start address, and must not overlap.
+        self.starts: list[int] = []
+        self.regions: list[bytearray] = []
+        ## every (address, count) read, in order, and the number of writes.
+        self.reads: list[tuple[int, int]] = []
+        self.writes = 0
+
+    def overlaps(self, address: int, size: int) -> bool:
+        index = bisect.bisect_right(self.starts, address)
+        return (index > 0 and self.starts[index - 1] + len(self.regions[index - 1]) > address) or (index < len(self.starts) and address + size > self.starts[index])
+
+    def map(self, address: int, data: bytes):
+        if self.overlaps(address, len(data)):
+            raise DebuggerError(f"Cannot map snapshot region at {address:#x}: region overlaps an existing region.")
+        index = bisect.bisect_right(self.starts, address)
+        self.starts.insert(index, address)
+        self.regions.insert(index, bytearray(data))
+
+    def locate(self, address: int, count: int) -> Optional[tuple[bytearray, int]]:
+        ## returns the region containing [address, address + count) and the offset of `address` within it, if there is one.
+        index = bisect.bisect_right(self.starts, address) - 1
+        if index < 0 or address + count > self.starts[index] + len(self.regions[index]):
+            return None
+        return (self.regions[index], address - self.starts[index])
+
+    def find(self, address: int, count: int) -> tuple[bytearray, int]:
+        if (found := self.locate(address, count)) == None:
+            raise DebuggerError(f"Failed to access memory: {count} bytes at {address:#x} are not part of the snapshot.")
+        return found
+
+    def read(self, address: int, count: int) -> bytes:
+        self.reads.append((address, count))
+        (region, offset) = self.find(address, count)
+        return bytes(region[offset:offset + count])
+
+    def write(self, address: int, data: bytes):
+        self.writes += 1
+        (region, offset) = self.find(address, len(data))
+        region[offset:offset + len(data)] = data
+
+    def save(self, filename: str):
+        with open(filename, mode='wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(len(self.regions)))
+            for (address, region) in zip(self.starts, self.regions):
+                f.write(SNAPSHOT_REGION.pack(address, len(region)))
+                f.write(region)
+
+class CachedMemory(MemoryBackend):
+    ## serves reads from the regions captured by `capture` (see `process.snapshotPlayers`) until `invalidate` is called,
+    ## and passes every other read through to the wrapped backend. writes go to both, so captured regions stay current.
+    def __init__(self, memory: MemoryBackend):
+        self.memory = memory
+        self.snapshot: Optional[SnapshotMemory] = None
+
+    def capture(self, ranges: list[tuple[int, int]]):
+        ## each range is read in a single call. ranges which cannot be read, or which overlap an earlier range, are left uncached.
+        snapshot = SnapshotMemory()
+        for (address, count) in ranges:
+            if snapshot.overlaps(address, count):
+                continue
+            try:
+                snapshot.map(address, self.memory.read(address, count))
+            except DebuggerError:
+                continue
+        self.snapshot = snapshot
+
+    def invalidate(self):
+        self.snapshot = None
+
+    def read(self, address: int, count: int) -> bytes:
+        if self.snapshot != None and (found := self.snapshot.locate(address, count)) != None:
+            (region, offset) = found
+            return bytes(memoryview(region)[offset:offset + count])
+        return self.memory.read(address, count)
+
+    def write(self, address: int, data: bytes):
+        self.memory.write(address, data)
+        if self.snapshot != None and (found := self.snapshot.locate(address, len(data))) != None:
+            (region, offset) = found
+            region[offset:offset + len(data)] = data
+
+    def unprotect(self, address: int, size: int):
+        self.memory.unprotect(address, size)
+
+    def close(self):
+        self.memory.close()
+
+def load_snapshot(filename: str) -> SnapshotMemory:
+    memory = SnapshotMemory()
+    with open(filename, mode='rb') as f:
+        data = f.read()
+    offset = SNAPSHOT_HEADER.size
+    for _ in range(SNAPSHOT_HEADER.unpack_from(data, 0)[0]):
+        (address, size) = SNAPSHOT_REGION.unpack_from(data, offset)
+        offset += SNAPSHOT_REGION.size
+        memory.map(address, data[offset:offset + size])
+        offset += size
+    return memory
+
+def capture_snapshot(memory: MemoryBackend, ranges: list[tuple[int, int]]) -> SnapshotMemory:
+    ## copies each (address, count) range from another backend (e.g. a live process) into a new snapshot.
+    snapshot = SnapshotMemory()
+    for ((address, _), data) in zip(ranges, memory.read_many(ranges)):
+        snapshot.map(address, data)
+    return snapshot
+
+## helper function to check a winapi result and call GetLastError if it failed.
+def _winapi(result: int, errno: int = 0) -> int:
+    if result == errno:
+        err = ctypes.windll.kernel32.GetLastError()
+        raise DebuggerError(f"Failed to run win32 API call: call failed with error code {err}.")
+    return result
+
+## similar to _winapi, but does not raise an error.
+def _winapi_check(result: int) -> int:
+    if result == 0:
+        err = ctypes.windll.kernel32.GetLastError()
+        return err
+    return 0
@@ -3,9 +3,9 @@ from mtl.utils.debug import get_state_by_id
 from mtl.types.debugging import *
 from mtl.types.shared import DebuggerError
 from mtl.debugging.address import SELECT_VERSION_ADDRESS, ADDRESS_DATABASE
+from mtl.debugging.memory import CachedMemory, ProcessMemory, _winapi, _winapi_check
 
 import ctypes
-import copy
 import math
 import multiprocessing
 from queue import Empty
@@ -54,46 +54,41 @@ def setPasspoint(stateno: int, index: int, target: DebuggerTarget, ctx: Debuggin
 
 def insertBreakpointTable(breakpoints: list[tuple[int, int]], passpoints: list[tuple[int, int]], target: DebuggerTarget, ctx: DebuggingContext):
     ## suspend the thread
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
     thread_handle = ctypes.windll.kernel32.OpenThread(THREAD_GET_SET_CONTEXT, 0, target.launch_info.thread_id)
     if target.launch_info.state != DebugProcessState.SUSPENDED_WAIT: _winapi(ctypes.windll.kernel32.SuspendThread(thread_handle), errno = -1)
 
-    ## re-fill the breakpoint list with 0xFF
-    for idx in range(target.launch_info.database['SCTRL_BREAKPOINT_FUNC_ADDR'] - target.launch_info.database['SCTRL_BREAKPOINT_TABLE']):
-        set_addr(target.launch_info.database['SCTRL_BREAKPOINT_TABLE'] + idx, 0xFF, process_handle, target.launch_info, ctx)
-
     ## write the breakpoint list
-    start_addr = target.launch_info.database['SCTRL_BREAKPOINT_TABLE']
-    breakpoints_ = copy.deepcopy(breakpoints)
-    for bp in breakpoints_:
-        set_addr_int(start_addr, bp[0], process_handle, target.launch_info, ctx)
-        set_addr_int(start_addr + 4, bp[1], process_handle, target.launch_info, ctx)
-        start_addr += 8
-
-    start_addr = target.launch_info.database['SCTRL_BREAKPOINT_TABLE'] + (8 * 10)
-    for bp in passpoints:
-        set_addr_int(start_addr, bp[0], process_handle, target.launch_info, ctx)
-        set_addr_int(start_addr + 4, bp[1], process_handle, target.launch_info, ctx)
-        start_addr += 8
+    write_breakpoint_table(breakpoints, passpoints, target.launch_info, ctx)
 
     ## resume thread now that breakpoint is applied
     if target.launch_info.state != DebugProcessState.SUSPENDED_WAIT: _winapi(ctypes.windll.kernel32.ResumeThread(thread_handle), errno = -1)
 
+## builds the breakpoint table and writes it in a single call. unused entries are filled with 0xFF,
+## breakpoints start at the beginning of the table and passpoints after the 10th entry.
+def write_breakpoint_table(breakpoints: list[tuple[int, int]], passpoints: list[tuple[int, int]], launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
+    table = bytearray(b'\xFF' * (launch_info.database['SCTRL_BREAKPOINT_FUNC_ADDR'] - launch_info.database['SCTRL_BREAKPOINT_TABLE']))
+    for (start_addr, points) in [(0, breakpoints), (8 * 10, passpoints)]:
+        for bp in points:
+            table[start_addr:start_addr + 4] = bp[0].to_bytes(4, byteorder='little', signed=False)
+            table[start_addr + 4:start_addr + 8] = bp[1].to_bytes(4, byteorder='little', signed=False)
+            start_addr += 8
+    set_bytes(launch_info.database['SCTRL_BREAKPOINT_TABLE'], bytes(table), launch_info, ctx)
+
 ## utility function to read variables from memory
 def getVariable(base_addr: int, index: int, offset: int, size: int, is_float: bool, is_system: bool, target: DebuggerTarget, ctx: DebuggingContext) -> float:
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
-    
+    memory = target.launch_info.memory
+
     if is_float:
         if is_system:
-            variable_value = get_uncached(base_addr + target.launch_info.database["sysfvar"] + index * 4, process_handle)
+            variable_value = get_uncached(base_addr + target.launch_info.database["sysfvar"] + index * 4, memory)
         else:
-            variable_value = get_uncached(base_addr + target.launch_info.database["fvar"] + index * 4, process_handle)
+            variable_value = get_uncached(base_addr + target.launch_info.database["fvar"] + index * 4, memory)
         return round(struct.unpack('<f', variable_value.to_bytes(4, byteorder = 'little'))[0], 3)
     else:
         if is_system:
-            variable_value = get_uncached(base_addr + target.launch_info.database["sysvar"] + index * 4, process_handle)
+            variable_value = get_uncached(base_addr + target.launch_info.database["sysvar"] + index * 4, memory)
         else:
-            variable_value = get_uncached(base_addr + target.launch_info.database["var"] + index * 4, process_handle)
+            variable_value = get_uncached(base_addr + target.launch_info.database["var"] + index * 4, memory)
         start_pow2 = 2 ** offset
         end_pow2 = 2 ** (offset + size)
         mask = ctypes.c_int32(end_pow2 - start_pow2)
@@ -107,70 +102,79 @@ def getVariable(base_addr: int, index: int, offset: int, size: int, is_float: bo
             return ctypes.c_byte(value).value
         return value
     
+## utility function to read a whole variable array (var, fvar, sysvar or sysfvar) from memory in one read
+def getVariableArray(base_addr: int, count: int, is_float: bool, is_system: bool, target: DebuggerTarget, ctx: DebuggingContext) -> list:
+    key = ("sys" if is_system else "") + ("fvar" if is_float else "var")
+    data = target.launch_info.memory.read(base_addr + target.launch_info.database[key], count * 4)
+    if is_float:
+        return [round(value, 3) for value in struct.unpack(f'<{count}f', data)]
+    return list(struct.unpack(f'<{count}i', data))
+
+## the number of bytes from the start of a player structure which covers every field and trigger the debugger reads.
+def player_snapshot_size(database: dict) -> int:
+    offsets = [database[key] + 4 for key in ["stateno", "exist", "root_addr", "helperid", "state_owner"]]
+    offsets += [database["var"] + 60 * 4, database["fvar"] + 40 * 4, database["sysvar"] + 5 * 4, database["sysfvar"] + 5 * 4]
+    offsets += [trigger[0] + 4 for trigger in database["triggers"].values()]
+    ## the player's name is read as a string from offset 0x20.
+    return max(offsets + [0x20 + 48])
+
+## captures the player table, each player structure (including its variables) and the game triggers with one read each,
+## so the queries made while the process is paused are served from memory instead of reading each value separately.
+## the snapshot is only taken while paused, and is kept until the process continues (see `cont`).
+def snapshotPlayers(target: DebuggerTarget, ctx: DebuggingContext):
+    memory = target.launch_info.memory
+    if not isinstance(memory, CachedMemory) or memory.snapshot != None:
+        return
+    if target.launch_info.state not in [DebugProcessState.PAUSED, DebugProcessState.SUSPENDED_DEBUG]:
+        return
+
+    database = target.launch_info.database
+    if (game_address := get_uncached(database["game"], memory)) == 0:
+        return
+    table = game_address + database["player"]
+    players = struct.unpack('<60I', memory.read(table, 60 * 4))
+
+    size = player_snapshot_size(database)
+    ranges = [(table, 60 * 4)] + [(address, size) for address in dict.fromkeys(players) if address != 0]
+    ranges += [(game_address + trigger[0], 8 if trigger[1] == "double" else 4) for trigger in database["game_triggers"].values()]
+    memory.capture(ranges)
+
 ## utility function to read trigger values from memory
 def getValue(offset: int, target: DebuggerTarget, ctx: DebuggingContext) -> int:
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
-    return get_uncached(offset, process_handle)
+    return get_uncached(offset, target.launch_info.memory)
+
+## utility function to read several values at once, e.g. multiple fields of a player
+def getValues(offsets: list[int], target: DebuggerTarget, ctx: DebuggingContext) -> list[int]:
+    return [int.from_bytes(value, byteorder='little') for value in target.launch_info.memory.read_many([(offset, 4) for offset in offsets])]
 
 ## utility function to read trigger values from memory
 def getBytes(offset: int, target: DebuggerTarget, ctx: DebuggingContext, count: int) -> bytes:
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
-    return get_bytes(offset, process_handle, count)
+    return target.launch_info.memory.read(offset, count)
 
 ## utility function to read strings from memory
 def getString(offset: int, target: DebuggerTarget, ctx: DebuggingContext) -> str:
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
-    result = ""
-    while (b := get_byte(offset, process_handle)) != b'':
-        result += b.decode("utf-8")
+    result = bytearray()
+    while (b := target.launch_info.memory.read(offset, 1)) != b'\x00':
+        result += b
         offset += 1
-    return result
+    return result.decode("utf-8")
 
 ## helper to get a value from cache if possible.
-def get_cached(addr: int, handle: int, launch_info: DebuggerLaunchInfo) -> int:
+def get_cached(addr: int, memory: MemoryBackend, launch_info: DebuggerLaunchInfo) -> int:
     if addr in launch_info.cache: return launch_info.cache[addr]
-    buf = ctypes.create_string_buffer(4)
-    read = c_int()
-    _winapi(ctypes.windll.kernel32.ReadProcessMemory(handle, addr, buf, 4, ctypes.byref(read)))
-    launch_info.cache[addr] = int.from_bytes(buf, byteorder='little')
+    launch_info.cache[addr] = get_uncached(addr, memory)
     return launch_info.cache[addr]
 
 ## helper to get a value without caching (for values which change e.g. stateno)
-def get_uncached(addr: int, handle: int) -> int:
-    buf = ctypes.create_string_buffer(4)
-    read = c_int()
-    _winapi(ctypes.windll.kernel32.ReadProcessMemory(handle, addr, buf, 4, ctypes.byref(read)))
-    return int.from_bytes(buf, byteorder='little')
-
-def get_byte(addr: int, handle: int) -> bytes:
-    buf = ctypes.create_string_buffer(1)
-    read = c_int()
-    _winapi(ctypes.windll.kernel32.ReadProcessMemory(handle, addr, buf, 1, ctypes.byref(read)))
-    return buf.value
-
-def get_bytes(addr: int, handle: int, count: int) -> bytes:
-    buf = ctypes.create_string_buffer(count)
-    read = c_int()
-    _winapi(ctypes.windll.kernel32.ReadProcessMemory(handle, addr, buf, count, ctypes.byref(read)))
-    return buf.value
-
-def set_addr(addr: int, val: int, handle: int, launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
-    unprotect(launch_info, ctx)
-
-    v = val.to_bytes(1, byteorder='little', signed=False)
-    buf = ctypes.create_string_buffer(v, 1)
+def get_uncached(addr: int, memory: MemoryBackend) -> int:
+    return int.from_bytes(memory.read(addr, 4), byteorder='little')
 
-    total = c_int()
-    _winapi(ctypes.windll.kernel32.WriteProcessMemory(handle, addr, buf, 1, ctypes.byref(total)))
-
-def set_addr_int(addr: int, val: int, handle: int, launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
+def set_bytes(addr: int, data: bytes, launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
     unprotect(launch_info, ctx)
+    launch_info.memory.write(addr, data)
 
-    v = val.to_bytes(4, byteorder='little', signed=False)
-    buf = ctypes.create_string_buffer(v, 4)
-
-    total = c_int()
-    _winapi(ctypes.windll.kernel32.WriteProcessMemory(handle, addr, buf, 4, ctypes.byref(total)))
+def set_addr_int(addr: int, val: int, launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
+    set_bytes(addr, val.to_bytes(4, byteorder='little', signed=False), launch_info, ctx)
 
 ## for us we only care about DEBUG_REGISTERS and INTEGER
 def get_context(handle: int, context: CONTEXT):
@@ -184,18 +188,6 @@ def resume(handle: int, context: CONTEXT):
     context.EFlags |= RESUME_FLAG
     set_context(handle, context)
 
-## helper function to check a winapi result and call GetLastError if it failed.
-def _winapi(result: int, errno: int = 0):
-    if result == errno:
-        err = ctypes.windll.kernel32.GetLastError()
-        raise DebuggerError(f"Failed to run win32 API call: call failed with error code {err}.")
-## similar to _winapi, but does not raise an error.
-def _winapi_check(result: int) -> int:
-    if result == 0:
-        err = ctypes.windll.kernel32.GetLastError()
-        return err
-    return 0
-
 ## waits for the subprocess to exit, then cleans up the copied character folder.
 def _wait_mugen(target: DebuggerTarget, folder: str):
     while target.subprocess.poll() == None:
@@ -203,6 +195,7 @@ def _wait_mugen(target: DebuggerTarget, folder: str):
     # delay cleanup to make sure MUGEN shutdown is completed.
     target.launch_info.state = DebugProcessState.EXIT
     time.sleep(1)
+    target.launch_info.memory.close()
     # in IPC mode, send IPC command to the adapter to inform it of exit
     if folder != None:
         shutil.rmtree(folder)
@@ -218,7 +211,6 @@ def _debug_mugen(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queue,
     _winapi(ctypes.windll.kernel32.DebugActiveProcess(launch_info.process_id))
     launch_info.state = DebugProcessState.SUSPENDED_PROCEED
 
-    process_handle = None
     thread_handle = None
 
     event = DEBUG_EVENT()
@@ -235,7 +227,6 @@ def _debug_mugen(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queue,
         if event.dwDebugEventCode == CREATE_PROCESS_DEBUG_EVENT:
             ## store the thread ID
             launch_info.thread_id = event.dwThreadId
-            process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, event.dwProcessId)
             thread_handle = ctypes.windll.kernel32.OpenThread(THREAD_GET_SET_CONTEXT, 0, event.dwThreadId)
 
         if event.dwDebugEventCode == EXCEPTION_DEBUG_EVENT:
@@ -258,10 +249,10 @@ def _debug_mugen(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queue,
             launch_info.state = DebugProcessState.EXIT
 
 def _debug_handler(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queue, results: multiprocessing.Queue, ctx: DebuggingContext):
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, launch_info.process_id)
+    memory = launch_info.memory
 
     ## identify the address database to use
-    version_address = get_cached(SELECT_VERSION_ADDRESS, process_handle, launch_info)
+    version_address = get_cached(SELECT_VERSION_ADDRESS, memory, launch_info)
     launch_info.database = ADDRESS_DATABASE[version_address]
 
     ## for winmugen, we need to change protection on the page for the breakpoint functions.
@@ -283,39 +274,13 @@ def _debug_handler(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queu
     thread_handle = ctypes.windll.kernel32.OpenThread(THREAD_GET_SET_CONTEXT, 0, launch_info.thread_id)
     _winapi(ctypes.windll.kernel32.SuspendThread(thread_handle), errno = -1)
 
-    ## write the breakpoint dispatch handling table with initial values, 0xFF
-    for idx in range(launch_info.database['SCTRL_BREAKPOINT_FUNC_ADDR'] - launch_info.database['SCTRL_BREAKPOINT_TABLE']):
-        set_addr(launch_info.database['SCTRL_BREAKPOINT_TABLE'] + idx, 0xFF, process_handle, launch_info, ctx)
-
-    ## write the breakpoint handling function
-    for idx in range(len(launch_info.database['SCTRL_BREAKPOINT_FUNC'])):
-        set_addr(launch_info.database['SCTRL_BREAKPOINT_FUNC_ADDR'] + idx, launch_info.database['SCTRL_BREAKPOINT_FUNC'][idx], process_handle, launch_info, ctx)
-
-    ## write the passpoint handling function
-    for idx in range(len(launch_info.database['SCTRL_PASSPOINT_FUNC'])):
-        set_addr(launch_info.database['SCTRL_PASSPOINT_FUNC_ADDR'] + idx, launch_info.database['SCTRL_PASSPOINT_FUNC'][idx], process_handle, launch_info, ctx)
-
-    ## write the breakpoint handling jump
-    for idx in range(len(launch_info.database['SCTRL_BREAKPOINT_INSERT_FUNC'])):
-        set_addr(launch_info.database['SCTRL_BREAKPOINT_INSERT'] + idx, launch_info.database['SCTRL_BREAKPOINT_INSERT_FUNC'][idx], process_handle, launch_info, ctx)
-
-    ## write the passpoint handling jump
-    for idx in range(len(launch_info.database['SCTRL_PASSPOINT_INSERT_FUNC'])):
-        set_addr(launch_info.database['SCTRL_PASSPOINT_INSERT'] + idx, launch_info.database['SCTRL_PASSPOINT_INSERT_FUNC'][idx], process_handle, launch_info, ctx)
-
-    ## restore the breakpoint list from input
-    start_addr = launch_info.database['SCTRL_BREAKPOINT_TABLE']
-    breakpoints_ = copy.deepcopy(ctx.breakpoints)
-    for bp in breakpoints_:
-        set_addr_int(start_addr, bp[0], process_handle, launch_info, ctx)
-        set_addr_int(start_addr + 4, bp[1], process_handle, launch_info, ctx)
-        start_addr += 8
+    ## write the breakpoint and passpoint handling functions, and the jumps to them
+    for (addr, func) in [("SCTRL_BREAKPOINT_FUNC_ADDR", "SCTRL_BREAKPOINT_FUNC"), ("SCTRL_PASSPOINT_FUNC_ADDR", "SCTRL_PASSPOINT_FUNC"),
+                         ("SCTRL_BREAKPOINT_INSERT", "SCTRL_BREAKPOINT_INSERT_FUNC"), ("SCTRL_PASSPOINT_INSERT", "SCTRL_PASSPOINT_INSERT_FUNC")]:
+        set_bytes(launch_info.database[addr], bytes(launch_info.database[func]), launch_info, ctx)
 
-    start_addr = launch_info.database['SCTRL_BREAKPOINT_TABLE'] + (8 * 10)
-    for bp in ctx.passpoints:
-        set_addr_int(start_addr, bp[0], process_handle, launch_info, ctx)
-        set_addr_int(start_addr + 4, bp[1], process_handle, launch_info, ctx)
-        start_addr += 8
+    ## write the breakpoint dispatch handling table, restoring the breakpoint list from input
+    write_breakpoint_table(ctx.breakpoints, ctx.passpoints, launch_info, ctx)
 
     ## now add a breakpoint at the breakpoint insertion address
     context = CONTEXT()
@@ -342,13 +307,13 @@ def _debug_handler(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queu
                 ctx.current_owner = context.Ebp
                 if ctx.is_winmugen:
                     ctx.current_owner = context.Esi
-                ctx.last_index = get_uncached(ctx.current_owner + 0x5c, process_handle)
+                ctx.last_index = get_uncached(ctx.current_owner + 0x5c, memory)
 
                 ## set the owner's address into the passpoint-step address
-                is_step = ctx.current_owner == get_uncached(launch_info.database["SCTRL_STEP_ADDR"] + 4, process_handle)
-                set_addr_int(launch_info.database["SCTRL_STEP_ADDR"] + 4, ctx.current_owner, process_handle, launch_info, ctx)
+                is_step = ctx.current_owner == get_uncached(launch_info.database["SCTRL_STEP_ADDR"] + 4, memory)
+                set_addr_int(launch_info.database["SCTRL_STEP_ADDR"] + 4, ctx.current_owner, launch_info, ctx)
                 
-                match_breakpoint(launch_info, ctx, process_handle, is_step)
+                match_breakpoint(launch_info, ctx, memory, is_step)
             elif next_event.address == launch_info.database["SCTRL_BREAKPOINT_ADDR"]:
                 ## always store breakpoint info for passpoints
                 get_context(thread_handle, context)
@@ -358,10 +323,10 @@ def _debug_handler(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queu
                     ctx.current_owner = context.Esi
 
                 ## set the owner's address into the breakpoint-step address
-                is_step = ctx.current_owner == get_uncached(launch_info.database["SCTRL_STEP_ADDR"], process_handle)
-                set_addr_int(launch_info.database["SCTRL_STEP_ADDR"], ctx.current_owner, process_handle, launch_info, ctx)
+                is_step = ctx.current_owner == get_uncached(launch_info.database["SCTRL_STEP_ADDR"], memory)
+                set_addr_int(launch_info.database["SCTRL_STEP_ADDR"], ctx.current_owner, launch_info, ctx)
                 
-                match_breakpoint(launch_info, ctx, process_handle, is_step)
+                match_breakpoint(launch_info, ctx, memory, is_step)
             else:
                 ## just immediately tell the engine to continue in this case.
                 results.put(DebugBreakResult())
@@ -369,10 +334,10 @@ def _debug_handler(launch_info: DebuggerLaunchInfo, events: multiprocessing.Queu
             ## this happens if the queue is empty and the read times out.
             continue
 
-def match_breakpoint(launch_info: DebuggerLaunchInfo, ctx: DebuggingContext, process_handle: int, is_step: bool = False):
+def match_breakpoint(launch_info: DebuggerLaunchInfo, ctx: DebuggingContext, memory: MemoryBackend, is_step: bool = False):
     ## breakpoint was matched, pause and wait for input
     launch_info.state = DebugProcessState.PAUSED
-    stateno = get_uncached(ctx.current_owner + launch_info.database["stateno"], process_handle)
+    stateno = get_uncached(ctx.current_owner + launch_info.database["stateno"], memory)
     ctx.current_breakpoint = (stateno, ctx.last_index)
     ## in IPC mode, notify the adapter that the breakpoint was reached
     if launch_info.ipc:
@@ -381,7 +346,7 @@ def match_breakpoint(launch_info: DebuggerLaunchInfo, ctx: DebuggingContext, pro
             return
         if ctx.last_index >= len(state.states):
             return
-        player_id = get_uncached(ctx.current_owner + 0x04, process_handle)
+        player_id = get_uncached(ctx.current_owner + 0x04, memory)
         sendResponseIPC(DebuggerResponseIPC(
             b'00000000-0000-0000-0000-000000000000', DebuggerCommand.IPC_STEP if is_step else DebuggerCommand.IPC_HIT_BREAKPOINT, DebuggerResponseType.SUCCESS, 
             json.dumps({ "filename": state.states[ctx.last_index].filename, "line": state.states[ctx.last_index].line, "owner": player_id }).encode('utf-8')
@@ -394,10 +359,10 @@ def match_breakpoint(launch_info: DebuggerLaunchInfo, ctx: DebuggingContext, pro
         if ctx.last_index >= len(state.states):
             if not ctx.quiet: print(f"Warning: Debugger could not match controller index {ctx.last_index} for state {stateno} in database.")
             return
-        player_id = get_uncached(ctx.current_owner + 0x04, process_handle)
-        helper_id = get_uncached(ctx.current_owner + launch_info.database["helperid"], process_handle)
-        game_address = get_cached(launch_info.database["game"], process_handle, launch_info)
-        p1_address = get_cached(game_address + launch_info.database["player"], process_handle, launch_info)
+        player_id = get_uncached(ctx.current_owner + 0x04, memory)
+        helper_id = get_uncached(ctx.current_owner + launch_info.database["helperid"], memory)
+        game_address = get_cached(launch_info.database["game"], memory, launch_info)
+        p1_address = get_cached(game_address + launch_info.database["player"], memory, launch_info)
         player_name = "root" if ctx.current_owner == p1_address else f"helper({helper_id})"
         if not ctx.quiet: 
             if not is_step:
@@ -422,7 +387,7 @@ def launch(target: str, character: str, ctx: DebuggingContext) -> DebuggerTarget
     child = subprocess.Popen(args, cwd=working, creationflags=CREATE_SUSPENDED)
 
     ## share the launch info across processes
-    launch_info = DebuggerLaunchInfo(child.pid, 0, {}, character_folder, DebugProcessState.SUSPENDED_WAIT, {}, False)
+    launch_info = DebuggerLaunchInfo(child.pid, 0, {}, character_folder, DebugProcessState.SUSPENDED_WAIT, {}, False, CachedMemory(ProcessMemory(child.pid)))
     result = DebuggerTarget(child, launch_info)
 
     ## dispatch a thread to check when the subprocess closes + clean up automatically.
@@ -439,6 +404,8 @@ def launch(target: str, character: str, ctx: DebuggingContext) -> DebuggerTarget
     return result
 
 def cont(target: DebuggerTarget, ctx: DebuggingContext, next_state = DebugProcessState.RUNNING):
+    ## anything read while paused is stale once the process runs again.
+    target.launch_info.memory.invalidate()
     if target.subprocess != None and target.launch_info.state == DebugProcessState.SUSPENDED_PROCEED:
         # resume the process
         psutil.Process(target.subprocess.pid).resume()
@@ -456,21 +423,16 @@ def cont(target: DebuggerTarget, ctx: DebuggingContext, next_state = DebugProces
 
 def removeStep(target: DebuggerTarget, ctx: DebuggingContext):
     ## remove all step addresses
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
-    set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"], 0, process_handle, target.launch_info, ctx)
-    set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"] + 4, 0, process_handle, target.launch_info, ctx)
+    set_bytes(target.launch_info.database["SCTRL_STEP_ADDR"], bytes(8), target.launch_info, ctx)
 
 def setStep(target: DebuggerTarget, ctx: DebuggingContext, addr: int):
     ## set the owner's address into the breakpoint-step address
-    process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, target.launch_info.process_id)
     ## don't set if this is already marked as the step character.
-    if get_uncached(target.launch_info.database["SCTRL_STEP_ADDR"], process_handle) == addr or get_uncached(target.launch_info.database["SCTRL_STEP_ADDR"] + 4, process_handle) == addr:
+    if addr in getValues([target.launch_info.database["SCTRL_STEP_ADDR"], target.launch_info.database["SCTRL_STEP_ADDR"] + 4], target, ctx):
         return
-    set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"], addr, process_handle, target.launch_info, ctx)
-    #set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"] + 4, addr, process_handle)
+    set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"], addr, target.launch_info, ctx)
+    #set_addr_int(target.launch_info.database["SCTRL_STEP_ADDR"] + 4, addr, target.launch_info, ctx)
 
 def unprotect(launch_info: DebuggerLaunchInfo, ctx: DebuggingContext):
     if ctx.is_winmugen:
-        process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, 0, launch_info.process_id)
-        read = c_int()
-        _winapi(ctypes.windll.kernel32.VirtualProtectEx(process_handle, launch_info.database['SCTRL_BREAKPOINT_TABLE'], 0x2000, 0x40, ctypes.byref(read)))
\ No newline at end of file
+        launch_info.memory.unprotect(launch_info.database['SCTRL_BREAKPOINT_TABLE'], 0x2000)
\ No newline at end of file
@@ -1,4 +1,6 @@
 import os
+from collections import deque
+from typing import Optional
 
 from mtl.utils.func import find, compiler_internal, search_file, includes_insensitive
 from mtl.types.shared import TranslationError
@@ -6,11 +8,15 @@ from mtl.types.trigger import TriggerTreeNode
 from mtl.types.context import LoadContext, TranslationMode, CompilerConfiguration
 from mtl.types.ini import *
 from mtl.parser import ini, trigger
+from mtl.utils import cache
+from mtl.utils.profiler import profiled
+from mtl.utils import diagnostics
 
 def get_libmtl(cc: CompilerConfiguration) -> INISection:
     return INISection("Include", "", [INIProperty("source", "stdlib/libmtl.inc", compiler_internal(cc))], compiler_internal(cc))
 
-def loadFile(file: str, cc: CompilerConfiguration, cycle: list[str]) -> LoadContext:
+@profiled
+def loadFile(file: str, cc: CompilerConfiguration, cycle: list[str], cache_dir: Optional[str] = None) -> LoadContext:
     cycle_detection = find(cycle, lambda k: os.path.realpath(file) == os.path.realpath(k))
     if cycle_detection != None:
         print("Import cycle was detected!!")
@@ -21,6 +27,18 @@ def loadFile(file: str, cc: CompilerConfiguration, cycle: list[str]) -> LoadCont
             index -= 1
         raise TranslationError("A cycle was detected during include processing.", compiler_internal(cc))
 
+    ## the compile daemon keeps each loaded file in memory, and re-uses it until the file changes.
+    if cache.memory != None and (cached := cache.memory.load(file, cc)) != None:
+        return cached
+
+    ## if a cache directory is provided, re-use the previous load result for this file if nothing affecting it has changed.
+    if cache_dir != None:
+        cache_key = cache.get_cache_key(file, cc)
+        if (cached := cache.load_cached(file, cache_key, cache_dir)) != None:
+            print(f"Loaded file {file} from compile cache")
+            if cache.memory != None: cache.memory.store(file, cc, cached)
+            return cached
+
     ctx = LoadContext(file, cc)
 
     with open(file) as f:
@@ -30,6 +48,11 @@ def loadFile(file: str, cc: CompilerConfiguration, cycle: list[str]) -> LoadCont
     print(f"Parsing file from {file} using mode = {'MTL' if ctx.mode == TranslationMode.MTL_MODE else 'CNS'}")
     parseTarget(contents, ctx.mode, ctx)
 
+    if cache_dir != None:
+        cache.store_cached(file, cache_key, ctx, cache_dir)
+    if cache.memory != None:
+        cache.memory.store(file, cc, ctx)
+
     return ctx
 
 def parseTarget(sections: list[INISection], mode: TranslationMode, ctx: LoadContext, ignore_error: bool = False):
@@ -190,7 +213,87 @@ def parseTarget(sections: list[INISection], mode: TranslationMode, ctx: LoadCont
             raise TranslationError(f"Section with name {section.name} was not recognized by the parser.", section.location)
         index += 1
 
-def processIncludes(cycle: list[str], ctx: LoadContext):
+class LoadContextMerger:
+    ## merges the LoadContext of each source file into the context of the common file.
+    ## each kind of definition keeps an index from lowercase name to the first matching definition,
+    ## so merging is linear in the number of definitions rather than scanning the combined context for each one.
+    ## `ctx` is updated in-place; `finish` must be called once all contexts are merged.
+    def __init__(self, ctx: LoadContext):
+        self.ctx = ctx
+        ## common states can be replaced, which moves the replacement to the end of the list.
+        ## replaced states leave an empty slot, and the index holds every slot for a name in order.
+        self.states: list[Optional[StateDefinitionSection]] = list(ctx.state_definitions)
+        self.state_index: dict[str, deque[int]] = {}
+        for index, defn in enumerate(self.states):
+            self.state_index.setdefault(defn.name.lower(), deque()).append(index)
+        self.trigger_index = self.build_index(ctx.triggers)
+        self.template_index = self.build_index(ctx.templates)
+        self.type_index = self.build_index(ctx.type_definitions)
+        self.struct_index = self.build_index(ctx.struct_definitions)
+        ## includes are matched on their source, and an existing include without a source is an error
+        ## as soon as it is compared against (unless a matching include appears before it).
+        self.include_index: dict[str, tuple[int, INISection]] = {}
+        self.missing_source: Optional[tuple[int, INISection]] = None
+        for index, include in enumerate(ctx.includes):
+            self.index_include(index, include)
+
+    def build_index(self, definitions: list) -> dict:
+        index = {}
+        for defn in definitions:
+            index.setdefault(defn.name.lower(), defn)
+        return index
+
+    def index_include(self, index: int, include: INISection):
+        if (source := find(include.properties, lambda k: k.key.lower() == "source")) == None:
+            if self.missing_source == None: self.missing_source = (index, include)
+        else:
+            self.include_index.setdefault(source.value, (index, include))
+
+    def merge(self, next: LoadContext):
+        # only overwrite common state definitions. otherwise emit an error
+        for defn in next.state_definitions:
+            slots = self.state_index.get(defn.name.lower())
+            if slots:
+                existing = self.states[slots[0]]
+                if not existing.is_common:
+                    raise TranslationError(f"Attempted to redefine a non-common state {defn.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", defn.location)
+                self.states[slots.popleft()] = None
+            self.state_index.setdefault(defn.name.lower(), deque()).append(len(self.states))
+            self.states.append(defn)
+        # for triggers, templates and types, apply them if they are not matched. if they are matched, skip if it's the same source; otherwise emit an error.
+        self.merge_definitions(self.ctx.triggers, self.trigger_index, next.triggers, "trigger")
+        self.merge_definitions(self.ctx.templates, self.template_index, next.templates, "template")
+        self.merge_definitions(self.ctx.type_definitions, self.type_index, next.type_definitions, "type")
+        self.merge_definitions(self.ctx.struct_definitions, self.struct_index, next.struct_definitions, "type")
+        # for includes, apply them if they are not matched. if they are matched, emit an error.
+        for incl in next.includes:
+            source = find(incl.properties, lambda k: k.key.lower() == "source")
+            if source == None: raise TranslationError("The 'source' property is required on Include blocks.", incl.location)
+            existing = self.include_index.get(source.value)
+            if self.missing_source != None and (existing == None or existing[0] > self.missing_source[0]):
+                raise TranslationError("The 'source' property is required on Include blocks.", self.missing_source[1].location)
+            if existing != None:
+                raise TranslationError(f"Attempted to redefine an include {incl.name} (previously defined at {os.path.realpath(existing[1].location.filename)}:{existing[1].location.line})", incl.location)
+            self.ctx.includes.append(incl)
+            self.index_include(len(self.ctx.includes) - 1, incl)
+
+    def merge_definitions(self, definitions: list, index: dict, incoming: list, kind: str):
+        for defn in incoming:
+            ## the incoming name is qualified by its namespace, but is matched against the unqualified names of existing definitions.
+            name = defn.name
+            if defn.namespace != None: name = f"{defn.namespace}.{name}"
+            if (existing := index.get(name.lower())) == None:
+                definitions.append(defn)
+                index.setdefault(defn.name.lower(), defn)
+            elif existing.location != defn.location:
+                raise TranslationError(f"Attempted to redefine a {kind} {defn.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", defn.location)
+
+    def finish(self) -> LoadContext:
+        self.ctx.state_definitions = [defn for defn in self.states if defn != None]
+        return self.ctx
+
+@profiled
+def processIncludes(cycle: list[str], ctx: LoadContext, cache_dir: Optional[str] = None):
     # although CNS mode does not support Include sections, we explicitly block parsing them in parseTarget, and we still want to include libmtl.inc for all files.
     # so we permit includes through here.
     for include in ctx.includes:
@@ -206,7 +309,7 @@ def processIncludes(cycle: list[str], ctx: LoadContext):
         
         ## now translate the source file
         print(f"Starting to load included file {location}")
-        include_context = loadFile(location, ctx.compiler_flags, cycle + [ctx.filename])
+        include_context = loadFile(location, ctx.compiler_flags, cycle + [ctx.filename], cache_dir)
 
         ## if we specified a namespace, the imported names need to be prefixed with that namespace.
         if (namespace := find(include.properties, lambda k: k.key.lower() == "namespace")) != None:
@@ -228,7 +331,7 @@ def processIncludes(cycle: list[str], ctx: LoadContext):
                     find(include_context.triggers, lambda k: k.name == property.value) == None and \
                     find(include_context.type_definitions, lambda k: k.name == property.value) == None and \
                     find(include_context.struct_definitions, lambda k: k.name == property.value) == None:
-                    print(f"Warning at {os.path.realpath(property.location.filename)}:{property.location.line}: Attempted to import name {property.value} from included file {include.location.filename} but no such name exists.")
+                    diagnostics.warn(f"Attempted to import name {property.value} from included file {include.location.filename} but no such name exists.", property.location)
 
         if len(imported_names) != 0:
             include_context.templates = list(filter(lambda k: k.name in imported_names, include_context.templates))
@@ -1,4 +1,6 @@
 from typing import Optional
+import functools
+import re
 
 from mtl.types.trigger import TriggerTree, TriggerTreeNode
 from mtl.types.shared import Location, TranslationError
@@ -25,7 +27,50 @@ PRECEDENCE = {
     "||": 13
 }
 
+## character classes and tables used by the tokenizer.
+## tokens are read with precompiled patterns rather than character-by-character.
+TOKEN_TERMINATORS = "!~-+*/%><=:&^|([])',\""
+TOKEN_PATTERN = re.compile(f"[^{re.escape(TOKEN_TERMINATORS)}]*")
+WHITESPACE_PATTERN = re.compile("[ \t]*")
+## a string runs until the first unescaped double-quote.
+STRING_PATTERN = re.compile('(?:\\\\"|[^"])*')
+
+UNARY_OPERATORS = frozenset(["!", "~", "-"])
+BINARY_OPERATORS = frozenset(["!", "-", "+", "*", "/", "%", ">", "<", "=", ":", "&", "^", "|"])
+## operators which may be the first character of a two-character operator.
+## `!` and `:` are only valid as part of a two-character operator.
+COMPOUND_PREFIXES = frozenset(["!", "*", ">", "<", ":", "&", "|", "^"])
+COMPOUND_OPERATORS = frozenset(["!=", "**", ">=", "<=", ":=", "&&", "||", "^^"])
+OPEN_BRACKETS = frozenset(["(", "["])
+CLOSE_BRACKETS = frozenset([")", "]"])
+QUOTES = frozenset(["\"", "'"])
+
+## characters repeat the same trigger text many times (`time = 0`, `ctrl`, ...), so parsed trees are cached by their text.
+## trigger text is already whitespace-normalized by the INI reader, so the text is used as-is for the key.
+## the cache holds trees parsed against a placeholder location. every node carries its location for diagnostics,
+## so each hit is copied node-by-node with the caller's location attached. hits are copied, not shared between callers,
+## so the cache saves tokenizing and rebalancing but not the memory for each tree.
+PARSE_CACHE_SIZE = 16384
+CACHED_LOCATION = Location("<cached>", 0)
+
+@functools.lru_cache(maxsize = PARSE_CACHE_SIZE)
+def parseTriggerCached(line: str) -> TriggerTree:
+    return parseExpression(line, CACHED_LOCATION)[1]
+
+def relocateTrigger(tree: TriggerTree, location: Location) -> TriggerTree:
+    return TriggerTree(tree.node, tree.operator, [relocateTrigger(child, location) for child in tree.children], location, tree.precedence)
+
+def getParseCacheInfo():
+    ## hit/miss counters for the parse cache (per-process; worker processes keep their own caches).
+    return parseTriggerCached.cache_info()
+
 def parseTrigger(line: str, location: Location) -> TriggerTree:
+    try:
+        return relocateTrigger(parseTriggerCached(line), location)
+    except Exception:
+        ## failures are not cached, parse again so the error is reported against the correct location.
+        pass
+
     try:
         result = parseExpression(line, location)
         return result[1]
@@ -35,7 +80,9 @@ def parseTrigger(line: str, location: Location) -> TriggerTree:
         raise TranslationError("Failed to parse trigger to a syntax tree.", location)
     
 def consumeWhitespace(line: str, index: int) -> int:
-    while index < len(line) and line[index] in [" ", "\t"]: index += 1
+    ## most calls are not positioned on whitespace, so check before running the pattern.
+    if index < len(line) and (line[index] == " " or line[index] == "\t"):
+        return WHITESPACE_PATTERN.match(line, index).end() # type: ignore
     return index
 
 def buildStructAccess(fields: list[str], location: Location) -> TriggerTree:
@@ -51,14 +98,11 @@ def buildStructAccess(fields: list[str], location: Location) -> TriggerTree:
 
 def parseToken(line: str, index: int, location: Location, nested: bool = False) -> tuple[int, Optional[TriggerTree]]:
     # attempt to read a token. token is anything which is not an operator.
-    token = ""
     index = consumeWhitespace(line, index)
-    while index < len(line) and line[index] not in ["!", "~", "-", "+", "*", "/", "%", ">", "<", "=", ":", "&", "^", "|", "(", "[", "]", ")", ",", "'", "\""]:
-        token += line[index]
-        index += 1
-        #index = consumeWhitespace(line, index)
+    match = TOKEN_PATTERN.match(line, index)
+    index = match.end() # type: ignore
     ## no token read? empty expression OR starts with an operator
-    token = token.strip()
+    token = match.group().strip() # type: ignore
     if token == "":
         return (index, None)
     ## potential struct access
@@ -71,14 +115,14 @@ def parseToken(line: str, index: int, location: Location, nested: bool = False)
 def parseUnary(line: str, index: int, location: Location, nested: bool = False) -> tuple[int, Optional[TriggerTree]]:
     index = consumeWhitespace(line, index)
     ## only care about unary operators.
-    if line[index] not in ["!", "~", "-"]:
+    if line[index] not in UNARY_OPERATORS:
         return (index, None)
     ## fetch the operator.
     operator = line[index]
     index += 1
     ## parse the expression under the operator.
     (index, nextExprn) = parseExpression(line, location, index, nested)
-    if nextExprn == None:
+    if nextExprn is None:
         raise TranslationError(f"Trigger parser failed to resolve a trigger for unary operator {operator}.", location)
     if nextExprn.node == TriggerTreeNode.MULTIVALUE:
         # move the unary inside the multivalue.
@@ -93,17 +137,17 @@ def parseUnary(line: str, index: int, location: Location, nested: bool = False)
 def parseBracketed(line: str, index: int, location: Location, nested: bool = False, fn: bool = False) -> tuple[int, Optional[TriggerTree]]:
     index = consumeWhitespace(line, index)
     ## only care about interval/subexpression
-    if line[index] not in ["(", "["]:
+    if line[index] not in OPEN_BRACKETS:
         return (index, None)
     ## fetch the operator.
     operator = line[index]
     index += 1
     ## parse the expression under the operator.
     (index, nextExprn) = parseExpression(line, location, index, nested = True)
-    if nextExprn == None:
+    if nextExprn is None:
         raise TranslationError(f"Trigger parser failed to resolve a trigger for interval/subexpression operator {operator}.", location)
     ## now confirm the operator was closed.
-    if line[index] not in [")", "]"]:
+    if line[index] not in CLOSE_BRACKETS:
         raise TranslationError(f"Trigger parser bracketed expression was not closed correctly.", location)
     operator += line[index]
     index += 1
@@ -119,43 +163,21 @@ def parseBracketed(line: str, index: int, location: Location, nested: bool = Fal
 def parseBinary(line: str, index: int, location: Location, lhs: TriggerTree, nested: bool = False) -> tuple[int, Optional[TriggerTree]]:
     index = consumeWhitespace(line, index)
     ## only care about binary operators.
-    if line[index] not in ["!", "-", "+", "*", "/", "%", ">", "<", "=", ":", "&", "^", "|"]:
+    if line[index] not in BINARY_OPERATORS:
         return (index, None)
     ## fetch the operator
     operator = line[index]
     index += 1
     ## handle each multi-character binary operator.
-    if operator == "!" and line[index] != "=":
-        return (index, None)
-    elif operator == "!" and line[index] == "=":
-        operator = "!="
-        index += 1
-    if operator == "*" and line[index] == "*":
-        operator = "**"
-        index += 1
-    if operator == ">" and line[index] == "=":
-        operator = ">="
-        index += 1
-    if operator == "<" and line[index] == "=":
-        operator = "<="
-        index += 1
-    if operator == ":" and line[index] != "=":
-        return (index, None)
-    elif operator == ":" and line[index] == "=":
-        operator = ":="
-        index += 1
-    if operator == "&" and line[index] == "&":
-        operator = "&&"
-        index += 1
-    if operator == "|" and line[index] == "|":
-        operator = "||"
-        index += 1
-    if operator == "^" and line[index] == "^":
-        operator = "^^"
-        index += 1
+    if operator in COMPOUND_PREFIXES:
+        if (compound := operator + line[index]) in COMPOUND_OPERATORS:
+            operator = compound
+            index += 1
+        elif operator in ["!", ":"]:
+            return (index, None)
     ## parse the expression under the operator.
     (index, nextExprn) = parseExpression(line, location, index, nested)
-    if nextExprn == None:
+    if nextExprn is None:
         raise TranslationError(f"Trigger parser failed to resolve the right hand side of binary operator {operator}.", location)
     
     ## we must apply precedence rules.
@@ -201,23 +223,15 @@ def parseBinary(line: str, index: int, location: Location, lhs: TriggerTree, nes
 def parseString(line: str, index: int, location: Location, nested: bool = False) -> tuple[int, Optional[TriggerTree]]:
     index = consumeWhitespace(line, index)
     ## only care about quoted tokens.
-    if line[index] not in ["\"", "'"]:
+    if line[index] not in QUOTES:
         return (index, None)
     ## skip the operator.
     index += 1
     ## read until finding closing quote.
-    string = ""
-    while index < len(line):
-        if line[index] == "\\" and index + 1 < len(line) and line[index + 1] == "\"":
-            string += line[index]
-            string += line[index + 1]
-            index += 2
-            continue
-        if line[index] == "\"":
-            break
-        string += line[index]
-        index += 1
-    if line[index] != "\"":
+    match = STRING_PATTERN.match(line, index)
+    string = match.group() # type: ignore
+    index = match.end() # type: ignore
+    if index >= len(line) or line[index] != "\"":
         raise TranslationError("Encountered an unterminated string during parsing.", location)
     index += 1
 
@@ -235,7 +249,7 @@ def parseMultiValue(line: str, index: int, location: Location, lhs: TriggerTree,
     index += 1
     ## parse the expression under the operator.
     (index, nextExprn) = parseExpression(line, location, index, nested = True)
-    if nextExprn == None:
+    if nextExprn is None:
         raise TranslationError(f"Trigger parser failed to resolve a trigger for interval/subexpression operator {operator}.", location)
     
     ## this needs to also handle redirects.
@@ -259,6 +273,7 @@ def parseMultiValue(line: str, index: int, location: Location, lhs: TriggerTree,
         return (index, nextExprn)
     return (index, TriggerTree(TriggerTreeNode.MULTIVALUE, "", [lhs, nextExprn], location))
 
+## note: parsed trees are compared to None by identity, as TriggerTree equality is structural and comparatively expensive.
 def parseExpression(line: str, location: Location, index: int = 0, nested: bool = False) -> tuple[int, TriggerTree]:
     stack: list[TriggerTree] = []
     # strip leading whitespace
@@ -271,11 +286,11 @@ def parseExpression(line: str, location: Location, index: int = 0, nested: bool
     ## we start by checking token, then determine unary vs bracketed.
     while index < len(line):
         # special handling: if we reach a ']' or ')' and the expression is nested, exit.
-        if line[index] in ["]", ")"] and nested:
+        if line[index] in CLOSE_BRACKETS and nested:
             break
 
         (index, nextToken) = parseToken(line, index, location, nested)
-        if nextToken != None: stack.append(nextToken)
+        if nextToken is not None: stack.append(nextToken)
 
         # early exit if we reached the end.
         if index >= len(line):
@@ -283,14 +298,14 @@ def parseExpression(line: str, location: Location, index: int = 0, nested: bool
 
         # if the token was None, then no token was parsed.
         # handle the unary and interval expressions.
-        if nextToken == None:
+        if nextToken is None:
             (index, nextOperator) = parseUnary(line, index, location, nested)
-            if nextOperator != None: 
+            if nextOperator is not None: 
                 stack.append(nextOperator)
             else:
                 function_call = len(stack) == 1 and stack[0].node == TriggerTreeNode.ATOM
                 (index, nextExpression) = parseBracketed(line, index, location, nested, fn = function_call)
-                if nextExpression != None and function_call:
+                if nextExpression is not None and function_call:
                     ## special case: function call. ATOM (BRACKETED)
                     if nextExpression.node in [TriggerTreeNode.MULTIVALUE]:
                         children = nextExpression.children
@@ -301,11 +316,11 @@ def parseExpression(line: str, location: Location, index: int = 0, nested: bool
                     if stack[0].operator.lower() == "rescope" and len(children) == 1 and children[0].node == TriggerTreeNode.REDIRECT:
                         children = [children[0].children[0], children[0].children[1]]
                     stack.append(TriggerTree(TriggerTreeNode.FUNCTION_CALL, stack.pop().operator, children, location))
-                elif nextExpression != None: 
+                elif nextExpression is not None: 
                     stack.append(nextExpression)
                 else:
                     (index, nextExpression) = parseString(line, index, location, nested)
-                    if nextExpression != None: 
+                    if nextExpression is not None: 
                         stack.append(nextExpression)
                     else:
                         raise TranslationError("Could not determine type of trigger; tried atom, unary, interval, subexpr, string.", location)
@@ -316,13 +331,13 @@ def parseExpression(line: str, location: Location, index: int = 0, nested: bool
 
         # read a potential binary operator
         (index, nextOperator) = parseBinary(line, index, location, stack[-1], nested)
-        if nextOperator != None:
+        if nextOperator is not None:
             stack.pop()
             stack.append(nextOperator)
 
         # read a potential redirect OR multivalue operator
         (index, nextOperator) = parseMultiValue(line, index, location, stack[-1], nested)
-        if nextOperator != None:
+        if nextOperator is not None:
             stack.pop()
             stack.append(nextOperator)
 
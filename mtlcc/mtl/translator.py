@@ -7,6 +7,11 @@ from mtl.utils.func import *
 from mtl.utils.compiler import *
 from mtl.utils.debug import debuginfo
 from mtl.utils.constant import MTL_VERSION
+from mtl.utils.cache import get_context_fingerprint, get_statedef_fingerprint, get_common_key
+from mtl.utils import cache
+from mtl.utils import profiler
+from mtl.utils.profiler import profiled
+from mtl.utils import diagnostics
 from mtl import builtins
 from mtl.parser.trigger import parseTrigger
 
@@ -15,7 +20,11 @@ from mtl.debugging import database
 from mtl.writer import *
 
 import copy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Iterator
 
+@profiled
 def translateTypes(load_ctx: LoadContext, ctx: TranslationContext):
     print(f"Start processing type definitions...")
     for type_definition in load_ctx.type_definitions:
@@ -87,6 +96,7 @@ def translateTypes(load_ctx: LoadContext, ctx: TranslationContext):
             ctx.triggers.append(TriggerDefinition("operator|", BUILTIN_BOOL, builtins.flag_join, [TypeParameter("expr1", definition), TypeParameter("expr2", definition)], None, definition.location, "operator|", category = TriggerCategory.OPERATOR))
             ctx.triggers.append(TriggerDefinition("operator:=", definition, builtins.builtin_assign, [TypeParameter("expr1", definition), TypeParameter("expr2", definition)], None, definition.location, "operator:=", category = TriggerCategory.OPERATOR))
 
+@profiled
 def translateStructs(load_ctx: LoadContext, ctx: TranslationContext):
     for struct_definition in load_ctx.struct_definitions:
         ## determine final type name and check if it is already in use.
@@ -110,6 +120,7 @@ def translateStructs(load_ctx: LoadContext, ctx: TranslationContext):
         ctx.types.append(TypeDefinition(type_name, TypeCategory.STRUCTURE, struct_size, struct_members, struct_definition.location))
     print(f"Successfully resolved {len(ctx.types)} type and structure definitions")
 
+@profiled
 def translateTriggers(load_ctx: LoadContext, ctx: TranslationContext):
     print("Start loading trigger function definitions...")
     for trigger_definition in load_ctx.triggers:
@@ -151,6 +162,7 @@ def translateTriggers(load_ctx: LoadContext, ctx: TranslationContext):
         ctx.triggers.append(TriggerDefinition(trigger_name, trigger_type, None, param_defs, trigger_definition.value, trigger_definition.location, trigger_name.lower()))
     print(f"Successfully resolved {len(ctx.triggers)} trigger function definitions")
 
+@profiled
 def translateTemplates(load_ctx: LoadContext, ctx: TranslationContext):
     print("Start loading template definitions...")
     for template_definition in load_ctx.templates:
@@ -199,6 +211,7 @@ def translateTemplates(load_ctx: LoadContext, ctx: TranslationContext):
         ctx.templates.append(TemplateDefinition(template_name, template_params, template_locals, template_states, template_definition.location))
     print(f"Successfully resolved {len(ctx.templates)} template definitions")
 
+@profiled
 def translateStateDefinitions(load_ctx: LoadContext, ctx: TranslationContext):
     print("Start state definition processing...")
     ## this does a portion of statedef translation.
@@ -240,76 +253,36 @@ def translateStateDefinitions(load_ctx: LoadContext, ctx: TranslationContext):
         ctx.statedefs.append(StateDefinition(state_name, state_params, state_locals, state_controllers, state_scope, state_definition.location))
     print(f"Successfully resolved {len(ctx.statedefs)} state definitions")
 
-def replaceTemplates(ctx: TranslationContext, iterations: int = 0):
-    if iterations == 0: print("Start applying template replacements in statedefs...")
+@profiled
+def replaceTemplates(ctx: TranslationContext):
+    print("Start applying template replacements in statedefs...")
 
-    replaced = False
-
-    if iterations > 20:
-        raise TranslationError("Template replacement failed to complete after 20 iterations.", compiler_internal(ctx.compiler_flags))
-    
     ## process each statedef and each controller within the statedefs
     ## if a controller's `type` property references a non-builtin template, remove
     ## that controller from the state list and insert all the controllers from the template.
     ## if no template at all matches, raise an error.
-    for statedef in ctx.statedefs:
-        index = 0
-        while index < len(statedef.states):
-            controller = statedef.states[index]
+    ## each template is expanded once (including any templates it calls, see `expand_template`),
+    ## so the statedefs only need a single pass regardless of how deeply templates are nested.
+    expanded: dict[str, ExpandedTemplate] = {}
+    for statedef in profiler.iterate(ctx.statedefs, "statedef", "replaceTemplates"):
+        new_states: list[StateController] = []
+        levels: list[list[TypeParameter]] = []
+        for (index, controller) in enumerate(statedef.states):
             if (template := find_template(controller.name, ctx)) == None:
                 raise TranslationError(f"No template or builtin controller was found to match state controller with name {controller.name}", controller.location)
             ## we only care about DEFINED templates here. BUILTIN templates are for MUGEN/CNS state controller types.
             if template.category == TemplateCategory.DEFINED:
-                replaced = True
-                ## 1. copy all the locals declared in the template to the locals of the state, with a prefix to ensure they are uniquified.
-                local_prefix = f"{generate_random_string(8)}_"
-                local_map: dict[str, str] = {}
-                for local in template.locals:
-                    statedef.locals.append(TypeParameter(f"{local_prefix}{local.name}", local.type, local.default, local.location, scope = statedef.scope))
-                    local_map[local.name] = f"{local_prefix}{local.name}"
-                ## 2. copy all controllers from the template, updating uses of the locals to use the new prefix.
-                ##    also apply a copy of `ignorehitpause` and `persistent` from the call site.
-                new_controllers = copy.deepcopy(template.states)
-                for new_controller in new_controllers:
-                    for local_name in local_map:
-                        old_exprn = TriggerTree(TriggerTreeNode.ATOM, local_name, [], new_controller.location)
-                        new_exprn = TriggerTree(TriggerTreeNode.ATOM, local_map[local_name], [], new_controller.location)
-                        replace_expression(new_controller, old_exprn, new_exprn)
-                    if len(ignorehitpause := find_property("ignorehitpause", controller)) == 1:
-                        new_controller.properties.append(copy.deepcopy(ignorehitpause[0]))
-                    if len(persistent := find_property("persistent", controller)) == 1:
-                        new_controller.properties.append(copy.deepcopy(persistent[0]))
-                ## 3. replace all uses of parameters with the expression to substitute for that parameter.
-                exprn_map: list[StateControllerProperty] = []
-                for param in template.params:
-                    if len(target_exprn := find_property(param.name, controller)) != 1 and param.required:
-                        raise TranslationError(f"No expression was provided for parameter with name {param.name} on template or controller {controller.name}.", controller.location)
-                    if target_exprn != None and len(target_exprn) == 1:
-                        exprn_map.append(copy.deepcopy(target_exprn[0]))
-                for new_controller in new_controllers:
-                    for exprn in exprn_map:
-                        old_exprn = TriggerTree(TriggerTreeNode.ATOM, exprn.key, [], new_controller.location)
-                        replace_expression(new_controller, old_exprn, exprn.value)
-
-                ## 4. combine the triggers on the template call into one or more triggerall statements and insert into each new controller.
-                combined_triggers = merge_triggers(controller.triggers, controller.location)
-                for new_controller in new_controllers:
-                    if 0 not in new_controller.triggers:
-                        new_controller.triggers[0] = TriggerGroup([])
-                    new_controller.triggers[0].triggers += combined_triggers
-
-                ## 5. remove the call to the template (at `index`) and insert the new controllers into the statedef
-                statedef.states = statedef.states[:index] + new_controllers + statedef.states[index+1:]
-                index += len(new_controllers)
-                
-            index += 1
-
-    ## recurse if any replacements were made.
-    if replaced:
-        replaceTemplates(ctx, iterations + 1)
-
-    if iterations == 0: print("Successfully completed template replacement.")
+                with profiler.span(template.name, "template", statedef = statedef.name):
+                    new_states += splice_template(expand_template(template, ctx, expanded, []), controller, index, levels, statedef.scope)
+            else:
+                new_states.append(controller)
+        statedef.states = new_states
+        for level in levels:
+            statedef.locals += level
 
+    print("Successfully completed template replacement.")
+
+@profiled
 def createGlobalsTable(ctx: TranslationContext, forwards: list[ForwardParameter]):
     print("Start global variable identification and assignment...")
     ## initialize the scopes list in ctx based on the scopes of each statedef.
@@ -397,61 +370,58 @@ def createGlobalsTable(ctx: TranslationContext, forwards: list[ForwardParameter]
     ctx.globals = result_scoped
     print("Finish global variable identification.")
 
-def fullPassTypeCheck(ctx: TranslationContext):
+@profiled
+def fullPassTypeCheck(ctx: TranslationContext, statedefs: list[StateDefinition]):
     print("Waiting for initial type check to complete...")
-    for statedef in ctx.statedefs:
-        table = statedef.locals + list(filter(lambda k: scopes_compatible(statedef.scope, k.scope, ctx), ctx.globals))
-        for controller in statedef.states:
-            if (target_template := find_template(controller.name, ctx)) == None:
-                raise TranslationError(f"Could not find any template or builtin controller with name {controller.name}.", controller.location)
-            for group_id in controller.triggers:
-                for trigger in controller.triggers[group_id].triggers:
-                    result_types = type_check(trigger, table, ctx, expected = [TypeSpecifier(BUILTIN_BOOL)], scope = statedef.scope)
-                    if result_types == None or len(result_types) != 1:
-                        raise TranslationError(f"Target type of trigger expression was a tuple, but trigger expressions must resolve to bool.", trigger.location)
-                    ## for CNS compatibility, we allow any integral type to act as `bool` on a trigger.
-                    if result_types[0].type != BUILTIN_BOOL and get_widest_match(result_types[0].type, BUILTIN_INT, ctx, trigger.location) != BUILTIN_INT:
-                        raise TranslationError(f"Target type of trigger expression was {result_types[0].type.name}, but trigger expressions must resolve to bool or be convertible to bool.", trigger.location)
-            for property in controller.properties:
-                ## properties are permitted to be tuples. we need to ensure the specifiers match the expectation for this property.
-                ## only type-check expected props.
-                if (target_prop := find(target_template.params, lambda k: equals_insensitive(k.name, property.key))) != None:
-                    if (result_type := type_check(property.value, table, ctx, expected = target_prop.type, scope = statedef.scope)) == None:
-                        raise TranslationError(f"Target type of template parameter {property} could not be resolved to a type.", property.location)
-                    match_tuple(result_type, target_prop, ctx, property.location)
-
-def replaceTriggers(ctx: TranslationContext, iterations: int = 0):
-    if iterations == 0: print("Start applying trigger replacements in statedefs...")
-
-    replaced = False
-
-    if iterations > 20:
-        raise TranslationError("Trigger replacement failed to complete after 20 iterations.", compiler_internal(ctx.compiler_flags))
-    
-    ## monstrous, but i do not know if it is avoidable.
-    for statedef in ctx.statedefs:
+    for statedef in profiler.iterate(statedefs, "statedef", "fullPassTypeCheck"):
+        ## in check mode each statedef reports its own type errors, see `diagnostics.recover`.
+        with diagnostics.recover():
+            table = statedef.locals + list(filter(lambda k: scopes_compatible(statedef.scope, k.scope, ctx), ctx.globals))
+            for controller in statedef.states:
+                if (target_template := find_template(controller.name, ctx)) == None:
+                    raise TranslationError(f"Could not find any template or builtin controller with name {controller.name}.", controller.location)
+                for group_id in controller.triggers:
+                    for trigger in controller.triggers[group_id].triggers:
+                        result_types = type_check(trigger, table, ctx, expected = [TypeSpecifier(BUILTIN_BOOL)], scope = statedef.scope)
+                        if result_types == None or len(result_types) != 1:
+                            raise TranslationError(f"Target type of trigger expression was a tuple, but trigger expressions must resolve to bool.", trigger.location)
+                        ## for CNS compatibility, we allow any integral type to act as `bool` on a trigger.
+                        if result_types[0].type != BUILTIN_BOOL and get_widest_match(result_types[0].type, BUILTIN_INT, ctx, trigger.location) != BUILTIN_INT:
+                            raise TranslationError(f"Target type of trigger expression was {result_types[0].type.name}, but trigger expressions must resolve to bool or be convertible to bool.", trigger.location)
+                for property in controller.properties:
+                    ## properties are permitted to be tuples. we need to ensure the specifiers match the expectation for this property.
+                    ## only type-check expected props.
+                    if (target_prop := find(target_template.params, lambda k: equals_insensitive(k.name, property.key))) != None:
+                        if (result_type := type_check(property.value, table, ctx, expected = target_prop.type, scope = statedef.scope)) == None:
+                            raise TranslationError(f"Target type of template parameter {property} could not be resolved to a type.", property.location)
+                        match_tuple(result_type, target_prop, ctx, property.location)
+
+@profiled
+def replaceTriggers(ctx: TranslationContext, statedefs: list[StateDefinition]):
+    print("Start applying trigger replacements in statedefs...")
+
+    ## `replace_triggers` expands each use of a user-defined trigger completely, so a single pass is enough.
+    for statedef in profiler.iterate(statedefs, "statedef", "replaceTriggers"):
         table = statedef.locals + list(filter(lambda k: scopes_compatible(statedef.scope, k.scope, ctx), ctx.globals))
         for controller in statedef.states:
             for group_index in controller.triggers:
-                for trigger in controller.triggers[group_index].triggers:
-                    replaced = replace_triggers(trigger, table, ctx, scope = statedef.scope) or replaced
+                triggers = controller.triggers[group_index].triggers
+                for index in range(len(triggers)):
+                    triggers[index] = replace_triggers(triggers[index], table, ctx, scope = statedef.scope)
             for property in controller.properties:
-                replaced = replace_triggers(property.value, table, ctx, scope = statedef.scope) or replaced
-
-    ## recurse if any replacements were made.
-    if replaced:
-        replaceTriggers(ctx, iterations + 1)
+                property.value = replace_triggers(property.value, table, ctx, scope = statedef.scope)
 
-    if iterations == 0: print("Successfully completed trigger replacement.")
+    print("Successfully completed trigger replacement.")
 
-def replaceStructAssigns(ctx: TranslationContext):
+@profiled
+def replaceStructAssigns(ctx: TranslationContext, statedefs: list[StateDefinition]):
     ## replace any struct assignments with unpacked assignments.
     ## for example, a VarSet with `myVar = Vector2(1, 1)`
     ## should become a Null with two triggers assigning `myVar x := 1` `myVar y := 1`.
     
     ## 2 cases: VarSet with a Struct initializer, or assignment via `:=` with a Struct initializer.
     ### TODO: implement the `:=` assignment option. it's complicated and for now we're only implementing VarSet.
-    for statedef in ctx.statedefs:
+    for statedef in statedefs:
         for controller in statedef.states:
             if equals_insensitive(controller.name, "VarSet"):
                 final_properties: list[StateControllerProperty] = []
@@ -475,6 +445,7 @@ def replaceStructAssigns(ctx: TranslationContext):
                             final_properties.append(property)
                 controller.properties = final_properties
 
+@profiled
 def assignVariables(ctx: TranslationContext):
     ## assign locations for each global variable.
 
@@ -491,6 +462,7 @@ def assignVariables(ctx: TranslationContext):
             create_allocation(local_variable, ctx)
         ctx.allocations = allocation_tables
 
+@profiled
 def applyPersist(ctx: TranslationContext):
     ## for each ChangeState or SelfState, find any `persist` statements
     ## and add an extra `triggerall` to copy the persisted variable.
@@ -506,10 +478,10 @@ def applyPersist(ctx: TranslationContext):
                 if target_node.node != TriggerTreeNode.ATOM:
                     ## it's permitted for targets to be expressions, but in that case, persist statements are not supported. we can emit a warning.
                     if len(find_property("persist", controller)) != 0:
-                        print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: ChangeState and SelfState persist statements can only be used if the target state is an atom, not an expression.")
+                        diagnostics.warn("ChangeState and SelfState persist statements can only be used if the target state is an atom, not an expression.", target[0].location)
                 else:
                     ## get the locals on the target state
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) == None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) == None:
                         #raise TranslationError(f"Target state {target_node.operator} for changestate from state {statedef.name} does not exist.", target[0].location)
                         ## FOR NOW ignore this
                         ## TODO: revisit when project files/common1.cns are implemented
@@ -555,6 +527,7 @@ def applyPersist(ctx: TranslationContext):
                     ## remove all persist props
                     controller.properties = list(filter(lambda k: not equals_insensitive(k.key, "persist"), controller.properties))
 
+@profiled
 def applyStateNumbers(ctx: TranslationContext):
     ## assigns unused state numbers to each state definition lacking one.
     ## first identify all state numbers in use.
@@ -570,6 +543,7 @@ def applyStateNumbers(ctx: TranslationContext):
             if len(all_stateno) > 1: statedef.parameters.id = min(set(range(max(all_stateno) + 2)) - all_stateno)
             all_stateno.add(statedef.parameters.id)
 
+@profiled
 def checkScopes(ctx: TranslationContext):
     ## find any incompatible scopes between source and target on state transitions.
     ## on ChangeState: scopes must be compatible.
@@ -578,7 +552,7 @@ def checkScopes(ctx: TranslationContext):
     ## on TargetState: scope must be TARGET
     ## on HitDef: p1stateno must be PLAYER or SHARED, p2stateno must be TARGET
     ## on HitOverride: stateno must be compatible
-    for statedef in ctx.statedefs:
+    for statedef in profiler.iterate(ctx.statedefs, "statedef", "checkScopes"):
         for controller in statedef.states:
             if equals_insensitive(controller.name, "ChangeState"):
                 target = find_property("value", controller)
@@ -591,10 +565,10 @@ def checkScopes(ctx: TranslationContext):
                     if ctx.compiler_flags.no_changestate_expression:
                         raise TranslationError("Cannot validate statedef scope correctness if target of ChangeState is an expression.", target[0].location)
                     ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                    print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if target of ChangeState is an expression.")
+                    diagnostics.warn("Cannot validate statedef scope correctness if target of ChangeState is an expression.", target[0].location)
                 else:
                     ## check the scopes are compatible.
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                         state_id = statedef.parameters.id if statedef.parameters.id != None else 0
                         if not scopes_compatible(statedef.scope, target_statedef.scope, ctx) and state_id >= 0:
                             raise TranslationError(f"Target state {target_node.operator} for ChangeState from state {statedef.name} does not have a compatible statedef scope.", target[0].location)
@@ -610,10 +584,10 @@ def checkScopes(ctx: TranslationContext):
                     if ctx.compiler_flags.no_changestate_expression:
                         raise TranslationError("Cannot validate statedef scope correctness if target of SelfState is an expression.", target[0].location)
                     ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                    print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if target of SelfState is an expression.")
+                    diagnostics.warn("Cannot validate statedef scope correctness if target of SelfState is an expression.", target[0].location)
                 else:
                     ## check the scopes are compatible.
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                         state_id = statedef.parameters.id if statedef.parameters.id != None else 0
                         if not scopes_compatible(statedef.scope, target_statedef.scope, ctx) and state_id >= 0:
                             raise TranslationError(f"Target state {target_node.operator} for SelfState from state {statedef.name} does not have a compatible statedef scope.", target[0].location)
@@ -628,10 +602,10 @@ def checkScopes(ctx: TranslationContext):
                     if ctx.compiler_flags.no_changestate_expression:
                         raise TranslationError("Cannot validate statedef scope correctness if target of Helper stateno is an expression.", target[0].location)
                     ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                    print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if target of Helper stateno is an expression.")
+                    diagnostics.warn("Cannot validate statedef scope correctness if target of Helper stateno is an expression.", target[0].location)
                 else:
                     ## check the scopes are compatible.
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                         if not target_statedef.scope.type in [StateScopeType.HELPER, StateScopeType.SHARED]:
                             raise TranslationError(f"Target state {target_node.operator} for Helper controller does not have a compatible statedef scope.", target[0].location)
                         if target_statedef.scope.type == StateScopeType.HELPER and target_statedef.scope.target != None:
@@ -657,10 +631,10 @@ def checkScopes(ctx: TranslationContext):
                     if ctx.compiler_flags.no_changestate_expression:
                         raise TranslationError("Cannot validate statedef scope correctness if target of TargetState is an expression.", target[0].location)
                     ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                    print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if target of TargetState is an expression.")
+                    diagnostics.warn("Cannot validate statedef scope correctness if target of TargetState is an expression.", target[0].location)
                 else:
                     ## check the scopes are compatible.
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                         if target_statedef.scope.type != StateScopeType.TARGET:
                             raise TranslationError(f"Target state {target_node.operator} for TargetState from state {statedef.name} does not have the TARGET scope type.", target[0].location)
             elif equals_insensitive(controller.name, "HitDef"):
@@ -673,10 +647,10 @@ def checkScopes(ctx: TranslationContext):
                         if ctx.compiler_flags.no_changestate_expression:
                             raise TranslationError("Cannot validate statedef scope correctness if p1stateno on HitDef is an expression.", target[0].location)
                         ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                        print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if p1stateno on HitDef is an expression.")
+                        diagnostics.warn("Cannot validate statedef scope correctness if p1stateno on HitDef is an expression.", target[0].location)
                     else:
                         ## check the scopes are compatible.
-                        if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                        if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                             if not scopes_compatible(statedef.scope, target_statedef.scope, ctx):
                                 raise TranslationError(f"Target state {target_node.operator} for p1stateno on HitDef from state {statedef.name} does not have a compatible statedef scope.", target[0].location)
                 target = find_property("p2stateno", controller)
@@ -688,10 +662,10 @@ def checkScopes(ctx: TranslationContext):
                         if ctx.compiler_flags.no_changestate_expression:
                             raise TranslationError("Cannot validate statedef scope correctness if p2stateno on HitDef is an expression.", target[0].location)
                         ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                        print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if p2stateno on HitDef is an expression.")
+                        diagnostics.warn("Cannot validate statedef scope correctness if p2stateno on HitDef is an expression.", target[0].location)
                     else:
                         ## check the scopes are compatible.
-                        if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                        if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                             if target_statedef.scope.type != StateScopeType.TARGET:
                                 raise TranslationError(f"Target state {target_node.operator} for p2stateno on HitDef from state {statedef.name} does not have the TARGET scope type.", target[0].location)
             elif equals_insensitive(controller.name, "HitOverride"):
@@ -707,13 +681,14 @@ def checkScopes(ctx: TranslationContext):
                     if ctx.compiler_flags.no_changestate_expression:
                         raise TranslationError("Cannot validate statedef scope correctness if target of HitOverride is an expression.", target[0].location)
                     ## it's permitted for targets to be expressions, but in that case, we cannot check scopes.
-                    print(f"Warning at {os.path.realpath(target[0].location.filename)}:{target[0].location.line}: Cannot validate statedef scope correctness if target of HitOverride is an expression.")
+                    diagnostics.warn("Cannot validate statedef scope correctness if target of HitOverride is an expression.", target[0].location)
                 else:
                     ## check the scopes are compatible.
-                    if (target_statedef := find(ctx.statedefs, lambda k: equals_insensitive(k.name, target_node.operator))) != None:
+                    if (target_statedef := ctx.statedefs.lookup(target_node.operator)) != None:
                         if not scopes_compatible(statedef.scope, target_statedef.scope, ctx):
                             raise TranslationError(f"Target state {target_node.operator} for HitOverride from state {statedef.name} does not have a compatible statedef scope.", target[0].location)
                     
+@profiled
 def checkStateLength(ctx: TranslationContext):
     print("Start state length check...")
     for statedef in ctx.statedefs:
@@ -721,31 +696,36 @@ def checkStateLength(ctx: TranslationContext):
             raise TranslationError(f"State definition for state {statedef.name} has more than 512 state controllers after template resolution. Reduce the size of this state definition or its templates.", statedef.location)
     print("Finished state length check.")
 
-def translateContext(load_ctx: LoadContext) -> TranslationContext:
+@profiled
+def translateContext(load_ctx: LoadContext, check_only: bool = False) -> TranslationContext:
+    ## if `check_only` is set, translation stops after type and scope checking (see `runCheck` in mtlcc),
+    ## and the debugging database is not populated.
     ctx = TranslationContext(load_ctx.filename, load_ctx.compiler_flags)
 
-    ctx.types = builtins.getBaseTypes()
-    ctx.triggers = builtins.getBaseTriggers()
-    ctx.templates = builtins.getBaseTemplates()
+    base = builtins.getBuiltinTables()
+    ctx.types.extend_indexed(base.types, base.type_index)
+    ctx.triggers.extend_indexed(base.triggers, base.trigger_index)
+    ctx.templates.extend_indexed(base.templates, base.template_index)
 
     if ctx.compiler_flags.no_numeric:
         ctx.types.remove(BUILTIN_NUMERIC)
 
     translateTypes(load_ctx, ctx)
     translateStructs(load_ctx, ctx)
-    database.addTypesToDatabase(ctx)
+    if not check_only: database.addTypesToDatabase(ctx)
 
     translateTriggers(load_ctx, ctx)
-    database.addTriggersToDatabase(ctx)
+    if not check_only: database.addTriggersToDatabase(ctx)
     
     translateTemplates(load_ctx, ctx)
 
     ## add the default parameters ignorehitpause and persistent to all template definitions.
+    ## the shared builtin templates already have them.
     for template in ctx.templates:
-        template.params.append(TemplateParameter("ignorehitpause", [TypeSpecifier(BUILTIN_BOOL)], False))
-        template.params.append(TemplateParameter("persistent", [TypeSpecifier(BUILTIN_INT)], False))
+        if template.category != TemplateCategory.BUILTIN:
+            builtins.addDefaultParameters(template)
 
-    database.addTemplatesToDatabase(ctx)
+    if not check_only: database.addTemplatesToDatabase(ctx)
 
     translateStateDefinitions(load_ctx, ctx)
     replaceTemplates(ctx)
@@ -753,10 +733,18 @@ def translateContext(load_ctx: LoadContext) -> TranslationContext:
     checkStateLength(ctx)
         
     createGlobalsTable(ctx, load_ctx.global_forwards)
-    fullPassTypeCheck(ctx)
-    replaceTriggers(ctx)
-    replaceStructAssigns(ctx)
+    (pending, common_key) = restoreCommonStatedefs(ctx)
+    warnings = len(diagnostics.collected) if diagnostics.collected != None else 0
+    fullPassTypeCheck(ctx, pending)
+    ## later phases assume every statedef type-checked successfully.
+    if check_only and diagnostics.has_errors():
+        return ctx
+    replaceTriggers(ctx, pending)
+    replaceStructAssigns(ctx, pending)
+    storeCommonStatedefs(ctx, common_key, warnings)
     checkScopes(ctx)
+    if check_only:
+        return ctx
 
     assignVariables(ctx)
     database.addGlobalsToDatabase(ctx)
@@ -767,31 +755,136 @@ def translateContext(load_ctx: LoadContext) -> TranslationContext:
 
     return ctx
 
-def createOutput(ctx: TranslationContext) -> list[str]:
-    output: list[str] = []
+def countCommonStatedefs(ctx: TranslationContext) -> int:
+    count = 0
+    while count < len(ctx.statedefs) and ctx.statedefs[count].parameters.is_common:
+        count += 1
+    return count
+
+def restoreCommonStatedefs(ctx: TranslationContext) -> tuple[list[StateDefinition], Optional[str]]:
+    ## the compile daemon keeps each project's common statedefs (which come first in the statedef list) as they were after
+    ## trigger replacement in its last build. if they and everything they can refer to are unchanged (see `get_common_key`),
+    ## they are restored here, and skip type checking and trigger replacement.
+    ## returns the statedefs which still need checking and replacement, and the key to store the common statedefs under afterwards.
+    if cache.memory == None or diagnostics.collected == None or (count := countCommonStatedefs(ctx)) == 0:
+        return (ctx.statedefs, None)
+    key = get_common_key(ctx, ctx.statedefs[:count])
+    if (restored := cache.memory.load_common(ctx.filename, key)) == None:
+        return (ctx.statedefs, key)
+    ctx.statedefs[:count] = restored
+    return (ctx.statedefs[count:], None)
+
+def storeCommonStatedefs(ctx: TranslationContext, key: Optional[str], warnings: int):
+    ## warnings are not replayed when the common statedefs are restored, so they are only kept if checking raised none.
+    if key == None or cache.memory == None or diagnostics.collected == None or len(diagnostics.collected) != warnings:
+        return
+    cache.memory.store_common(ctx.filename, key, ctx.statedefs[:countCommonStatedefs(ctx)])
+
+## worker state for parallel statedef emission. each worker receives a copy of the fully-translated context once,
+## then emits the statedefs it is given by index.
+worker_context: Optional[TranslationContext] = None
+
+def initStatedefWorker(ctx: TranslationContext):
+    global worker_context
+    worker_context = ctx
+
+def writeStatedefShard(indices: list[int]) -> list[list[str]]:
+    assert worker_context != None
+    return [write_statedef(worker_context.statedefs[index], worker_context) for index in indices]
+
+def writeStatedefs(statedefs: list[StateDefinition], ctx: TranslationContext, jobs: int) -> Iterator[list[str]]:
+    ## produces the output for each statedef in order, as it is emitted.
+    ## statedef emission does not modify anything shared between statedefs, so the statedefs can be
+    ## split between worker processes and the results concatenated in the original order.
+    if jobs <= 1 or len(statedefs) <= 1:
+        for statedef in statedefs:
+            with profiler.span(statedef.name, "statedef", phase = "writeStatedefs"):
+                output = write_statedef(statedef, ctx)
+            yield output
+        return
+
+    ## workers address statedefs by their index in the context, since they hold a separate copy of it.
+    positions = {id(statedef): index for index, statedef in enumerate(ctx.statedefs)}
+    indices = [positions[id(statedef)] for statedef in statedefs]
+    shard_size = max(1, len(indices) // (jobs * 4))
+    shards = [indices[start:start + shard_size] for start in range(0, len(indices), shard_size)]
+
+    ## only a few shards are submitted ahead of the one being consumed, so finished output does not pile up in memory.
+    with ProcessPoolExecutor(max_workers = jobs, initializer = initStatedefWorker, initargs = (ctx,)) as executor:
+        in_flight: deque[Future[list[list[str]]]] = deque()
+        for shard in shards:
+            in_flight.append(executor.submit(writeStatedefShard, shard))
+            if len(in_flight) >= jobs * 2:
+                yield from in_flight.popleft().result()
+        while len(in_flight) > 0:
+            yield from in_flight.popleft().result()
+
+def createOutput(ctx: TranslationContext, emitted: Optional[dict[str, tuple[str, list[str]]]] = None, jobs: int = 1) -> Iterator[str]:
+    ## produces the lines of the state file. statedefs are emitted as the output is consumed,
+    ## so the caller can write each line out immediately rather than holding the whole file in memory.
+    ## if `emitted` is provided, this is an incremental build: statedefs whose fingerprint matches the previous build
+    ## re-use the previously emitted output, and `emitted` is updated in-place with the output of this build.
+    ## if `jobs` is more than 1, statedefs are emitted in parallel across that many worker processes.
 
     ## start by writing a whole heap of debuginfo to the start of the output file.
     ## the debuginfo documents the MTL version in use and the variable table state.
     ## it also documents a list of types, templates, and triggers used during compilation.
     ## this info is not for human consumption, it's used for debugging.
-    output += debuginfo(DebugCategory.VERSION_HEADER, MTL_VERSION, ctx.compiler_flags)
-    output.append("")
+    yield from debuginfo(DebugCategory.VERSION_HEADER, MTL_VERSION, ctx.compiler_flags)
+    yield ""
 
-    output += write_type_table(ctx)
-    output += write_variable_table(ctx)
+    yield from write_type_table(ctx)
+    yield from write_variable_table(ctx)
 
-    ## now iterate each statedef and produce output, attaching variable debuginfo as needed.
+    ## identify each statedef which should be emitted.
+    targets: list[StateDefinition] = []
     for statedef in ctx.statedefs:
         matches = [sd for sd in ctx.statedefs if sd.parameters.id == statedef.parameters.id and sd.location != statedef.location]
         #matches = get_all(ctx.statedefs, lambda k: k.parameters.id == statedef.parameters.id and k.location != statedef.location)
 
         if len(matches) == 0:
-            output += write_statedef(statedef, ctx)
+            targets.append(statedef)
         elif len(matches) == 1 and (not statedef.parameters.is_common) and matches[0].parameters.is_common:
-            output += write_statedef(statedef, ctx)
+            targets.append(statedef)
         elif len(matches) == 1 and statedef.parameters.is_common:
             continue
         else:
             raise TranslationError(f"State for {statedef.name} with ID {statedef.parameters.id} was redefined: original definition at {matches[0].location.filename}:{matches[0].location.line}", statedef.location)
 
-    return output
\ No newline at end of file
+    ## normalize the statedef parameters before anything is fingerprinted or written, so emission (serial or parallel) only reads the statedefs.
+    for statedef in targets:
+        normalize_statedef_properties(statedef)
+
+    ## for incremental builds, re-use the previous output for each statedef if nothing it depends on has changed since the previous build.
+    ## the compile daemon also keeps the output of each project's common statedefs between builds, and re-uses it on the same terms.
+    reused = emitted
+    if reused == None and cache.memory != None:
+        reused = cache.memory.common_output.setdefault(ctx.filename, {})
+    statedef_output: list[Optional[list[str]]] = [None] * len(targets)
+    fingerprints: list[Optional[str]] = [None] * len(targets)
+    if reused != None:
+        previous = reused.copy()
+        reused.clear()
+        context_fingerprint = get_context_fingerprint(ctx)
+        for index in range(len(targets)):
+            if emitted == None and not targets[index].parameters.is_common:
+                continue
+            fingerprints[index] = get_statedef_fingerprint(targets[index], context_fingerprint)
+            if targets[index].name in previous and previous[targets[index].name][0] == fingerprints[index]:
+                statedef_output[index] = previous[targets[index].name][1]
+        if emitted != None:
+            print(f"Re-used output for {len([o for o in statedef_output if o != None])} of {len(targets)} statedefs from the previous build.")
+
+    ## now produce output for each statedef which could not be re-used, attaching variable debuginfo as needed.
+    pending = writeStatedefs([targets[index] for index in range(len(targets)) if statedef_output[index] == None], ctx, jobs)
+    for index in range(len(targets)):
+        result = statedef_output[index]
+        if result == None:
+            result = next(pending)
+        yield from result
+        if reused != None and (fingerprint := fingerprints[index]) != None:
+            reused[targets[index].name] = (fingerprint, result)
+
+    ## let the writer finish up after its last statedef.
+    for _ in pending:
+        pass
\ No newline at end of file
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
+from typing import Generic, Iterable, Mapping, Optional, TypeVar
 
 from mtl.types.ini import *
 from mtl.types.translation import *
@@ -53,13 +54,87 @@ class LoadContext:
         self.global_forwards = []
         self.compiler_flags = cc
 
+T = TypeVar('T')
+class SymbolTable(list[T], Generic[T]):
+    ## a list of named definitions which also maintains a case-insensitive index from name to definitions.
+    ## the index keeps every definition with a given name in list order, so overloads (e.g. triggers) are preserved.
+    ## it is kept in sync through the list mutators, so code can keep using `append`/`remove` as for a normal list.
+    _index: dict[str, list[T]]
+
+    def __init__(self, items: Iterable[T] = ()):
+        super().__init__(items)
+        self._reindex()
+
+    def __reduce__(self):
+        ## the index is derived data, rebuild it on copy/pickle instead of serializing it.
+        return (SymbolTable, (list(self),))
+
+    def _reindex(self):
+        self._index = {}
+        for item in self:
+            self._index.setdefault(item.name.lower(), []).append(item) # type: ignore
+
+    def append(self, item: T):
+        super().append(item)
+        self._index.setdefault(item.name.lower(), []).append(item) # type: ignore
+
+    def extend(self, items: Iterable[T]):
+        for item in items:
+            self.append(item)
+
+    def extend_indexed(self, items: Iterable[T], index: Mapping[str, Iterable[T]]):
+        ## appends `items` using an index computed in advance (e.g. for the shared builtin tables).
+        ## this is only valid on an empty table, as the index must cover every item.
+        assert len(self) == 0
+        super().extend(items)
+        self._index = {name: list(group) for (name, group) in index.items()}
+
+    def __iadd__(self, items: Iterable[T]):
+        self.extend(items)
+        return self
+
+    def insert(self, index, item: T):
+        super().insert(index, item)
+        self._reindex()
+
+    def remove(self, item: T):
+        super().remove(item)
+        self._reindex()
+
+    def pop(self, index = -1) -> T:
+        result = super().pop(index)
+        self._reindex()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._index = {}
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def lookup(self, name: str) -> Optional[T]:
+        ## returns the first definition with a matching name, if any.
+        if (matches := self._index.get(name.lower())) == None or len(matches) == 0:
+            return None
+        return matches[0]
+
+    def lookup_all(self, name: str) -> list[T]:
+        ## returns all definitions with a matching name, in definition order.
+        return self._index.get(name.lower(), [])
+
 @dataclass
 class TranslationContext:
     filename: str
-    types: list[TypeDefinition]
-    triggers: list[TriggerDefinition]
-    templates: list[TemplateDefinition]
-    statedefs: list[StateDefinition]
+    types: SymbolTable[TypeDefinition]
+    triggers: SymbolTable[TriggerDefinition]
+    templates: SymbolTable[TemplateDefinition]
+    statedefs: SymbolTable[StateDefinition]
     globals: list[TypeParameter]
     allocations: dict[StateDefinitionScope, tuple[AllocationTable, AllocationTable, AllocationTable, AllocationTable]]
     compiler_flags: CompilerConfiguration
@@ -67,10 +142,10 @@ class TranslationContext:
 
     def __init__(self, filename: str, cc: CompilerConfiguration):
         self.filename = filename
-        self.types = []
-        self.triggers = []
-        self.templates = []
-        self.statedefs = []
+        self.types = SymbolTable()
+        self.triggers = SymbolTable()
+        self.templates = SymbolTable()
+        self.statedefs = SymbolTable()
         self.globals = []
         self.allocations = {}
         self.compiler_flags = cc
@@ -91,6 +166,14 @@ class ProjectContext:
     contents: list[INISection]
     global_forwards: list[ForwardParameter]
     compiler_flags: CompilerConfiguration
+    ## if set, loaded source files are cached in this directory and re-used when unchanged.
+    cache_dir: Optional[str]
+    ## if set, statedef output from the previous build is re-used for statedefs which did not change (requires `cache_dir`).
+    incremental: bool
+    ## number of worker processes used to load source files and emit statedefs.
+    jobs: int
+    ## if set, a per-phase profile of the compilation is written to this path (see `mtl.utils.profiler`).
+    profile: Optional[str]
 
     def __init__(self, filename: str):
         self.filename = filename
@@ -106,3 +189,7 @@ class ProjectContext:
         self.commands = []
         self.global_forwards = []
         self.compiler_flags = CompilerConfiguration()
+        self.cache_dir = None
+        self.incremental = False
+        self.jobs = 1
+        self.profile = None
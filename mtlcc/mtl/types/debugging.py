@@ -1,3 +1,4 @@
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
 import ctypes
 from ctypes import c_int, c_short, wintypes
@@ -93,6 +94,32 @@ class DebuggerResponseIPC:
     response_type: DebuggerResponseType
     response_detail: bytes
 
+class MemoryBackend(ABC):
+    ## access to the memory of the debugged process. a backend is opened once per launch and used for every read and write
+    ## (see `mtl.debugging.memory` for the implementations).
+    @abstractmethod
+    def read(self, address: int, count: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def write(self, address: int, data: bytes):
+        pass
+
+    def read_many(self, ranges: list[tuple[int, int]]) -> list[bytes]:
+        ## reads each (address, count) range in order.
+        return [self.read(address, count) for (address, count) in ranges]
+
+    def unprotect(self, address: int, size: int):
+        ## makes a region writable and executable, for patches placed outside of .text (see `ctx.is_winmugen`).
+        pass
+
+    def invalidate(self):
+        ## drops any memory cached while the process was paused, called whenever it continues.
+        pass
+
+    def close(self):
+        pass
+
 @dataclass
 class DebuggerLaunchInfo:
     process_id: int
@@ -102,6 +129,7 @@ class DebuggerLaunchInfo:
     state: DebugProcessState
     database: dict
     ipc: bool
+    memory: MemoryBackend
 
 @dataclass
 class DebuggerTarget:
@@ -169,6 +197,13 @@ class DebugStateInfo:
     states: list[Location]
     state_data: list[DebugControllerInfo]
 
+@dataclass
+class DebugLocationIndex:
+    ## statedef and controller locations within a single source file, sorted by line.
+    ## `targets[i]` is the (index in `states`, controller index) which a location at `lines[i]` resolves to.
+    lines: list[int]
+    targets: list[tuple[int, int]]
+
 @dataclass
 class DebuggingContext:
     strings: list[str]
@@ -187,10 +222,35 @@ class DebuggingContext:
     enable_ai: int
     quiet: bool
     is_winmugen: bool
+    ## interning tables for the database: string -> index in `strings`,
+    ## and lowercase type name -> index of the first type with that name in `types`.
+    string_ids: dict[str, int]
+    type_ids: dict[str, int]
+    ## source filename as referenced by a Location -> index of its database path in `strings` (see `addPathToDatabase`).
+    path_ids: dict[str, int]
+    ## state lookup indexes: state ID -> indices in `states`, and lowercase state name -> indices in `states`.
+    ## states are only ever appended, so `index_states` extends the indexes to cover any states added since the last call.
+    state_ids: dict[int, list[int]]
+    state_names: dict[str, list[int]]
+    indexed_states: int
+    ## source location index used to resolve breakpoints: normalized filename (see `normalize_path`) -> locations in that file,
+    ## and the file each normalized path given to `find_location_file` resolved to. extended by `index_locations` in the same way as the state indexes.
+    locations: dict[str, DebugLocationIndex]
+    location_keys: dict[str, Optional[str]]
+    indexed_locations: int
 
     def __init__(self):
         self.strings = []
+        self.string_ids = {}
         self.types = []
+        self.type_ids = {}
+        self.path_ids = {}
+        self.state_ids = {}
+        self.state_names = {}
+        self.indexed_states = 0
+        self.locations = {}
+        self.location_keys = {}
+        self.indexed_locations = 0
         self.triggers = []
         self.templates = []
         self.globals = []
@@ -206,6 +266,28 @@ class DebuggingContext:
         self.quiet = False
         self.is_winmugen = False
 
+    def add_string(self, value: str) -> int:
+        ## returns the index of `value` in the strings table, adding it if it is not present yet.
+        if (id := self.string_ids.get(value)) == None:
+            id = len(self.strings)
+            self.strings.append(value)
+            self.string_ids[value] = id
+        return id
+
+    def add_type(self, info: DebugTypeInfo):
+        self.type_ids.setdefault(info.name.lower(), len(self.types))
+        self.types.append(info)
+
+    def get_type_id(self, name: str) -> Optional[int]:
+        return self.type_ids.get(name.lower())
+
+    def index_states(self):
+        for index in range(self.indexed_states, len(self.states)):
+            state = self.states[index]
+            self.state_ids.setdefault(state.id, []).append(index)
+            self.state_names.setdefault(state.name.lower(), []).append(index)
+        self.indexed_states = len(self.states)
+
 class EXCEPTION_RECORD(ctypes.Structure):
     _fields_ = [
         ("ExceptionCode", wintypes.DWORD),
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 import os
+import sys
 import enum
 
 class DebugCategory(enum.Enum):
@@ -12,11 +13,16 @@ class DebugCategory(enum.Enum):
     LOCATION = 6
     STATEDEF = 7
 
-@dataclass
+## Locations are shared between every node parsed from the same source line, and filenames are interned
+## since generated sources specify them on every section.
+@dataclass(slots = True)
 class Location:
     filename: str
     line: int
 
+    def __post_init__(self):
+        self.filename = sys.intern(self.filename)
+
     def __str__(self):
         return f"{os.path.realpath(self.filename)}:{self.line}"
     
@@ -25,7 +31,29 @@ class DebuggerError(Exception):
 
 class TranslationError(Exception):
     message: str
+    description: str
+    location: Location
 
     def __init__(self, message: str, location: Location):
         super().__init__(f"Translation error at {location}: {message}")
-        self.message = f"{location}: {message}"
\ No newline at end of file
+        self.message = f"{location}: {message}"
+        self.description = message
+        self.location = location
+        self._reduce_args = (message, location)
+
+    def __reduce__(self):
+        ## errors need to survive pickling to be raised across process boundaries (e.g. parallel file loading).
+        return (TranslationError, self._reduce_args)
+
+class DiagnosticLevel(enum.Enum):
+    ERROR = 0
+    WARNING = 1
+
+@dataclass
+class Diagnostic:
+    level: DiagnosticLevel
+    message: str
+    location: Location
+
+    def __str__(self):
+        return f"{'Error' if self.level == DiagnosticLevel.ERROR else 'Warning'} at {self.location}: {self.message}"
\ No newline at end of file
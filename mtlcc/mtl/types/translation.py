@@ -122,6 +122,27 @@ class TemplateDefinition:
     location: Location
     category: TemplateCategory = TemplateCategory.DEFINED
 
+@dataclass
+class ExpandedController:
+    ## a controller from an expanded template body. if `nested` is set, `controller` is a call to another
+    ## template and `nested` is that template's expanded body, with its locals in `instance`.
+    controller: StateController
+    nested: Optional[list['ExpandedController']] = None
+    instance: int = 0
+
+@dataclass
+class ExpandedTemplate:
+    ## a DEFINED template with all nested template calls resolved.
+    ## parameters and locals are referenced through placeholder atoms, which are resolved at each call site.
+    template: TemplateDefinition
+    body: list[ExpandedController]
+    ## placeholder name and local for each instance of a template in the body; instance 0 is `template` itself.
+    locals: list[list[tuple[str, TypeParameter]]]
+    ## name of the template for each instance.
+    instances: list[str]
+    ## maps each parameter placeholder to the (lowercase) name of the parameter.
+    params: dict[str, str]
+
 @dataclass
 class StateDefinitionParameters:
     type: Optional[str] = None
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
+import sys
 
 from mtl.types.shared import Location
 
@@ -14,7 +15,9 @@ class TriggerTreeNode(Enum):
     STRUCT_ACCESS = 5
     REDIRECT = 6
 
-@dataclass
+## a parsed character contains a very large number of trees, so they are slotted and the operators are interned
+## (most operators are a small set of trigger names and symbols).
+@dataclass(slots = True)
 class TriggerTree:
     node: TriggerTreeNode
     operator: str
@@ -22,6 +25,9 @@ class TriggerTree:
     location: Location
     precedence: bool = False
 
+    def __post_init__(self):
+        self.operator = sys.intern(self.operator)
+
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, TriggerTree):
             return False
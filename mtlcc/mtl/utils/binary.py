@@ -1,3 +1,4 @@
+import struct
 from io import BufferedWriter, BufferedReader
 from typing import Optional
 
@@ -24,6 +25,11 @@ def write_tree(val: TriggerTree, f: BufferedWriter):
     for child in val.children:
         write_tree(child, f)
 
+## struct formats matching the write and read functions, for packing records in bulk.
+INTEGER = struct.Struct("<i")
+SHORT = struct.Struct("<h")
+BYTE = struct.Struct("<b")
+
 def read_integer(f: BufferedReader) -> int:
     return int.from_bytes(f.read(4), byteorder='little', signed=True)
 
@@ -0,0 +1,172 @@
+## on-disk cache for loaded source files.
+## each source file gets one slot in the cache directory, holding the key it was loaded with and the resulting LoadContext.
+## the key covers everything which can change the result of `loadFile`: the file path as passed, the file contents,
+## the compiler flags, and the MTL version. if any of these change the slot is simply overwritten.
+import hashlib
+import os
+import pickle
+from dataclasses import asdict
+from typing import Optional
+
+from mtl.types.context import LoadContext, TranslationContext, CompilerConfiguration
+from mtl.types.translation import StateDefinition
+from mtl.utils.constant import MTL_VERSION
+
+## bump this whenever the layout of cached objects changes, so entries written by older versions of the compiler are ignored.
+CACHE_FORMAT = 2
+
+def get_default_cache_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".mtlcc", "cache")
+
+def get_cache_key(file: str, cc: CompilerConfiguration) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(f"{MTL_VERSION}:{CACHE_FORMAT}".encode("utf-8"))
+    hasher.update(repr(sorted(asdict(cc).items())).encode("utf-8"))
+    hasher.update(file.encode("utf-8"))
+    with open(file, mode="rb") as f:
+        hasher.update(f.read())
+    return hasher.hexdigest()
+
+def get_cache_slot(file: str, cache_dir: str, suffix: str = ".cache") -> str:
+    return os.path.join(cache_dir, hashlib.sha256(os.path.realpath(file).encode("utf-8")).hexdigest() + suffix)
+
+def load_cached(file: str, key: str, cache_dir: str) -> Optional[LoadContext]:
+    slot = get_cache_slot(file, cache_dir)
+    if not os.path.exists(slot):
+        return None
+    try:
+        with open(slot, mode="rb") as f:
+            (cached_key, ctx) = pickle.load(f)
+    except Exception:
+        ## a corrupt or outdated cache entry is treated as a miss.
+        return None
+    if cached_key != key or not isinstance(ctx, LoadContext):
+        return None
+    return ctx
+
+def store_cached(file: str, key: str, ctx: LoadContext, cache_dir: str):
+    ## the cache is best-effort, failing to write it should never fail the build.
+    slot = get_cache_slot(file, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok = True)
+        with open(slot + ".tmp", mode="wb") as f:
+            pickle.dump((key, ctx), f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(slot + ".tmp", slot)
+    except OSError as exc:
+        print(f"Warning: failed to write compile cache entry for {file}: {exc}")
+
+## in-memory layer over the compile cache, used by the compile daemon (see `mtl.daemon`).
+## each loaded file is kept pickled, so every build gets its own copy to modify, and is re-used until the size or
+## modification time of the file changes. the key also covers the path as passed and the compiler flags, as for `get_cache_key`.
+class MemoryCache:
+    def __init__(self):
+        self.entries: dict[tuple[str, str], tuple[tuple[int, int], bytes]] = {}
+        ## signature of each file at the time a load missed, so a change made while the file is being parsed is still noticed.
+        self.pending: dict[tuple[str, str], tuple[int, int]] = {}
+        ## files requested and files stored (i.e. which had to be loaded from disk) since the last call to `take_loaded`.
+        self.loaded: list[str] = []
+        self.reloaded: list[str] = []
+        ## for each project, its common statedefs (e.g. common1.mtl) as of the end of trigger replacement in its last build,
+        ## along with the key they were translated under (see `get_common_key` and `translator.restoreCommonStatedefs`).
+        self.common: dict[str, tuple[str, bytes]] = {}
+        ## for each project, the emitted output of its common statedefs, re-used on the same terms as an incremental build.
+        self.common_output: dict[str, dict[str, tuple[str, list[str]]]] = {}
+
+    def get_key(self, file: str, cc: CompilerConfiguration) -> tuple[str, str]:
+        return (file, repr(sorted(asdict(cc).items())))
+
+    def load(self, file: str, cc: CompilerConfiguration) -> Optional[LoadContext]:
+        key = self.get_key(file, cc)
+        self.loaded.append(file)
+        signature = get_file_signature(file)
+        if (entry := self.entries.get(key)) != None and entry[0] == signature:
+            return pickle.loads(entry[1])
+        self.pending[key] = signature
+        return None
+
+    def store(self, file: str, cc: CompilerConfiguration, ctx: LoadContext):
+        key = self.get_key(file, cc)
+        signature = self.pending.pop(key, None) or get_file_signature(file)
+        self.entries[key] = (signature, pickle.dumps(ctx, protocol = pickle.HIGHEST_PROTOCOL))
+        self.reloaded.append(file)
+
+    def load_common(self, project: str, key: str) -> Optional[list[StateDefinition]]:
+        if (entry := self.common.get(project)) != None and entry[0] == key:
+            return pickle.loads(entry[1])
+        return None
+
+    def store_common(self, project: str, key: str, statedefs: list[StateDefinition]):
+        ## later phases modify the statedefs in-place, so a copy is stored.
+        self.common[project] = (key, pickle.dumps(statedefs, protocol = pickle.HIGHEST_PROTOCOL))
+
+    def take_loaded(self) -> tuple[list[str], list[str]]:
+        (loaded, reloaded) = (self.loaded, self.reloaded)
+        (self.loaded, self.reloaded) = ([], [])
+        return (loaded, reloaded)
+
+def get_file_signature(file: str) -> tuple[int, int]:
+    stat = os.stat(file)
+    return (stat.st_mtime_ns, stat.st_size)
+
+## the active in-memory cache, if running as a daemon.
+memory: Optional[MemoryCache] = None
+
+## incremental build support.
+## the output of `write_statedef` for a statedef depends only on the fully-translated statedef (after templates and triggers
+## have been inlined and variables allocated) plus some project-wide state: the compiler flags, the type table, the globals table,
+## the statedef name/ID mapping, and the signatures of templates and triggers used during emission.
+## the project-wide state is hashed once per build and combined with each statedef to produce a per-statedef fingerprint.
+def get_context_fingerprint(ctx: TranslationContext) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(MTL_VERSION.encode("utf-8"))
+    hasher.update(pickle.dumps(ctx.compiler_flags, protocol = pickle.HIGHEST_PROTOCOL))
+    hasher.update(pickle.dumps(list(ctx.types), protocol = pickle.HIGHEST_PROTOCOL))
+    hasher.update(pickle.dumps(ctx.globals, protocol = pickle.HIGHEST_PROTOCOL))
+    hasher.update(pickle.dumps([(statedef.name, statedef.parameters.id, statedef.scope) for statedef in ctx.statedefs], protocol = pickle.HIGHEST_PROTOCOL))
+    ## template and trigger bodies are already inlined into the statedefs, so only their signatures matter here.
+    hasher.update(pickle.dumps([(template.name, template.params) for template in ctx.templates], protocol = pickle.HIGHEST_PROTOCOL))
+    hasher.update(pickle.dumps([(trigger.name, trigger.type, trigger.params, trigger.category) for trigger in ctx.triggers], protocol = pickle.HIGHEST_PROTOCOL))
+    return hasher.hexdigest()
+
+def get_common_key(ctx: TranslationContext, statedefs: list[StateDefinition]) -> str:
+    ## type checking and trigger replacement of a statedef depend on the statedef itself, the compiler flags, the type, trigger and
+    ## template tables, the globals and the statedef name/ID mapping (all covered by `get_context_fingerprint`), and also on the
+    ## bodies of user-defined triggers, which are inlined by trigger replacement.
+    hasher = hashlib.sha256()
+    hasher.update(get_context_fingerprint(ctx).encode("utf-8"))
+    hasher.update(repr([(trigger.name, trigger.exprn) for trigger in ctx.triggers if trigger.exprn != None]).encode("utf-8"))
+    for statedef in statedefs:
+        hasher.update(repr(statedef).encode("utf-8"))
+    return hasher.hexdigest()
+
+def get_statedef_fingerprint(statedef: StateDefinition, context_fingerprint: str) -> str:
+    ## the statedef is hashed through its repr: pickle output also depends on which objects happen to be shared
+    ## (e.g. a statedef loaded from the compile cache vs. freshly parsed), not only on their values.
+    hasher = hashlib.sha256()
+    hasher.update(context_fingerprint.encode("utf-8"))
+    hasher.update(repr(statedef).encode("utf-8"))
+    return hasher.hexdigest()
+
+def load_incremental(target: str, cache_dir: str) -> dict[str, tuple[str, list[str]]]:
+    ## maps each statedef name to the fingerprint it was last emitted with and the emitted lines.
+    slot = get_cache_slot(target, cache_dir, ".incremental")
+    if not os.path.exists(slot):
+        return {}
+    try:
+        with open(slot, mode="rb") as f:
+            (version, emitted) = pickle.load(f)
+    except Exception:
+        return {}
+    if version != f"{MTL_VERSION}:{CACHE_FORMAT}" or not isinstance(emitted, dict):
+        return {}
+    return emitted
+
+def store_incremental(target: str, emitted: dict[str, tuple[str, list[str]]], cache_dir: str):
+    slot = get_cache_slot(target, cache_dir, ".incremental")
+    try:
+        os.makedirs(cache_dir, exist_ok = True)
+        with open(slot + ".tmp", mode="wb") as f:
+            pickle.dump((f"{MTL_VERSION}:{CACHE_FORMAT}", emitted), f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(slot + ".tmp", slot)
+    except OSError as exc:
+        print(f"Warning: failed to write incremental build data for {target}: {exc}")
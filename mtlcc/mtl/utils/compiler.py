@@ -8,22 +8,23 @@ from mtl.types.translation import *
 from mtl.types.builtins import *
 from mtl.parser.trigger import parseTrigger
 from mtl.utils.func import *
+from mtl.utils import diagnostics
 
-import copy
 
 def find_type(type_name: str, ctx: TranslationContext) -> Optional[TypeDefinition]:
-    return find(ctx.types, lambda k: equals_insensitive(k.name, type_name))
+    return ctx.types.lookup(type_name)
 
 def find_template(template_name: str, ctx: TranslationContext) -> Optional[TemplateDefinition]:
-    return find(ctx.templates, lambda k: equals_insensitive(k.name, template_name))
+    return ctx.templates.lookup(template_name)
 
 def find_statedef(state_name: str, ctx: TranslationContext) -> Optional[StateDefinition]:
+    ## a state can only match by ID if the input is numeric, so non-numeric names can use the name index directly.
+    if tryparse(state_name, int) == None:
+        return ctx.statedefs.lookup(state_name)
     return find(ctx.statedefs, lambda k: equals_insensitive(k.name, state_name) or str(k.parameters.id) == state_name)
 
 def find_trigger(trigger_name: str, param_types: list[TypeDefinition], ctx: TranslationContext, loc: Location) -> Optional[TriggerDefinition]:
-    #all_matches = get_all(ctx.triggers, lambda k: equals_insensitive(k.name, trigger_name))
-    trigger_lower = trigger_name.lower()
-    all_matches = [trig for trig in ctx.triggers if trig._lower == trigger_lower]
+    all_matches = ctx.triggers.lookup_all(trigger_name)
     ## there may be multiple candidate matches, we need to check if the types provided as input match the types of the candidate.
     for match in all_matches:
         ## the input type count should exactly match.
@@ -45,9 +46,7 @@ def find_property(property: str, controller: StateController) -> list[StateContr
 ## this checks EACH possible match and identifies which can potentially match the input trigger.
 def fuzzy_trigger(trigger_name: str, table: list[TypeParameter], params: list[TriggerTree], ctx: TranslationContext, loc: Location, scope: Optional[StateDefinitionScope] = None, pass_through: Optional[bool] = True) -> list[TriggerDefinition]:
     results: list[TriggerDefinition] = []
-    #all_matches = get_all(ctx.triggers, lambda k: equals_insensitive(k.name, trigger_name))
-    trigger_lower = trigger_name.lower()
-    all_matches = [trig for trig in ctx.triggers if trig._lower == trigger_lower]
+    all_matches = ctx.triggers.lookup_all(trigger_name)
     
     for match in all_matches:
         is_match = True
@@ -172,7 +171,7 @@ def get_type_match(t1_: TypeDefinition, t2_: TypeDefinition, ctx: TranslationCon
     if t1.name == "float" and t2.name == "int":
         ## in a lot of builtin cases an alternative to convert `int` to `float` will be taken. so just warn and return None.
         ## if no alternative exists an error will be emitted anyway.
-        if not no_warn: print(f"Warning at {os.path.realpath(loc.filename)}:{loc.line}: Conversion from float to int may result in loss of precision. If this is intended, use functions like ceil or floor to convert, or explicitly cast one side of the expression.")
+        if not no_warn: diagnostics.warn("Conversion from float to int may result in loss of precision. If this is intended, use functions like ceil or floor to convert, or explicitly cast one side of the expression.", loc)
         return None
     
     ## smaller builtin types can implicitly convert to wider ones (`bool`->`byte`->`short`->`int`)
@@ -268,41 +267,199 @@ def parse_controller(state: StateControllerSection, ctx: TranslationContext) ->
 
     return StateController(name, triggers, properties, state.location)
 
-def replace_recursive(tree: TriggerTree, old: TriggerTree, new: TriggerTree):
-    ## make sure to replace THIS tree if it exactly matches the old one.
-    if tree == old:
-        tree.node = new.node
-        tree.children = copy.deepcopy(new.children)
-        tree.operator = new.operator
-        return
-    ## this iterates its children.
-    for subindex in range(len(tree.children)):
-        if tree.children[subindex] == old:
-            tree.children[subindex] = copy.deepcopy(new)
+## TriggerTrees are shared between templates, trigger definitions, and the statedefs they are expanded into,
+## so they must never be modified in-place. the functions below return new nodes only along the paths which changed,
+## and return the input tree itself if nothing was replaced.
+def with_children(tree: TriggerTree, children: list[TriggerTree]) -> TriggerTree:
+    ## returns `tree` if none of the children changed, otherwise a copy of `tree` with the new children.
+    if all(new is old for new, old in zip(children, tree.children)):
+        return tree
+    return TriggerTree(tree.node, tree.operator, children, tree.location, tree.precedence)
+
+def substitute_recursive(tree: TriggerTree, replacements: dict[str, TriggerTree]) -> TriggerTree:
+    if tree.node == TriggerTreeNode.ATOM and (new := replacements.get(tree.operator.lower())) != None:
+        return new
+    return with_children(tree, [substitute_recursive(child, replacements) for child in tree.children])
+
+def substitute(tree: TriggerTree, replacements: dict[str, TriggerTree]) -> TriggerTree:
+    ## replaces each ATOM whose name (case-insensitively) matches a key in `replacements` with the mapped tree.
+    ## keys must be lowercase. all replacements are applied at once, substituted trees are not searched again.
+    result = substitute_recursive(tree, replacements)
+    ## if the root itself is replaced, it keeps its own location.
+    if result is not tree and tree.node == TriggerTreeNode.ATOM:
+        return TriggerTree(result.node, result.operator, result.children, tree.location, tree.precedence)
+    return result
+
+def map_controller(controller: StateController, fn: Callable[[TriggerTree], TriggerTree]) -> StateController:
+    ## produces a new controller with `fn` applied to each trigger and property.
+    ## the trigger groups and properties are always new, so the result can be modified without affecting `controller`.
+    triggers = {group_id: TriggerGroup([fn(trigger) for trigger in controller.triggers[group_id].triggers]) for group_id in controller.triggers}
+    properties = [StateControllerProperty(property.key, fn(property.value), property.location) for property in controller.properties]
+    return StateController(controller.name, triggers, properties, controller.location)
+
+def substitute_controller(controller: StateController, replacements: dict[str, TriggerTree]) -> StateController:
+    return map_controller(controller, lambda tree: substitute(tree, replacements))
+
+## template expansion.
+## each DEFINED template is expanded once: its body is copied with uses of its parameters and locals swapped for placeholder atoms,
+## and any calls to other DEFINED templates are resolved to their (already expanded) bodies.
+## placeholders contain a character which cannot appear in source, so they can never capture a name from another template's body.
+## at each call site the placeholders are bound to the call's parameters and to freshly-prefixed locals.
+TEMPLATE_PARAM_PLACEHOLDER = "\0param:"
+
+def template_local_placeholder(instance: int, name: str) -> str:
+    return f"\0local{instance}:{name.lower()}"
+
+def mark_template_recursive(tree: TriggerTree, locals: set[str], params: set[str], location: Location, found: dict[str, str]) -> TriggerTree:
+    if tree.node == TriggerTreeNode.ATOM:
+        ## locals take priority over parameters with the same name.
+        if (name := tree.operator.lower()) in locals:
+            return TriggerTree(TriggerTreeNode.ATOM, template_local_placeholder(0, name), [], location)
+        if name in params:
+            ## the placeholder keeps the original text, in case the parameter is not provided at the call site.
+            found[TEMPLATE_PARAM_PLACEHOLDER + tree.operator] = name
+            return TriggerTree(TriggerTreeNode.ATOM, TEMPLATE_PARAM_PLACEHOLDER + tree.operator, [], tree.location, tree.precedence)
+    return with_children(tree, [mark_template_recursive(child, locals, params, location, found) for child in tree.children])
+
+def mark_template_atoms(tree: TriggerTree, locals: set[str], params: set[str], location: Location, found: dict[str, str]) -> TriggerTree:
+    result = mark_template_recursive(tree, locals, params, location, found)
+    if result is not tree and tree.node == TriggerTreeNode.ATOM:
+        return TriggerTree(result.node, result.operator, result.children, tree.location, tree.precedence)
+    return result
+
+def instantiate_recursive(tree: TriggerTree, replacements: dict[str, TriggerTree], renames: dict[str, str]) -> TriggerTree:
+    if tree.node == TriggerTreeNode.ATOM:
+        if (new := replacements.get(tree.operator)) != None:
+            return new
+        if (name := renames.get(tree.operator)) != None:
+            return TriggerTree(TriggerTreeNode.ATOM, name, [], tree.location, tree.precedence)
+    return with_children(tree, [instantiate_recursive(child, replacements, renames) for child in tree.children])
+
+def instantiate(tree: TriggerTree, replacements: dict[str, TriggerTree], renames: dict[str, str]) -> TriggerTree:
+    ## replaces placeholder atoms in `replacements` with the mapped tree, and renames placeholder atoms in `renames` in-place.
+    result = instantiate_recursive(tree, replacements, renames)
+    if result is not tree and tree.node == TriggerTreeNode.ATOM:
+        return TriggerTree(result.node, result.operator, result.children, tree.location, tree.precedence)
+    return result
+
+def bind_template_params(expanded: ExpandedTemplate, call: StateController) -> tuple[dict[str, TriggerTree], dict[str, str]]:
+    ## binds each parameter placeholder to the expression provided by `call`.
+    ## parameters which are not provided are renamed back to their original text.
+    bound: dict[str, TriggerTree] = {}
+    for param in expanded.template.params:
+        if len(target_exprn := find_property(param.name, call)) != 1 and param.required:
+            raise TranslationError(f"No expression was provided for parameter with name {param.name} on template or controller {call.name}.", call.location)
+        if len(target_exprn) == 1:
+            bound.setdefault(target_exprn[0].key.lower(), target_exprn[0].value)
+    replacements: dict[str, TriggerTree] = {}
+    renames: dict[str, str] = {}
+    for placeholder, name in expanded.params.items():
+        if (value := bound.get(name)) != None:
+            replacements[placeholder] = value
         else:
-            replace_recursive(tree.children[subindex], old, new)
+            renames[placeholder] = placeholder[len(TEMPLATE_PARAM_PLACEHOLDER):]
+    return (replacements, renames)
+
+def embed_template_body(body: list[ExpandedController], replacements: dict[str, TriggerTree], renames: dict[str, str], base: int) -> list[ExpandedController]:
+    return [
+        ExpandedController(
+            map_controller(entry.controller, lambda tree: instantiate(tree, replacements, renames)),
+            embed_template_body(entry.nested, replacements, renames, base) if entry.nested != None else None,
+            base + entry.instance
+        ) for entry in body
+    ]
+
+def expand_template(template: TemplateDefinition, ctx: TranslationContext, expanded: dict[str, ExpandedTemplate], expanding: list[str]) -> ExpandedTemplate:
+    ## `expanded` holds templates which were already expanded, `expanding` is the chain of templates currently being expanded.
+    if (result := expanded.get(template.name.lower())) != None:
+        return result
+    if find(expanding, lambda k: equals_insensitive(k, template.name)) != None:
+        raise TranslationError(f"Template {template.name} includes itself recursively: {' -> '.join(expanding + [template.name])}", template.location)
+    expanding.append(template.name)
+
+    local_names = set(local.name.lower() for local in template.locals)
+    param_names = set(param.name.lower() for param in template.params)
+    params: dict[str, str] = {}
+    locals: list[list[tuple[str, TypeParameter]]] = [[(template_local_placeholder(0, local.name), local) for local in template.locals]]
+    instances: list[str] = [template.name]
+    body: list[ExpandedController] = []
+    for template_controller in template.states:
+        controller = map_controller(template_controller, lambda tree: mark_template_atoms(tree, local_names, param_names, template_controller.location, params))
+        if (target := find_template(controller.name, ctx)) == None:
+            raise TranslationError(f"No template or builtin controller was found to match state controller with name {controller.name}", controller.location)
+        if target.category != TemplateCategory.DEFINED:
+            body.append(ExpandedController(controller))
+            continue
+        ## bind the nested template's parameters to this call, and move its locals into new instances of this template.
+        nested = expand_template(target, ctx, expanded, expanding)
+        (replacements, renames) = bind_template_params(nested, controller)
+        base = len(locals)
+        for (instance, name) in zip(nested.locals, nested.instances):
+            locals.append([])
+            instances.append(name)
+            for (placeholder, local) in instance:
+                renames[placeholder] = template_local_placeholder(len(locals) - 1, local.name)
+                locals[-1].append((renames[placeholder], local))
+        body.append(ExpandedController(controller, embed_template_body(nested.body, replacements, renames, base), base))
+
+    expanding.pop()
+    expanded[template.name.lower()] = (result := ExpandedTemplate(template, body, locals, instances, params))
+    return result
 
-def replace_expression(controller: StateController, old: TriggerTree, new: TriggerTree):
-    ## find instances of `old` in the controller and replace with `new`.
-    for group_id in controller.triggers:
-        for trigger in controller.triggers[group_id].triggers:
-            replace_recursive(trigger, old, new)
-    for property in controller.properties:
-        replace_recursive(property.value, old, new)
+def splice_template_body(expanded: ExpandedTemplate, body: list[ExpandedController], call: StateController, replacements: dict[str, TriggerTree], renames: dict[str, str], levels: list[list[TypeParameter]], index: int, depth: int, scope: StateDefinitionScope) -> list[StateController]:
+    ## each controller copies `ignorehitpause` and `persistent` from the call site,
+    ## and the triggers on the call are combined into one or more triggerall statements inserted into each controller.
+    ignorehitpause = find_property("ignorehitpause", call)
+    persistent = find_property("persistent", call)
+    combined_triggers = merge_triggers(call.triggers, call.location)
+
+    result: list[StateController] = []
+    for entry in body:
+        controller = map_controller(entry.controller, lambda tree: instantiate(tree, replacements, renames))
+        if len(ignorehitpause) == 1:
+            controller.properties.append(StateControllerProperty(ignorehitpause[0].key, ignorehitpause[0].value, ignorehitpause[0].location))
+        if len(persistent) == 1:
+            controller.properties.append(StateControllerProperty(persistent[0].key, persistent[0].value, persistent[0].location))
+        if 0 not in controller.triggers:
+            controller.triggers[0] = TriggerGroup([])
+        controller.triggers[0].triggers += combined_triggers
+
+        if entry.nested == None:
+            result.append(controller)
+        else:
+            add_template_locals(expanded, entry.instance, renames, levels, index, depth, scope)
+            result += splice_template_body(expanded, entry.nested, controller, replacements, renames, levels, index, depth + 1, scope)
+    return result
 
-def replace_triggers(tree: TriggerTree, table: list[TypeParameter], ctx: TranslationContext, scope: Optional[StateDefinitionScope] = None) -> bool:
+def add_template_locals(expanded: ExpandedTemplate, instance: int, renames: dict[str, str], levels: list[list[TypeParameter]], index: int, depth: int, scope: StateDefinitionScope):
+    ## the locals of each template instance get a prefix to ensure they are uniquified.
+    ## the prefix is derived from the template name, the index of the call in the statedef, and the instance within that call,
+    ## so the same sources always produce the same names (and the same output).
+    ## locals are grouped by nesting depth, so they are added to the statedef in the same order as nested templates are expanded.
+    local_prefix = f"{expanded.instances[instance]}_{index}_{instance}_"
+    while len(levels) <= depth:
+        levels.append([])
+    for (placeholder, local) in expanded.locals[instance]:
+        renames[placeholder] = f"{local_prefix}{local.name}"
+        levels[depth].append(TypeParameter(renames[placeholder], local.type, local.default, local.location, scope = scope))
+
+def splice_template(expanded: ExpandedTemplate, call: StateController, index: int, levels: list[list[TypeParameter]], scope: StateDefinitionScope) -> list[StateController]:
+    ## produces the controllers which replace `call` (at position `index` in a statedef).
+    (replacements, renames) = bind_template_params(expanded, call)
+    add_template_locals(expanded, 0, renames, levels, index, 0, scope)
+    return splice_template_body(expanded, expanded.body, call, replacements, renames, levels, index, 1, scope)
+
+def replace_triggers(tree: TriggerTree, table: list[TypeParameter], ctx: TranslationContext, scope: Optional[StateDefinitionScope] = None) -> TriggerTree:
+    ## returns `tree` if no replacements were made, otherwise the tree with user-defined triggers replaced by their expressions.
     replaced = False
-
     if tree.node == TriggerTreeNode.ATOM:
         # simple case with no parameters, which means we can substitute directly.
         if (match := find_trigger(tree.operator, [], ctx, tree.location)) == None:
-            return replaced ## this implies the atom is not a trigger call, might be a bare value. we don't care much here as triggers are checked elsewhere.
+            return tree ## this implies the atom is not a trigger call, might be a bare value. we don't care much here as triggers are checked elsewhere.
         if match.category != TriggerCategory.BUILTIN and match.exprn != None:
             ## we only make replacements against user-defined triggers and operators.
             ## builtin operators have `exprn` as None.
-            tree.node = match.exprn.node
-            tree.children = copy.deepcopy(match.exprn.children)
-            tree.operator = match.exprn.operator
+            tree = TriggerTree(match.exprn.node, match.exprn.operator, match.exprn.children, tree.location, tree.precedence)
             replaced = True
     elif tree.node == TriggerTreeNode.REDIRECT:
         ## for redirects we need to identify the target scope of the redirect
@@ -322,8 +479,7 @@ def replace_triggers(tree: TriggerTree, table: list[TypeParameter], ctx: Transla
             target_scope = None
             target_table = []
         ## now we need to analyze the redirect target, WITHIN the new target scope.
-        replaced = replace_triggers(tree.children[1], target_table, ctx, scope = target_scope) or replaced
-        return replaced
+        return with_children(tree, [tree.children[0], replace_triggers(tree.children[1], target_table, ctx, scope = target_scope)] + tree.children[2:])
     elif tree.node == TriggerTreeNode.FUNCTION_CALL:
         ## it is possible for the function name to be the name of a struct type, in which case
         ## this trigger is a struct initializer. (this syntax is only legal in the body of a VarSet or in an assignment operator).
@@ -331,10 +487,8 @@ def replace_triggers(tree: TriggerTree, table: list[TypeParameter], ctx: Transla
             ## we need to make replacements on each struct member.
             if len(tree.children) != len(match.members):
                 raise TranslationError(f"Initializer for struct with type {tree.operator} requires {len(match.members)} parameters, not {len(tree.children)}.", tree.location)
-            for child in tree.children:
-                replaced = replace_triggers(child, table, ctx, scope = scope) or replaced
             ## return as the struct call has been replaced
-            return replaced
+            return with_children(tree, [replace_triggers(child, table, ctx, scope = scope) for child in tree.children])
 
         ## we need to identify all overloads which CAN match this call, because at this point the child types are not known
         ## (and it's not trivial to infer since CNS allows enums to be specified without any indication of their type...)
@@ -349,25 +503,23 @@ def replace_triggers(tree: TriggerTree, table: list[TypeParameter], ctx: Transla
             match = matches[0]
             ## only perform replacements on non-builtin triggers. but, still need to inspect children.
             if match.category == TriggerCategory.BUILTIN or match.exprn == None:
-                for child in tree.children:
-                    replaced = replace_triggers(child, table, ctx, scope = scope) or replaced
-                return replaced
+                return with_children(tree, [replace_triggers(child, table, ctx, scope = scope) for child in tree.children])
             ## we need to do 2 things:
-            ## - copy the trigger expression and update it with parameter replacements
-            new_trigger = copy.deepcopy(match.exprn)
+            ## - substitute the parameters in the trigger expression
+            replacements: dict[str, TriggerTree] = {}
             for index in range(len(match.params)):
-                old_exprn = TriggerTree(TriggerTreeNode.ATOM, match.params[index].name, [], tree.location)
-                replace_recursive(new_trigger, old_exprn, tree.children[index])
+                replacements.setdefault(match.params[index].name.lower(), tree.children[index])
+            new_trigger = substitute(match.exprn, replacements)
             ## - insert it in place of this node.
-            tree.node = new_trigger.node
-            tree.children = new_trigger.children
-            tree.operator = new_trigger.operator
+            tree = TriggerTree(new_trigger.node, new_trigger.operator, new_trigger.children, tree.location, tree.precedence)
             replaced = True
 
-    for child in tree.children:
-        replaced = replace_triggers(child, table, ctx, scope = scope) or replaced
-
-    return replaced
+    result = with_children(tree, [replace_triggers(child, table, ctx, scope = scope) for child in tree.children])
+    ## the inserted expression can itself be a call to a user-defined trigger, expand it here rather than needing another pass.
+    ## trigger definitions can only use triggers defined before them, so this always terminates.
+    if replaced and result.node in [TriggerTreeNode.ATOM, TriggerTreeNode.FUNCTION_CALL]:
+        return replace_triggers(result, table, ctx, scope = scope)
+    return result
 
 def merge_by_operand(triggers: list[TriggerTree], op: str, loc: Location) -> TriggerTree:
     ## recursively merges the list of triggers into a binary operator structure.
@@ -1,5 +1,5 @@
 MTL_VERSION = "20251223.01"
-DEBUGGER_VERSION = 2
+DEBUGGER_VERSION = 3
 
 LEGAL_COMPILER_FLAGS = [
     "no_implicit_conversion", "no_numeric", "no_implicit_bool", "no_implicit_enum",
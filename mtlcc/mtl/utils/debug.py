@@ -1,14 +1,24 @@
+import bisect
+import os
 from typing import Any, Optional
 
 from mtl.types.shared import Location, DebugCategory
 from mtl.types.translation import AllocationTable, TypeParameter, TypeDefinition, TriggerDefinition, TemplateDefinition, StateDefinition
 from mtl.types.builtins import BUILTIN_FLOAT
-from mtl.types.context import DebuggingContext, DebugStateInfo, CompilerConfiguration
+from mtl.types.context import DebuggingContext, DebugStateInfo, DebugLocationIndex, CompilerConfiguration
 
-from mtl.utils.func import mask_variable, get_all
+from mtl.utils.func import mask_variable, normalize_path
 
 def get_state_by_id(id: int, ctx: DebuggingContext) -> Optional[DebugStateInfo]:
-    matches = get_all(ctx.states, lambda k: k.id == id)
+    ctx.index_states()
+    return select_state([ctx.states[index] for index in ctx.state_ids.get(id, [])])
+
+def get_state_by_name(name: str, ctx: DebuggingContext) -> Optional[DebugStateInfo]:
+    ctx.index_states()
+    return select_state([ctx.states[index] for index in ctx.state_names.get(name.lower(), [])])
+
+def select_state(matches: list[DebugStateInfo]) -> Optional[DebugStateInfo]:
+    ## a state may be defined both by the character and in common1, in which case the character's definition wins.
     if len(matches) == 0:
         return None
     if len(matches) > 2:
@@ -17,15 +27,68 @@ def get_state_by_id(id: int, ctx: DebuggingContext) -> Optional[DebugStateInfo]:
         return matches[0]
     return next(filter(lambda k: not k.is_common, matches), None)
 
-def get_state_by_name(name: str, ctx: DebuggingContext) -> Optional[DebugStateInfo]:
-    matches = get_all(ctx.states, lambda k: k.name.lower() == name.lower())
-    if len(matches) == 0:
+def add_state_locations(index: int, filename: str, file: Any, line: int, controllers: list[tuple[Any, int]], ctx: DebuggingContext):
+    ## adds the locations of the state at `index` in `ctx.states` to the location index. the statedef itself resolves to its first controller.
+    ## only controllers in the same file as the statedef are added, so controllers expanded from templates in other files are not matched.
+    ## `file` identifies the statedef's file in the same way as the first element of each controller (e.g. by filename, or by index in the strings table).
+    ## `sort_locations` must be called once all states are added.
+    if len(controllers) == 0:
+        return
+    entries = ctx.locations.setdefault(normalize_path(filename), DebugLocationIndex([], []))
+    entries.lines.append(line)
+    entries.targets.append((index, 0))
+    for (cindex, (controller_file, controller_line)) in enumerate(controllers):
+        if controller_file == file:
+            entries.lines.append(controller_line)
+            entries.targets.append((index, cindex))
+
+def sort_locations(ctx: DebuggingContext):
+    ## the sort is stable, so where several locations share a line the first one added wins.
+    for entries in ctx.locations.values():
+        order = sorted(range(len(entries.lines)), key = entries.lines.__getitem__)
+        entries.lines = [entries.lines[i] for i in order]
+        entries.targets = [entries.targets[i] for i in order]
+    ctx.location_keys = {}
+
+def index_locations(ctx: DebuggingContext):
+    if ctx.indexed_locations == len(ctx.states):
+        return
+    for index in range(ctx.indexed_locations, len(ctx.states)):
+        state = ctx.states[index]
+        filename = state.location.filename
+        add_state_locations(index, filename, filename, state.location.line, [(controller.filename, controller.line) for controller in state.states], ctx)
+    ctx.indexed_locations = len(ctx.states)
+    sort_locations(ctx)
+
+def match_location_file(path: str, ctx: DebuggingContext) -> Optional[str]:
+    ## `path` is a normalized filename. it matches a key in the location index exactly, or if one ends with the other.
+    if path in ctx.locations:
+        return path
+    return next((key for key in ctx.locations if key.endswith("/" + path) or path.endswith("/" + key)), None)
+
+def find_location_file(filename: str, ctx: DebuggingContext) -> Optional[str]:
+    ## finds the file in the location index which `filename` refers to. paths match exactly after normalizing,
+    ## or if one ends with the other (e.g. `common1.mtl` matches the full path of common1.mtl in the database).
+    ## if the path as given does not match, it is resolved against the working directory (so `../char/x.mtl` can match)
+    ## and compared against the keys resolved in the same way.
+    index_locations(ctx)
+    path = normalize_path(filename)
+    if path not in ctx.location_keys:
+        if (key := match_location_file(path, ctx)) == None:
+            resolved = normalize_path(os.path.abspath(filename))
+            if (key := match_location_file(resolved, ctx)) == None:
+                key = next((key for key in ctx.locations if normalize_path(os.path.abspath(key)) == resolved), None)
+        ctx.location_keys[path] = key
+    return ctx.location_keys[path]
+
+def find_location(filename: str, line: int, ctx: DebuggingContext) -> Optional[tuple[int, int]]:
+    ## finds the (index in `ctx.states`, controller index) of the closest statedef or controller at or before `filename:line`.
+    if (key := find_location_file(filename, ctx)) == None:
         return None
-    if len(matches) > 2:
+    entries = ctx.locations[key]
+    if (position := bisect.bisect_right(entries.lines, line)) == 0:
         return None
-    if len(matches) == 1:
-        return matches[0]
-    return next(filter(lambda k: not k.is_common, matches), None)
+    return entries.targets[bisect.bisect_left(entries.lines, entries.lines[position - 1])]
 
 def debuginfo(cat: DebugCategory, data: Any, cc: CompilerConfiguration) -> list[str]:
     if cc.no_compiler_internal: return []
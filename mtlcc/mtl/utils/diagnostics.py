@@ -0,0 +1,46 @@
+## collects compiler diagnostics for check mode (`mtlcc --check` / `runCheck`) and the compile daemon.
+## warnings are always printed as they are raised; while `collect` is active they are also recorded, along with any errors
+## recovered by `recover`. errors are only recovered in check mode, otherwise they are raised as usual and stop the compilation.
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+from mtl.types.shared import Location, TranslationError, Diagnostic, DiagnosticLevel
+
+## diagnostics recorded by the active `collect` block, if any.
+collected: Optional[list[Diagnostic]] = None
+## whether `recover` should record errors and continue.
+recovering = False
+
+@contextmanager
+def collect(recover: bool = False) -> Iterator[list[Diagnostic]]:
+    global collected, recovering
+    previous = (collected, recovering)
+    (collected, recovering) = ([], recover)
+    try:
+        yield collected
+    finally:
+        (collected, recovering) = previous
+
+def warn(message: str, location: Location):
+    print(f"Warning at {location}: {message}")
+    if collected != None:
+        collected.append(Diagnostic(DiagnosticLevel.WARNING, message, location))
+
+def error(exc: TranslationError):
+    if collected != None:
+        collected.append(Diagnostic(DiagnosticLevel.ERROR, exc.description, exc.location))
+
+def has_errors() -> bool:
+    return collected != None and any(diagnostic.level == DiagnosticLevel.ERROR for diagnostic in collected)
+
+@contextmanager
+def recover() -> Iterator[None]:
+    ## in check mode, an error raised in the body is recorded and execution continues after the block,
+    ## so each independent unit (e.g. each statedef) can report its own error. otherwise errors propagate as usual.
+    if collected == None or not recovering:
+        yield
+        return
+    try:
+        yield
+    except TranslationError as exc:
+        error(exc)
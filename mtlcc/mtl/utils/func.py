@@ -45,22 +45,9 @@ def includes_insensitive(s1: str, s2: list[str]) -> bool:
     incl = [s.lower() for s in s2]
     return s1.lower() in incl
 
-def match_filenames(f1: str, f2: str) -> Optional[str]:
-    ## we want to see if the filenames from `f1` and `f2` match in any way.
-    ## we can check a couple ways:
-    ### 1. real file match (find the files from paths on disk, confirm they are the same)
-    ### 2. stem match (e.g. I input `common1.mtl`, match to `f2` based on last path component)
-    if os.path.exists(f1) and os.path.exists(f2) and f1 == f2:
-        return os.path.abspath(f1)
-    if os.path.abspath(f2).lower().endswith(f1.lower()):
-        ## it's still necessary to find it on the system.
-        if os.path.exists(f1): return os.path.abspath(f1)
-        if os.path.exists(f2): return os.path.abspath(f2)
-    if os.path.abspath(f1).lower().endswith(f2.lower()):
-        ## it's still necessary to find it on the system.
-        if os.path.exists(f1): return os.path.abspath(f1)
-        if os.path.exists(f2): return os.path.abspath(f2)
-    return None
+def normalize_path(path: str) -> str:
+    ## normalized form of a path for comparing source filenames, with unified separators and case ignored (as on Windows).
+    return os.path.normpath(path.replace("\\", "/")).replace("\\", "/").lower()
 
 def make_atom(input: str) -> Any:
     if "," in input:
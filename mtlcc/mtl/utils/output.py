@@ -0,0 +1,81 @@
+## helpers for writing compiler output without touching files which have not changed.
+## rewriting identical files is wasteful for large assets (SFF/SND files can be hundreds of MB), and updating the
+## modification time of unchanged outputs defeats tools which watch the output folder.
+import os
+import sys
+import shutil
+import filecmp
+from contextlib import contextmanager
+
+## ioctl request number for FICLONE on Linux (creates a copy-on-write clone of a file on filesystems which support it).
+FICLONE = 0x40049409
+
+def replace_if_changed(temp: str, target: str, skipped: list[str]):
+    ## moves `temp` over `target` if the contents differ, otherwise discards `temp` and records `target` in `skipped`.
+    if os.path.isfile(target) and filecmp.cmp(temp, target, shallow = False):
+        os.remove(temp)
+        skipped.append(target)
+        return
+    os.replace(temp, target)
+
+@contextmanager
+def write_if_changed(target: str, skipped: list[str], mode: str = "w"):
+    ## opens a temporary file for writing, which replaces `target` on exit only if its contents changed.
+    temp = target + ".tmp"
+    try:
+        with open(temp, mode) as f:
+            yield f
+    except:
+        if os.path.exists(temp): os.remove(temp)
+        raise
+    replace_if_changed(temp, target, skipped)
+
+def asset_unchanged(source: str, target: str) -> bool:
+    if not os.path.isfile(target):
+        return False
+    if os.path.samefile(source, target):
+        return True
+    source_stat = os.stat(source)
+    target_stat = os.stat(target)
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:
+        return True
+    ## same size but a different timestamp: compare the contents, and if they match adopt the source timestamp
+    ## so the next build can skip the comparison.
+    if not filecmp.cmp(source, target, shallow = False):
+        return False
+    os.utime(target, ns = (source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return True
+
+def try_reflink(source: str, target: str) -> bool:
+    if sys.platform != "linux":
+        return False
+    try:
+        import fcntl
+        with open(source, mode="rb") as src, open(target, mode="wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(source, target)
+        return True
+    except (OSError, ImportError):
+        if os.path.exists(target): os.remove(target)
+        return False
+
+def try_hardlink(source: str, target: str) -> bool:
+    try:
+        os.link(source, target)
+        return True
+    except (OSError, NotImplementedError):
+        return False
+
+def copy_asset(source: str, target: str, skipped: list[str]):
+    ## copies an asset to the output folder, unless an identical copy already exists (in which case it is recorded in `skipped`).
+    ## reflinks and hardlinks avoid copying the data where the filesystem supports them;
+    ## otherwise the file is copied with its timestamps, so the next build can detect it is unchanged cheaply.
+    if asset_unchanged(source, target):
+        skipped.append(target)
+        return
+    if os.path.lexists(target):
+        os.remove(target)
+    if not try_reflink(source, target) and not try_hardlink(source, target):
+        shutil.copy2(source, target)
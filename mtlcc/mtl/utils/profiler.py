@@ -0,0 +1,212 @@
+## per-phase compile profiler.
+## records wall time, call counts and memory allocated (through tracemalloc) for each compiler phase, and for the work done
+## on each statedef and template within those phases.
+## results are written as a Chrome trace-event JSON file (which can be opened in chrome://tracing or https://ui.perfetto.dev)
+## and a text summary of the phases, slowest statedefs and slowest templates.
+## profiling is off unless `start` is called; `span` and `profiled` do nothing in that case.
+## note that spans are only recorded in the main process, work done by `--jobs` worker processes is only visible as the enclosing phase.
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional, Callable, Any, ContextManager, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+## number of entries shown in each table of the text summary.
+SUMMARY_LIMIT = 10
+
+@dataclass
+class ProfileEvent:
+    name: str
+    category: str
+    ## start time and duration in nanoseconds, relative to the start of profiling.
+    start: int
+    duration: int
+    ## bytes still allocated at the end of the span which were not allocated at the start.
+    allocated: int
+    ## highest traced memory during the span, relative to the start of the span.
+    peak: int
+    ## traced memory at the end of the span.
+    memory: int
+    args: dict[str, Any]
+
+@dataclass
+class ProfileTotal:
+    calls: int = 0
+    duration: int = 0
+    allocated: int = 0
+    peak: int = 0
+
+class Profiler:
+    def __init__(self, memory: bool = True):
+        ## tracemalloc slows down allocation-heavy code considerably, so it can be disabled when only timings are needed
+        ## (memory figures are then reported as 0).
+        self.memory = memory
+        ## leave tracemalloc running if something else already started it.
+        self.owns_tracing = memory and not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start()
+        self.origin = time.perf_counter_ns()
+        self.finished = 0
+        self.events: list[ProfileEvent] = []
+        ## highest traced memory seen by each open span so far, see `span`.
+        self.peaks: list[int] = []
+        self.max_memory = 0
+
+    @contextmanager
+    def span(self, name: str, category: str, args: dict[str, Any]) -> Iterator[None]:
+        if not self.memory:
+            start = time.perf_counter_ns()
+            try:
+                yield
+            finally:
+                self.events.append(ProfileEvent(name, category, start - self.origin, time.perf_counter_ns() - start, 0, 0, 0, args))
+            return
+        ## tracemalloc only tracks a single peak, so it is reset on entry to each span
+        ## and the peak seen by a span is handed back to the enclosing span on exit.
+        (current, peak) = tracemalloc.get_traced_memory()
+        if len(self.peaks) != 0:
+            self.peaks[-1] = max(self.peaks[-1], peak)
+        tracemalloc.reset_peak()
+        self.peaks.append(current)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            (after, peak) = tracemalloc.get_traced_memory()
+            peak = max(self.peaks.pop(), peak)
+            if len(self.peaks) != 0:
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            self.max_memory = max(self.max_memory, peak)
+            self.events.append(ProfileEvent(name, category, start - self.origin, end - start, after - current, peak - current, after, args))
+
+    def stop(self):
+        self.finished = time.perf_counter_ns() - self.origin
+        if self.owns_tracing:
+            tracemalloc.stop()
+
+    def totals(self, category: str, key: Callable[[ProfileEvent], Any]) -> dict[Any, ProfileTotal]:
+        ## a span nested inside another span with the same key (e.g. `loadFile` for an included file) is counted as a call,
+        ## but its time is already part of the enclosing span.
+        result: dict[Any, ProfileTotal] = {}
+        open_until: dict[Any, int] = {}
+        for event in sorted(self.events, key = lambda k: (k.start, -k.duration)):
+            if event.category != category: continue
+            total = result.setdefault(key(event), ProfileTotal())
+            total.calls += 1
+            if event.start < open_until.get(key(event), -1):
+                continue
+            open_until[key(event)] = event.start + event.duration
+            total.duration += event.duration
+            total.allocated += event.allocated
+            total.peak = max(total.peak, event.peak)
+        return result
+
+    def write_trace(self, target: str):
+        trace: list[dict[str, Any]] = []
+        pid = os.getpid()
+        for event in sorted(self.events, key = lambda k: (k.start, -k.duration)):
+            args = dict(event.args)
+            args["allocated_kib"] = round(event.allocated / 1024, 1)
+            args["peak_kib"] = round(event.peak / 1024, 1)
+            trace.append({"name": event.name, "cat": event.category, "ph": "X", "ts": event.start / 1000, "dur": event.duration / 1000, "pid": pid, "tid": 0, "args": args})
+            if event.category == "phase":
+                trace.append({"name": "traced memory", "ph": "C", "ts": (event.start + event.duration) / 1000, "pid": pid, "tid": 0, "args": {"MiB": round(event.memory / 1048576, 2)}})
+        with open(target, mode="w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> str:
+        lines = [f"Compile profile: {self.finished / 1e6:.1f} ms total, {self.max_memory / 1048576:.2f} MiB peak traced memory.", ""]
+
+        ## phases are listed in the order they first ran.
+        phases = self.totals("phase", lambda k: k.name)
+        first_run = {}
+        for event in self.events:
+            if event.category == "phase": first_run[event.name] = min(first_run.get(event.name, event.start), event.start)
+        lines.append(f"{'phase':<36}{'calls':>8}{'time (ms)':>12}{'alloc (KiB)':>14}{'peak (KiB)':>14}")
+        for name in sorted(phases, key = lambda k: first_run[k]):
+            total = phases[name]
+            lines.append(f"{name:<36}{total.calls:>8}{total.duration / 1e6:>12.1f}{total.allocated / 1024:>14.1f}{total.peak / 1024:>14.1f}")
+
+        ## statedef spans are recorded once per phase which processes them, so the slowest phase is reported alongside the total.
+        statedefs = self.totals("statedef", lambda k: k.name)
+        statedef_phases = self.totals("statedef", lambda k: (k.name, k.args.get("phase", "")))
+        lines += ["", f"Slowest statedefs (of {len(statedefs)}):"]
+        lines.append(f"{'statedef':<36}{'time (ms)':>12}{'alloc (KiB)':>14}  slowest phase")
+        for name in sorted(statedefs, key = lambda k: statedefs[k].duration, reverse = True)[:SUMMARY_LIMIT]:
+            total = statedefs[name]
+            slowest = max([key for key in statedef_phases if key[0] == name], key = lambda k: statedef_phases[k].duration)
+            lines.append(f"{name:<36}{total.duration / 1e6:>12.1f}{total.allocated / 1024:>14.1f}  {slowest[1]} ({statedef_phases[slowest].duration / 1e6:.1f} ms)")
+
+        templates = self.totals("template", lambda k: k.name)
+        lines += ["", f"Slowest templates (of {len(templates)}):"]
+        lines.append(f"{'template':<36}{'calls':>8}{'time (ms)':>12}{'alloc (KiB)':>14}")
+        for name in sorted(templates, key = lambda k: templates[k].duration, reverse = True)[:SUMMARY_LIMIT]:
+            total = templates[name]
+            lines.append(f"{name:<36}{total.calls:>8}{total.duration / 1e6:>12.1f}{total.allocated / 1024:>14.1f}")
+
+        return "\n".join(lines)
+
+## the profiler for the current compilation, if profiling is enabled.
+active: Optional[Profiler] = None
+
+def start(memory: bool = True) -> bool:
+    ## starts profiling, unless a profiler is already running (e.g. when mdk starts profiling before invoking mtlcc).
+    ## returns True if this call started the profiler, in which case the caller is responsible for calling `finish` or `stop`.
+    global active
+    if active != None:
+        return False
+    active = Profiler(memory)
+    return True
+
+def stop() -> Optional[Profiler]:
+    ## stops profiling and returns the recorded profile.
+    global active
+    profiler = active
+    active = None
+    if profiler != None:
+        profiler.stop()
+    return profiler
+
+def finish(target: str):
+    ## stops profiling and writes the trace to `target` and the summary next to it (with a `.txt` extension).
+    if (profiler := stop()) == None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok = True)
+    profiler.write_trace(target)
+    summary = profiler.summary()
+    with open(os.path.splitext(target)[0] + ".txt", mode="w") as f:
+        f.write(summary + "\n")
+    print(summary)
+    print(f"Wrote compile profile to {target}.")
+
+def span(name: str, category: str = "phase", **args) -> ContextManager:
+    if active == None:
+        return nullcontext()
+    return active.span(name, category, args)
+
+def iterate(items: Iterable[T], category: str, phase: str, name: Callable[[T], str] = lambda k: k.name) -> Iterable[T]:
+    ## records the body of a loop over `items` as one span per item (e.g. `for statedef in iterate(ctx.statedefs, "statedef", "replaceTriggers")`).
+    if active == None:
+        return items
+    return iterate_spans(active, items, category, phase, name)
+
+def iterate_spans(profiler: Profiler, items: Iterable[T], category: str, phase: str, name: Callable[[T], str]) -> Iterator[T]:
+    for item in items:
+        with profiler.span(name(item), category, {"phase": phase}):
+            yield item
+
+def profiled(fn: Callable) -> Callable:
+    ## records each call to `fn` as a phase.
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if active == None:
+            return fn(*args, **kwargs)
+        with active.span(fn.__name__, "phase", {}):
+            return fn(*args, **kwargs)
+    return wrapper
@@ -1,3 +1,5 @@
+import copy
+
 from mtl.types.translation import *
 from mtl.types.context import *
 from mtl.types.shared import DebugCategory
@@ -41,13 +43,17 @@ def make_prop(prop: Any) -> str:
     else:
         return str(prop)
 
+def normalize_statedef_properties(statedef: StateDefinition):
+    ## special handling to allow type/movetype/physics their enum qualifies.
+    ## this is basically a hack, we should be handling this during parsing...
+    ## this runs before any statedef is written, so `write_statedef` itself does not modify the statedef.
+    for prop in ["type", "movetype", "physics"]:
+        value = statedef.parameters.__dict__.get(prop)
+        if value != None and "." in value and value.split(".")[0].lower() in ["statetype", "movetype", "physicstype"]:
+            statedef.parameters.__dict__[prop] = value.split(".")[1]
+
 def write_statedef_property(statedef: StateDefinition, prop: str, output: list[str]):
     if prop in statedef.parameters.__dict__ and statedef.parameters.__dict__[prop] != None:
-        ## special handling to allow type/movetype/physics their enum qualifies.
-        ## this is basically a hack, we should be handling this during parsing...
-        if prop in ["type", "movetype", "physics"] and "." in statedef.parameters.__dict__[prop] \
-           and statedef.parameters.__dict__[prop].split(".")[0].lower() in ["statetype", "movetype", "physicstype"]:
-            statedef.parameters.__dict__[prop] = statedef.parameters.__dict__[prop].split(".")[1]
         output.append(f"{prop} = {make_prop(statedef.parameters.__dict__[prop])}")
 
 def write_statedef(statedef: StateDefinition, ctx: TranslationContext) -> list[str]:
@@ -88,9 +94,32 @@ def emit_enum(input: str, type: TypeDefinition) -> str:
     
     raise TranslationError(f"Could not emit an enumeration value for input {input} and type {type.name}.", compiler_internal(None))
 
+## memo of emitted Expressions, keyed on (node, variable table, expected types, scope).
+## the nodes, tables and expected types are kept alive in the value so their ids cannot be re-used while the memo is live.
+EmitMemo = dict[tuple[int, int, Optional[tuple[tuple[int, bool, bool], ...]], Optional[StateDefinitionScope]], tuple[TriggerTree, list[TypeParameter], Optional[list[TypeSpecifier]], Optional[Expression], Optional[TranslationError]]]
+
 ## this function handles converting trees to Expressions.
 ## it also handles type-checking, the types in the Expressions are concrete.
-def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: TranslationContext, expected: Optional[list[TypeSpecifier]] = None, scope: Optional[StateDefinitionScope] = None) -> Expression:
+def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: TranslationContext, expected: Optional[list[TypeSpecifier]] = None, scope: Optional[StateDefinitionScope] = None, memo: Optional[EmitMemo] = None) -> Expression:
+    ## operators emit their children once to check for enum types, and then again with the expected type,
+    ## so without memoization nested operators re-emit their subtrees 2^depth times.
+    ## emitting a node only depends on the node, table, expected type, and scope, so each combination is emitted once.
+    if memo == None:
+        memo = {}
+    key = (id(tree), id(table), None if expected == None else tuple((id(spec.type), spec.required, spec.repeat) for spec in expected), scope)
+    if (entry := memo.get(key)) == None:
+        try:
+            entry = (tree, table, expected, emit_trigger_node(tree, table, ctx, expected, scope, memo), None)
+        except TranslationError as exc:
+            entry = (tree, table, expected, None, exc)
+        memo[key] = entry
+    if entry[4] != None:
+        raise entry[4]
+    assert entry[3] != None
+    ## callers are permitted to modify the returned Expression, so hand out a copy.
+    return copy.copy(entry[3])
+
+def emit_trigger_node(tree: TriggerTree, table: list[TypeParameter], ctx: TranslationContext, expected: Optional[list[TypeSpecifier]], scope: Optional[StateDefinitionScope], memo: EmitMemo) -> Expression:
     if tree.node == TriggerTreeNode.MULTIVALUE:
         ## multivalue, this kind of sucks but it should only come up at top level.
         ## express as a combined expression with type BUILTIN_ANY
@@ -108,7 +137,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
             else:
                 next_expected = None
 
-            children.append(emit_trigger_recursive(child, table, ctx, expected = next_expected, scope = scope))
+            children.append(emit_trigger_recursive(child, table, ctx, expected = next_expected, scope = scope, memo = memo))
 
         return Expression(BUILTIN_ANY, ", ".join([e.value for e in children]))
     elif tree.node == TriggerTreeNode.UNARY_OP or tree.node == TriggerTreeNode.BINARY_OP:
@@ -117,7 +146,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
         maybe_expected: Optional[list[TypeSpecifier]] = None
         for child in tree.children:
             try:
-                if (child_type := emit_trigger_recursive(child, table, ctx, scope = scope)) != None:
+                if (child_type := emit_trigger_recursive(child, table, ctx, scope = scope, memo = memo)) != None:
                     if child_type.type.category in [TypeCategory.ENUM, TypeCategory.STRING_ENUM, TypeCategory.FLAG, TypeCategory.STRING_FLAG]:
                         maybe_expected = [TypeSpecifier(child_type.type)]
             except TranslationError:
@@ -125,7 +154,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
         ## resolve child types.
         children: list[Expression] = []
         for child in tree.children:
-            children.append(emit_trigger_recursive(child, table, ctx, expected = maybe_expected, scope = scope))
+            children.append(emit_trigger_recursive(child, table, ctx, expected = maybe_expected, scope = scope, memo = memo))
         ## find an operator trigger for the types.
         if (match := find_trigger(f"operator{tree.operator}", [e.type for e in children], ctx, tree.location)) == None:
             raise TranslationError(f"Could not find a matching operator {tree.operator} for types {', '.join([e.type.name for e in children])}", tree.location)
@@ -145,7 +174,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
         ## interval, construct an expression and return the widest match between the children.
         children: list[Expression] = []
         for child in tree.children:
-            children.append(emit_trigger_recursive(child, table, ctx, scope = scope))
+            children.append(emit_trigger_recursive(child, table, ctx, scope = scope, memo = memo))
         if (widest := get_widest_match(children[0].type, children[1].type, ctx, tree.location)) == None:
             raise TranslationError(f"Could not match types between {children[0].type} and {children[1].type} in interval operator.", tree.location)
         return Expression(widest, f"{tree.operator[0]}{children[0].value}, {children[1].value}{tree.operator[1]}")
@@ -169,7 +198,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
             else:
                 next_expected = None
 
-            children.append(emit_trigger_recursive(child, table, ctx, expected = next_expected, scope = scope))
+            children.append(emit_trigger_recursive(child, table, ctx, expected = next_expected, scope = scope, memo = memo))
         
         ## if the matched trigger has a const evaluator, return it
         if match.const != None:
@@ -189,7 +218,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
             return Expression(parsed.type, make_prop(parsed.value))
         elif find_trigger(tree.operator, [], ctx, tree.location) != None:
             ## if a trigger name matches, and the trigger has an overload which takes no parameters, accept it.
-            return emit_trigger_recursive(TriggerTree(TriggerTreeNode.FUNCTION_CALL, tree.operator, [], tree.location), table, ctx, expected, scope = scope)
+            return emit_trigger_recursive(TriggerTree(TriggerTreeNode.FUNCTION_CALL, tree.operator, [], tree.location), table, ctx, expected, scope = scope, memo = memo)
         elif (var := find(table, lambda k: equals_insensitive(k.name, tree.operator))) != None:
             ## if a variable name from the provided variable table matches, accept it and respond with VariableExpression
             ## the value of the VariableExpression is the access-masked expression.
@@ -201,7 +230,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
             return Expression(BUILTIN_TYPE, tree.operator)
         elif "." in tree.operator and (enum_type := match_enum_parts(tree.operator, ctx)) != None:
             enum_result = enum_type[0].type
-            return emit_trigger_recursive(TriggerTree(TriggerTreeNode.ATOM, tree.operator[len(enum_result.name)+1:], [], tree.location), table, ctx, [TypeSpecifier(enum_result)], scope)
+            return emit_trigger_recursive(TriggerTree(TriggerTreeNode.ATOM, tree.operator[len(enum_result.name)+1:], [], tree.location), table, ctx, [TypeSpecifier(enum_result)], scope, memo = memo)
         elif expected != None and len(expected) == 1 and expected[0].type.category in [TypeCategory.ENUM, TypeCategory.FLAG]:
             ## if an expected type was passed, and the type is ENUM or FLAG,
             ## attempt to match the value to enum constants.
@@ -250,7 +279,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
     elif tree.node == TriggerTreeNode.REDIRECT:
         ## redirects consist of a LHS redirect target and a RHS redirect expression.
         ## the overall expression is just <target>,<expression>.
-        target = emit_trigger_recursive(tree.children[0], table, ctx, scope = scope)
+        target = emit_trigger_recursive(tree.children[0], table, ctx, scope = scope, memo = memo)
         if target.type != BUILTIN_TARGET:
             raise TranslationError(f"Target {target.value} of redirected expression could not be resolved to a target type.", tree.location)
         
@@ -266,7 +295,7 @@ def emit_trigger_recursive(tree: TriggerTree, table: list[TypeParameter], ctx: T
         
         ## we need to pass the global table for the target scope when resolving target expression.
         target_table = list(filter(lambda k: k.scope == target_scope, ctx.globals))
-        exprn = emit_trigger_recursive(tree.children[1], target_table, ctx, scope = target_scope)
+        exprn = emit_trigger_recursive(tree.children[1], target_table, ctx, scope = target_scope, memo = memo)
         if target.value.startswith("(") and target.value.endswith(")"):
             target.value = target.value[1:-1]
         if exprn.value.startswith("(") and exprn.value.endswith(")"):
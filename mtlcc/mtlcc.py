@@ -1,93 +1,77 @@
 import argparse
+import sys
 import traceback
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional
 
 from mtl import loader, translator, project
+from mtl.parser import trigger
 from mtl.utils.compiler import TranslationError
-from mtl.utils.func import find, equals_insensitive, includes_insensitive
+from mtl.types.shared import Diagnostic, DiagnosticLevel
+from mtl.utils.func import equals_insensitive, includes_insensitive
 from mtl.debugging import database
+from mtl.utils import cache
+from mtl.utils.cache import get_default_cache_dir, load_incremental, store_incremental
+from mtl.utils.output import write_if_changed, replace_if_changed, copy_asset
+from mtl.utils import profiler, diagnostics
 
 from mtl.types.context import *
 
+def loadProject(input: str, projectContext: ProjectContext) -> LoadContext:
+    ## loads every source file of the project and combines them into a single context, ready for translation.
+    ## we perform a load of each file sequentially and combine the loadContext,
+    ## then pass it all to translation at once.
+    ## this means imports should be done ONCE ONLY,
+    ## and global variables will be SHARED.
+    ## loading each file is independent, so if multiple jobs are requested the files are loaded in parallel.
+    ## the results are still merged in the order they appear in the DEF file.
+    ## the compile daemon always loads in-process, so that loaded files stay in its memory cache.
+    load_files = [projectContext.common_file] + projectContext.source_files
+    if projectContext.jobs > 1 and len(load_files) > 1 and cache.memory == None:
+        with ProcessPoolExecutor(max_workers = min(projectContext.jobs, len(load_files))) as executor:
+            loaded = list(executor.map(loader.loadFile, load_files, repeat(projectContext.compiler_flags), repeat([]), repeat(projectContext.cache_dir)))
+    else:
+        loaded = [loader.loadFile(file, projectContext.compiler_flags, [], projectContext.cache_dir) for file in load_files]
+
+    loadContext = loaded[0]
+    # mark all common states as such
+    for defn in loadContext.state_definitions:
+        defn.is_common = True
+
+    with profiler.span("mergeLoadContexts"):
+        merger = loader.LoadContextMerger(loadContext)
+        for nextLoadContext in loaded[1:]:
+            merger.merge(nextLoadContext)
+        loadContext = merger.finish()
+
+    ## includes must be processed against the COMBINED context,
+    ## so the processIncludes call has to be moved out to here.
+    # create a virtual include for libmtl.inc.
+    # libmtl.inc has several required types for the builtins to function.
+    loadContext.includes.insert(0, loader.get_libmtl(loadContext.compiler_flags))
+    loader.processIncludes([], loadContext, projectContext.cache_dir)
+
+    ## the parse cache counters only cover this process and accumulate across builds, so only report them when profiling.
+    if projectContext.profile != None:
+        parse_cache = trigger.getParseCacheInfo()
+        print(f"Trigger parse cache (this process, since startup): {parse_cache.hits} hits, {parse_cache.misses} misses.")
+
+    loadContext.global_forwards = projectContext.global_forwards
+
+    loadContext.filename = os.path.abspath(input)
+    return loadContext
+
 ## this is exported to a separate file so the mdk-python compiler can launch with
 ## an explicitly-passed and modified ProjectContext.
 def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
     ## note: the spec states that translation of included files should stop at step 3.
     ## this is guaranteed by having steps up to 3 in `loadFile`, and remaining steps handled in `translateContext`.
+    ## if profiling was already started by the caller (e.g. mdk), the caller writes the profile instead.
+    owns_profile = projectContext.profile != None and profiler.start()
     try:
-        ## we perform a load of each file sequentially and combine the loadContext,
-        ## then pass it all to translation at once.
-        ## this means imports should be done ONCE ONLY,
-        ## and global variables will be SHARED.
-        loadContext = loader.loadFile(projectContext.common_file, projectContext.compiler_flags, [])
-        # mark all common states as such
-        for defn in loadContext.state_definitions:
-            defn.is_common = True
-
-        for source_file in projectContext.source_files:
-            nextLoadContext = loader.loadFile(source_file, projectContext.compiler_flags, [])
-            # only overwrite common state definitions. otherwise emit an error
-            for defn in nextLoadContext.state_definitions:
-                if (existing := find(loadContext.state_definitions, lambda k: equals_insensitive(k.name, defn.name))) == None:
-                    loadContext.state_definitions.append(defn)
-                elif existing.is_common:
-                    loadContext.state_definitions.remove(existing)
-                    loadContext.state_definitions.append(defn)
-                else:
-                    raise TranslationError(f"Attempted to redefine a non-common state {defn.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", defn.location)
-            # for triggers, apply them if they are not matched. if they are matched, skip if it's the same source; otherwise emit an error.
-            for trig in nextLoadContext.triggers:
-                trig_name = trig.name
-                if trig.namespace != None: trig_name = f"{trig.namespace}.{trig_name}"
-                if (existing := find(loadContext.triggers, lambda k: equals_insensitive(k.name, trig_name))) == None:
-                    loadContext.triggers.append(trig)
-                elif existing.location != trig.location:
-                    raise TranslationError(f"Attempted to redefine a trigger {trig.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", trig.location)
-            # for templates, apply them if they are not matched. if they are matched, skip if it's the same source; otherwise emit an error.
-            for templ in nextLoadContext.templates:
-                templ_name = templ.name
-                if templ.namespace != None: templ_name = f"{templ.namespace}.{templ_name}"
-                if (existing := find(loadContext.templates, lambda k: equals_insensitive(k.name, templ_name))) == None:
-                    loadContext.templates.append(templ)
-                elif existing.location != templ.location:
-                    raise TranslationError(f"Attempted to redefine a template {templ.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", templ.location)
-            # for types, apply them if they are not matched. if they are matched, skip if it's the same source; otherwise emit an error.
-            for typedef in nextLoadContext.type_definitions:
-                type_name = typedef.name
-                if typedef.namespace != None: type_name = f"{typedef.namespace}.{type_name}"
-                if (existing := find(loadContext.type_definitions, lambda k: equals_insensitive(k.name, type_name))) == None:
-                    loadContext.type_definitions.append(typedef)
-                elif existing.location != typedef.location:
-                    raise TranslationError(f"Attempted to redefine a type {typedef.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", typedef.location)
-            for struct in nextLoadContext.struct_definitions:
-                struct_name = struct.name
-                if struct.namespace != None: struct_name = f"{struct.namespace}.{struct_name}"
-                if (existing := find(loadContext.struct_definitions, lambda k: equals_insensitive(k.name, struct_name))) == None:
-                    loadContext.struct_definitions.append(struct)
-                elif existing.location != struct.location:
-                    raise TranslationError(f"Attempted to redefine a type {struct.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", struct.location)
-            # for includes, apply them if they are not matched. if they are matched, skip if it's the same source; otherwise emit an error.
-            for incl in nextLoadContext.includes:
-                source = find(incl.properties, lambda k: k.key.lower() == "source")
-                if source == None: raise TranslationError("The 'source' property is required on Include blocks.", incl.location)
-                for existing in loadContext.includes:
-                    existing_source = find(existing.properties, lambda k: k.key.lower() == "source")
-                    if existing_source == None: raise TranslationError("The 'source' property is required on Include blocks.", existing.location)
-                    if source.value == existing_source.value:
-                        raise TranslationError(f"Attempted to redefine an include {incl.name} (previously defined at {os.path.realpath(existing.location.filename)}:{existing.location.line})", incl.location)
-                loadContext.includes.append(incl)
-
-        ## includes must be processed against the COMBINED context,
-        ## so the processIncludes call has to be moved out to here.
-        # create a virtual include for libmtl.inc.
-        # libmtl.inc has several required types for the builtins to function.
-        loadContext.includes.insert(0, loader.get_libmtl(loadContext.compiler_flags))
-        loader.processIncludes([], loadContext)
-
-        loadContext.global_forwards = projectContext.global_forwards
-
-        loadContext.filename = os.path.abspath(input)
+        loadContext = loadProject(input, projectContext)
         translated = translator.translateContext(loadContext)
         translated.filename = os.path.abspath(input)
 
@@ -97,21 +81,35 @@ def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
         ## identify target file
         target_file = os.path.realpath(output) + "/" + os.path.basename(os.path.splitext(input)[0] + ".st")
 
+        ## incremental builds store the emitted statedefs in the cache folder, keyed on the target file.
+        emitted = None
+        if projectContext.incremental and projectContext.cache_dir != None:
+            emitted = load_incremental(target_file, projectContext.cache_dir)
+        elif projectContext.incremental:
+            print("Warning: incremental builds require a cache directory, performing a full build.")
+
+        ## output files are only replaced if their contents changed, and assets are only copied if they differ.
+        skipped: list[str] = []
+
         print(f"Start writing output states to state file {target_file}.")
-        with open(target_file, mode="w") as f:
-            f.writelines(s + "\n" for s in translator.createOutput(translated))
+        with write_if_changed(target_file, skipped) as f, profiler.span("createOutput"):
+            f.writelines(s + "\n" for s in translator.createOutput(translated, emitted, projectContext.jobs))
         print("Done writing state data.")
 
+        if emitted != None and projectContext.cache_dir != None:
+            store_incremental(target_file, emitted, projectContext.cache_dir)
+
         ## generate debugging info
         debug_file = os.path.realpath(output) + "/" + os.path.basename(os.path.splitext(input)[0] + ".mdbg")
         translated.debugging.filename = os.path.abspath(input)
         print(f"Start writing debugging database to file {debug_file}.")
-        database.writeDatabase(debug_file, translated.debugging)
+        database.writeDatabase(debug_file + ".tmp", translated.debugging)
+        replace_if_changed(debug_file + ".tmp", debug_file, skipped)
         print("Done writing debugging data.")
 
         ## emit CNS constants file
         target_cns = os.path.realpath(output) + "/" + os.path.basename(os.path.splitext(input)[0] + ".constants")
-        with open(target_cns, mode="w") as f:
+        with write_if_changed(target_cns, skipped) as f:
             for section in projectContext.constants:
                 if includes_insensitive(section.name, ["Data", "Size", "Velocity", "Movement", "Quotes"]):
                     f.write(f"[{section.name}]\n")
@@ -123,7 +121,7 @@ def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
 
         ## emit CMD file
         target_cns = os.path.realpath(output) + "/" + os.path.basename(os.path.splitext(input)[0] + ".commands")
-        with open(target_cns, mode="w") as f:
+        with write_if_changed(target_cns, skipped) as f:
             for section in projectContext.commands:
                 if includes_insensitive(section.name, ["Command", "Remap", "Defaults"]):
                     f.write(f"[{section.name}]\n")
@@ -139,7 +137,7 @@ def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
 
         ## emit DEF file
         target_def = os.path.realpath(output) + "/" + os.path.basename(os.path.splitext(input)[0] + ".def")
-        with open(target_def, mode="w") as f:
+        with write_if_changed(target_def, skipped) as f:
             f.write("[Files]\n")
             ## since we always import a MTL-ready common1, we can use builtin here
             f.write("stcommon = common1.cns\n")
@@ -148,20 +146,20 @@ def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
             f.write(f"cns = {os.path.basename(os.path.splitext(input)[0] + '.constants')}\n")
 
             target_spr =  os.path.realpath(output) + "/" + os.path.basename(projectContext.spr_file)
-            shutil.copy(projectContext.spr_file, target_spr)
+            copy_asset(projectContext.spr_file, target_spr, skipped)
             f.write(f"sprite = {os.path.basename(projectContext.spr_file)}\n")
 
             target_snd =  os.path.realpath(output) + "/" + os.path.basename(projectContext.snd_file)
-            shutil.copy(projectContext.snd_file, target_snd)
+            copy_asset(projectContext.snd_file, target_snd, skipped)
             f.write(f"sound = {os.path.basename(projectContext.snd_file)}\n")
 
             target_air =  os.path.realpath(output) + "/" + os.path.basename(projectContext.anim_file)
-            shutil.copy(projectContext.anim_file, target_air)
+            copy_asset(projectContext.anim_file, target_air, skipped)
             f.write(f"anim = {os.path.basename(projectContext.anim_file)}\n")
 
             if projectContext.ai_file != None:
                 target_ai =  os.path.realpath(output) + "/" + os.path.basename(projectContext.ai_file)
-                shutil.copy(projectContext.ai_file, target_ai)
+                copy_asset(projectContext.ai_file, target_ai, skipped)
                 f.write(f"ai = {os.path.basename(projectContext.ai_file)}\n")
             
             f.write("\n")
@@ -177,26 +175,87 @@ def runCompilerFromDef(input: str, output: str, projectContext: ProjectContext):
                 
                 f.write("\n")
 
+        if len(skipped) > 0:
+            print(f"Skipped writing {len(skipped)} unchanged output files: {', '.join(os.path.basename(file) for file in skipped)}")
+
     except TranslationError as exc:
+        diagnostics.error(exc)
         py_exc = traceback.format_exc().split("\n")[-4].strip()
         print("Translation terminated with an error.")
         print(f"\t{exc.message}")
         print(f"mtlcc exception source: {py_exc}")
+    finally:
+        if owns_profile and projectContext.profile != None:
+            profiler.finish(projectContext.profile)
 
-def runCompiler(input: str, output: str):
+def runCompiler(input: str, output: str, cache_dir: Optional[str] = None, incremental: bool = False, jobs: int = 1, profile: Optional[str] = None):
     projectContext = project.loadDefinition(input)
+    projectContext.cache_dir = cache_dir
+    projectContext.incremental = incremental
+    projectContext.jobs = jobs
+    projectContext.profile = profile
     runCompilerFromDef(input, output, projectContext)
 
+def runCheckFromDef(input: str, projectContext: ProjectContext) -> list[Diagnostic]:
+    ## validates the project without producing any output: translation stops after type and scope checking.
+    ## returns every warning raised plus the errors found; independent statedefs each report their own type errors,
+    ## but an error in any other step stops the check at that error.
+    with diagnostics.collect(recover = True) as found:
+        try:
+            loadContext = loadProject(input, projectContext)
+            translator.translateContext(loadContext, check_only = True)
+        except TranslationError as exc:
+            diagnostics.error(exc)
+    return found
+
+def runCheck(input: str, cache_dir: Optional[str] = None, jobs: int = 1) -> list[Diagnostic]:
+    projectContext = project.loadDefinition(input)
+    projectContext.cache_dir = cache_dir
+    projectContext.jobs = jobs
+    return runCheckFromDef(input, projectContext)
+
 def compile():
     parser = argparse.ArgumentParser(prog='mtlcc', description='Translation tool from MTL templates into CNS character code')
-    parser.add_argument('input', help='Path to the DEF file containing the character to translate')
-    parser.add_argument('output', help='Path to the folder to write the resulting character to')
+    parser.add_argument('input', help='Path to the DEF file containing the character to translate (not needed with --daemon)', nargs='?')
+    parser.add_argument('output', help='Path to the folder to write the resulting character to (not needed with --check)', nargs='?')
+    parser.add_argument('--cache-dir', help='Path to the folder used to cache loaded source files between builds', default=get_default_cache_dir())
+    parser.add_argument('--no-cache', help='Disable caching of loaded source files between builds', action='store_true')
+    parser.add_argument('--incremental', help='Re-use output from the previous build for statedefs which have not changed', action='store_true')
+    parser.add_argument('--jobs', '-j', help='Number of worker processes used to load source files and emit statedefs', type=int, default=1)
+    parser.add_argument('--check', help='Only check the character for errors: stop after type and scope checking and write no output', action='store_true')
+    parser.add_argument('--daemon', help='Run as a compile server which keeps loaded files in memory, taking JSON-RPC requests on stdin (see mtl/daemon.py)', action='store_true')
+    parser.add_argument('--port', help='With --daemon, take requests over TCP on this localhost port instead of stdin', type=int, default=None)
+    parser.add_argument('--poll-interval', help='With --daemon, seconds between checks for changes to watched projects', type=float, default=0.5)
+    parser.add_argument('--profile', help='Record time and memory used by each compiler phase, and write a Chrome trace to the given path (defaults to <name>.profile.json in the output folder) with a text summary beside it', nargs='?', const='', default=None)
 
     args = parser.parse_args()
 
-    runCompiler(args.input, args.output)
+    if args.daemon:
+        from mtl import daemon
+        daemon.runDaemon(None if args.no_cache else args.cache_dir, args.jobs, args.port, args.poll_interval)
+        return
+
+    if args.input == None:
+        parser.error("the following arguments are required: input")
+
+    if args.check:
+        found = runCheck(args.input, None if args.no_cache else args.cache_dir, args.jobs)
+        errors = [diagnostic for diagnostic in found if diagnostic.level == DiagnosticLevel.ERROR]
+        for error in errors:
+            print(error)
+        print(f"Check completed with {len(errors)} error(s) and {len(found) - len(errors)} warning(s).")
+        sys.exit(1 if len(errors) != 0 else 0)
+
+    if args.output == None:
+        parser.error("the following arguments are required: output")
+
+    profile = args.profile
+    if profile == '':
+        profile = os.path.join(args.output, os.path.basename(os.path.splitext(args.input)[0] + ".profile.json"))
+
+    runCompiler(args.input, args.output, None if args.no_cache else args.cache_dir, args.incremental, args.jobs, profile)
 
 if __name__ == "__main__":
     compile()
 
-__all__ = ["runCompiler", "runCompilerFromDef"]
\ No newline at end of file
+__all__ = ["runCompiler", "runCompilerFromDef", "runCheck", "runCheckFromDef"]
\ No newline at end of file